@@ -0,0 +1,34 @@
+"""Checks the gate report's counts and depths on chips whose cost is known.
+
+Add16 is sixteen FullAdders of 25 Nands each, and its carry runs through
+all of them, 70 Nands deep. The ALU's longest path goes through that
+Add16, 108 Nands deep in all. A Register has no path from input to
+output, only paths that end or start at its 16 DFFs.
+"""
+
+from gate_report import timing
+from hdl_simulator import ChipLibrary, flatten
+
+# chip: (Nands, DFFs, the depth of each kind of path)
+EXPECTED = {
+    "Add16": (400, 0, {"input to output": 70}),
+    "ALU": (1302, 0, {"input to output": 108}),
+    "Register": (128, 16, {"input to register": 5, "register to register": 4, "register to output": 0}),
+}
+
+
+def check() -> bool:
+    library = ChipLibrary()
+    correct = True
+    for name, expected in EXPECTED.items():
+        netlist = flatten(name, library)
+        found = (len(netlist.nands), len(netlist.dffs), timing(netlist).depths)
+        print(f"  {name}: {found[0]} Nands, {found[1]} DFFs, depths {found[2]}")
+        correct = correct and found == expected
+    return correct
+
+
+if __name__ == "__main__":
+    print("Gate counts and depths:")
+    error_found = not check()
+    print("Error found" if error_found else "No errors found!")
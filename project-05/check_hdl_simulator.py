@@ -0,0 +1,167 @@
+"""Checks the HDL simulator: ALU.hdl against Python, Computer.hdl against the emulator.
+
+Computer.hdl runs Mult.asm on random inputs for as many cycles as the
+emulator needs to halt, then both must hold the same R0 to R15.
+
+Every behavioral chip must match its HDL on a random trace, and the
+combinational chips are also run bit-sliced against NumPy models:
+exhaustively when they have up to 20 input bits, else on random vectors.
+"""
+
+import os
+import random
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+
+from assembler import assemble
+from emulator import Emulator
+from hdl_simulator import BEHAVIORAL_CHIPS, check_builtin, run_computer, simulate, simulate_sliced
+
+ALU_VECTORS = 2000
+MULT_RUNS = 10
+RANDOM_VECTORS = 1_000_000
+EXHAUSTIVE_BITS = 20
+
+MASK = np.uint64(0xFFFF)
+ONE = np.uint64(1)
+
+
+def numpy_alu(v: dict) -> dict:
+    x = np.where(v["zx"] == ONE, np.uint64(0), v["x"])
+    x = np.where(v["nx"] == ONE, x ^ MASK, x)
+    y = np.where(v["zy"] == ONE, np.uint64(0), v["y"])
+    y = np.where(v["ny"] == ONE, y ^ MASK, y)
+    out = np.where(v["f"] == ONE, (x + y) & MASK, x & y)
+    out = np.where(v["no"] == ONE, out ^ MASK, out)
+    return {"out": out, "zr": (out == 0).astype(np.uint64), "ng": out >> np.uint64(15)}
+
+
+def demultiplexed(v: dict, names: str) -> dict:
+    return {name: np.where(v["sel"] == np.uint64(index), v["in"], np.uint64(0)) for index, name in enumerate(names)}
+
+
+# Models of the combinational chips, on arrays of pin values.
+MODELS = {
+    "Not": lambda v: {"out": v["in"] ^ ONE},
+    "And": lambda v: {"out": v["a"] & v["b"]},
+    "Or": lambda v: {"out": v["a"] | v["b"]},
+    "Xor": lambda v: {"out": v["a"] ^ v["b"]},
+    "Mux": lambda v: {"out": np.where(v["sel"] == ONE, v["b"], v["a"])},
+    "DMux": lambda v: demultiplexed(v, "ab"),
+    "DMux4Way": lambda v: demultiplexed(v, "abcd"),
+    "DMux8Way": lambda v: demultiplexed(v, "abcdefgh"),
+    "Or8Way": lambda v: {"out": (v["in"] != 0).astype(np.uint64)},
+    "HalfAdder": lambda v: {"sum": v["a"] ^ v["b"], "carry": v["a"] & v["b"]},
+    "FullAdder": lambda v: {"sum": (v["a"] + v["b"] + v["c"]) & ONE, "carry": (v["a"] + v["b"] + v["c"]) >> ONE},
+    "Not16": lambda v: {"out": v["in"] ^ MASK},
+    "And16": lambda v: {"out": v["a"] & v["b"]},
+    "Or16": lambda v: {"out": v["a"] | v["b"]},
+    "Mux16": lambda v: {"out": np.where(v["sel"] == ONE, v["b"], v["a"])},
+    "Mux4Way16": lambda v: {"out": np.choose(v["sel"].astype(np.int64), [v[name] for name in "abcd"])},
+    "Mux8Way16": lambda v: {"out": np.choose(v["sel"].astype(np.int64), [v[name] for name in "abcdefgh"])},
+    "Add16": lambda v: {"out": (v["a"] + v["b"]) & MASK},
+    "Inc16": lambda v: {"out": (v["in"] + ONE) & MASK},
+    "ALU": numpy_alu,
+}
+
+
+def alu(x: int, y: int, zx: int, nx: int, zy: int, ny: int, f: int, no: int) -> tuple[int, int, int]:
+    if zx:
+        x = 0
+    if nx:
+        x ^= 0xFFFF
+    if zy:
+        y = 0
+    if ny:
+        y ^= 0xFFFF
+    out = (x + y) & 0xFFFF if f else x & y
+    if no:
+        out ^= 0xFFFF
+    return out, int(out == 0), out >> 15
+
+
+def check_alu(rng: random.Random) -> bool:
+    chip = simulate("ALU")
+    pins = ["x", "y", "zx", "nx", "zy", "ny", "f", "no"]
+    for _ in range(ALU_VECTORS):
+        values = [rng.getrandbits(16), rng.getrandbits(16)] + [rng.getrandbits(1) for _ in range(6)]
+        for pin, value in zip(pins, values):
+            chip.set(pin, value)
+        if (chip.get("out"), chip.get("zr"), chip.get("ng")) != alu(*values):
+            return False
+    return True
+
+
+def check_sliced(rng: random.Random) -> bool:
+    generator = np.random.default_rng(rng.getrandbits(32))
+    same = True
+    for name, model in MODELS.items():
+        chip = simulate_sliced(name)
+        widths = {pin: len(nets) for pin, nets in chip.netlist.inputs.items()}
+        total = sum(widths.values())
+        if total <= EXHAUSTIVE_BITS:
+            vectors = np.arange(1 << total, dtype=np.uint64)
+            values, shift = {}, 0
+            for pin, width in widths.items():
+                values[pin] = (vectors >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+                shift += width
+        else:
+            values = {
+                pin: generator.integers(0, 1 << width, RANDOM_VECTORS, dtype=np.uint64) for pin, width in widths.items()
+            }
+
+        start = time.perf_counter()
+        outputs = chip.run(values)
+        seconds = time.perf_counter() - start
+        expected = model(values)
+        matches = all(np.array_equal(outputs[pin], expected[pin]) for pin in outputs)
+        count = len(next(iter(values.values())))
+        kind = "exhaustive" if total <= EXHAUSTIVE_BITS else "random"
+        print(f"{name}: {count} {kind} vectors, {count / seconds:,.0f} per second{'' if matches else ', MISMATCH'}")
+        same = same and matches
+    return same
+
+
+def check_builtins() -> bool:
+    differences = [check_builtin(chip) for chip in BEHAVIORAL_CHIPS]
+    for difference in differences:
+        if difference:
+            print(difference)
+    return not any(differences)
+
+
+def check_computer(rng: random.Random) -> bool:
+    machine_code = assemble(os.path.join(ROOT, "project-04", "Mult.asm"))
+    same = True
+    cycles = 0
+    start = time.perf_counter()
+    for _ in range(MULT_RUNS):
+        r0, r1 = rng.randint(-1000, 1000), rng.randint(0, 100)
+        emulator = Emulator(machine_code)
+        emulator.ram[0], emulator.ram[1] = r0, r1
+        emulator.run()
+
+        # The reset cycle runs first, so R0 and R1 are set up front.
+        computer = run_computer(machine_code, 0)
+        ram = computer.builtin("RAM16K").memory
+        ram[0], ram[1] = r0 & 0xFFFF, r1
+        computer.run(emulator.cycles)
+        cycles += emulator.cycles
+        same = same and list(ram[:16]) == [value & 0xFFFF for value in emulator.ram[:16]]
+
+    seconds = time.perf_counter() - start
+    print(f"Computer.hdl ran Mult.asm for {cycles} cycles in {seconds:.2f}s")
+    return same
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    error_found = not check_alu(rng)
+    error_found = not check_sliced(rng) or error_found
+    error_found = not check_builtins() or error_found
+    error_found = not check_computer(rng) or error_found
+    print("Error found" if error_found else "No errors found!")
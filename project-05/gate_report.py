@@ -0,0 +1,175 @@
+"""
+Hardware cost of an HDL chip: Nand-equivalent gate counts and the depth of
+its longest combinational paths, for the chip and for each of its parts.
+
+Depth is counted in Nands, the only combinational primitive, so chips built
+differently from the same Nands can be compared on delay. Paths start at the
+chip inputs or at register outputs, and end at the chip outputs or register
+inputs; the DFFs and builtin chips are the registers, so a path never runs
+through them. A DFF counts as six Nands, the edge-triggered flip-flop built
+from three latches.
+
+Usage: python gate_report.py CHIP [--levels N] [--builtins CHIP,...]
+
+Parts are listed N levels deep, 1 by default. The builtins replace the HDL of
+chips that are too large to flatten, such as RAM16K.
+"""
+
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from hdl_simulator import ChipLibrary, Netlist, flatten
+
+DFF_NANDS = 6
+PATH_KINDS = ("input to output", "input to register", "register to register", "register to output")
+
+
+@dataclass
+class Timing:
+    """The longest path of each kind, as its depth and its Nands, from first to last."""
+
+    depths: dict[str, int]
+    paths: dict[str, list[int]]
+
+
+def nand_order(netlist: Netlist) -> list[int]:
+    """Every Nand, each after the Nands driving its inputs."""
+    drivers = {out: index for index, (_, _, out) in enumerate(netlist.nands)}
+    users: dict[int, list[int]] = {}
+    waiting = []
+    for index, (a, b, _) in enumerate(netlist.nands):
+        sources = {net for net in (a, b) if net in drivers}
+        waiting.append(len(sources))
+        for net in sources:
+            users.setdefault(drivers[net], []).append(index)
+
+    ready = [index for index, count in enumerate(waiting) if count == 0]
+    order = []
+    while ready:
+        index = ready.pop()
+        order.append(index)
+        for user in users.get(index, ()):
+            waiting[user] -= 1
+            if waiting[user] == 0:
+                ready.append(user)
+    if len(order) != len(netlist.nands):
+        raise ValueError(f"{netlist.name}: combinational loop")
+    return order
+
+
+def longest_paths(netlist: Netlist, order: list[int], starts: set[int]) -> tuple[dict[int, int], dict[int, int]]:
+    """
+    For every net reachable from `starts`, the most Nands on a path to it,
+    and the Nand ending that path.
+    """
+    depths = dict.fromkeys(starts, 0)
+    last: dict[int, int] = {}
+    for index in order:
+        a, b, out = netlist.nands[index]
+        if a in depths or b in depths:
+            source = a if depths.get(a, -1) >= depths.get(b, -1) else b
+            depths[out] = depths[source] + 1
+            last[out] = index
+    return depths, last
+
+
+def timing(netlist: Netlist) -> Timing:
+    order = nand_order(netlist)
+    inputs = {net for nets in netlist.inputs.values() for net in nets}
+    outputs = {net for nets in netlist.outputs.values() for net in nets}
+    register_outputs = {out for _, out in netlist.dffs}
+    register_outputs |= {net for instance in netlist.builtins for nets in instance.outputs for net in nets}
+    register_inputs = {net_in for net_in, _ in netlist.dffs}
+    register_inputs |= {net for instance in netlist.builtins for nets in instance.inputs for net in nets}
+
+    depths, paths = {}, {}
+    for kind in PATH_KINDS:
+        start, end = kind.split(" to ")
+        reached, last = longest_paths(netlist, order, inputs if start == "input" else register_outputs)
+        ends = [net for net in (outputs if end == "output" else register_inputs) if net in reached]
+        if not ends:
+            continue
+        net = max(ends, key=reached.__getitem__)
+        depths[kind] = reached[net]
+        path = []
+        while net in last:
+            path.append(last[net])
+            a, b, _ = netlist.nands[last[net]]
+            net = a if reached.get(a, -1) >= reached.get(b, -1) else b
+        paths[kind] = path[::-1]
+    return Timing(depths, paths)
+
+
+def part_path(path: str, level: int) -> str:
+    """The first `level` parts of an instance path, without the chip itself."""
+    return "/".join(path.split("/")[1 : level + 1])
+
+
+def describe_path(netlist: Netlist, nands: list[int], level: int) -> str:
+    """The parts a path goes through, each with the number of its Nands on the path."""
+    steps: list[tuple[str, int]] = []
+    for index in nands:
+        part = part_path(netlist.nand_paths[index], level) or netlist.name
+        if steps and steps[-1][0] == part:
+            steps[-1] = (part, steps[-1][1] + 1)
+        else:
+            steps.append((part, 1))
+    return " -> ".join(f"{part} ({count})" for part, count in steps)
+
+
+def chip_name(part: str) -> str:
+    return part.rsplit("/", 1)[-1].split("#")[0]
+
+
+def report(name: str, levels: int = 1, builtins: tuple[str, ...] = ()):
+    library = ChipLibrary(builtins)
+    netlist = flatten(name, library)
+    nands, dffs = len(netlist.nands), len(netlist.dffs)
+    print(f"{name}: {nands} Nands, {dffs} DFFs, {nands + DFF_NANDS * dffs} Nand-equivalent")
+    if netlist.builtins:
+        names = ", ".join(sorted({chip_name(instance.name) for instance in netlist.builtins}))
+        print(f"  not counted: {len(netlist.builtins)} builtin chips ({names})")
+
+    chip_timing = timing(netlist)
+    print("Longest combinational paths, in Nands:")
+    for kind in PATH_KINDS:
+        if kind in chip_timing.depths:
+            print(f"  {kind:<20} {chip_timing.depths[kind]:>5}")
+    for kind, path in chip_timing.paths.items():
+        if path:
+            print(f"Critical {kind} path: {describe_path(netlist, path, levels)}")
+
+    part_nands = Counter(part_path(path, levels) for path in netlist.nand_paths)
+    part_dffs = Counter(part_path(path, levels) for path in netlist.dff_paths)
+    parts = sorted(
+        set(part_nands) | set(part_dffs), key=lambda part: (-(part_nands[part] + DFF_NANDS * part_dffs[part]), part)
+    )
+    print("Parts:")
+    print(f"  {'Nands':>7} {'DFFs':>6} {'equiv':>7} {'depth':>6}  instance")
+    depths: dict[str, Optional[int]] = {}
+    for part in parts:
+        if not part:
+            continue
+        chip = chip_name(part)
+        if chip not in depths:
+            # A part's depth is its own longest path of any kind, as a chip of its own.
+            if chip in ("Nand", "DFF"):
+                depths[chip] = int(chip == "Nand")
+            else:
+                depths[chip] = max(timing(flatten(chip, library)).depths.values(), default=None)
+        depth = "-" if depths[chip] is None else str(depths[chip])
+        equivalent = part_nands[part] + DFF_NANDS * part_dffs[part]
+        print(f"  {part_nands[part]:>7} {part_dffs[part]:>6} {equivalent:>7} {depth:>6}  {part}")
+
+
+def option(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--"):
+        print("Usage: python gate_report.py CHIP [--levels N] [--builtins CHIP,...]")
+    else:
+        builtins = tuple(chip for chip in option("--builtins", "").split(",") if chip)
+        report(sys.argv[1], int(option("--levels", "1")), builtins)
@@ -0,0 +1,842 @@
+"""
+Simulator for the HDL chips of projects 1 to 5.
+
+Chips are parsed from the .hdl files of all five projects, so a part is found
+whatever project defines it. A chip is flattened into a net list of Nand
+gates, DFFs and builtin chips, with every bus split into single-bit nets, and
+the combinational gates are sorted so that each comes after the gates feeding
+it. The sorted net list is then compiled into a Python function that computes
+every net once per clock cycle, so simulating a cycle runs straight-line code
+instead of walking the net list.
+
+Combinational chips can also be compiled bit-sliced: every net then holds a
+word whose bit positions are independent test vectors, so one evaluation
+checks 64 vectors per Python int, or a whole NumPy uint64 array of them.
+
+Builtin chips are those the book's simulator provides too: Nand and DFF, the
+ROM32K, Screen and Keyboard that have no HDL, and the behavioral Bit,
+Register, PC and RAM chips that replace their HDL when asked for. A RAM16K
+built from 16K registers of DFFs is far too slow to simulate, so Computer.hdl
+runs with the builtin one. Each behavioral chip is checked against its HDL,
+itself built from the behavioral versions of its parts, on a random trace.
+
+Usage: python hdl_simulator.py PROGRAM.asm [CYCLES]
+       python hdl_simulator.py --check-builtins [CYCLES]
+
+The first runs PROGRAM on Computer.hdl and prints R0 to R15, the second
+checks every behavioral chip.
+"""
+
+import os
+import random
+import re
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # only needed for bit-sliced runs over arrays
+    np = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HDL_DIRECTORIES = [os.path.join(ROOT, f"project-0{number}") for number in range(1, 6)]
+ALIASES = {"ARegister": "Register", "DRegister": "Register"}  # the CPU's registers are plain ones
+
+FALSE, TRUE = 0, 1  # the nets of the constants
+
+TOKEN = re.compile(r"\w+|\.\.|\S")
+
+
+# --- Parsing ---
+
+
+@dataclass
+class Pin:
+    name: str
+    width: int = 1
+
+
+@dataclass
+class Connection:
+    """`inner[inner_range]=outer[outer_range]` in a part; a range of None is the whole bus."""
+
+    inner: str
+    inner_range: Optional[tuple[int, int]]
+    outer: str
+    outer_range: Optional[tuple[int, int]]
+
+
+@dataclass
+class Part:
+    chip: str
+    connections: list[Connection]
+
+
+@dataclass
+class Chip:
+    name: str
+    inputs: list[Pin]
+    outputs: list[Pin]
+    parts: list[Part]
+
+
+class HDLParser:
+    def __init__(self, code: str, file_name: str = "<hdl>"):
+        code = re.sub(r"/\*.*?\*/", " ", code, flags=re.DOTALL)
+        code = re.sub(r"//[^\n]*", " ", code)
+        self.tokens = TOKEN.findall(code)
+        self.index = 0
+        self.file_name = file_name
+
+    def peek(self) -> str:
+        return self.tokens[self.index] if self.index < len(self.tokens) else ""
+
+    def next(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if expected is not None and token != expected:
+            raise SyntaxError(f"{self.file_name}: expected '{expected}', got '{token}'")
+        if not token:
+            raise SyntaxError(f"{self.file_name}: unexpected end of file")
+        self.index += 1
+        return token
+
+    def parse(self) -> Chip:
+        self.next("CHIP")
+        name = self.next()
+        self.next("{")
+        inputs = self.pins("IN") if self.peek() == "IN" else []
+        outputs = self.pins("OUT") if self.peek() == "OUT" else []
+        if self.peek() != "PARTS":
+            raise SyntaxError(f"{self.file_name}: only PARTS implementations are supported, got '{self.peek()}'")
+        self.next("PARTS")
+        self.next(":")
+        parts = []
+        while self.peek() != "}":
+            parts.append(self.part())
+        self.next("}")
+        return Chip(name, inputs, outputs, parts)
+
+    def pins(self, keyword: str) -> list[Pin]:
+        self.next(keyword)
+        pins = []
+        while True:
+            pin = Pin(self.next())
+            if self.peek() == "[":
+                self.next("[")
+                pin.width = int(self.next())
+                self.next("]")
+            pins.append(pin)
+            if self.next() == ";":
+                return pins
+
+    def part(self) -> Part:
+        chip = self.next()
+        self.next("(")
+        connections = []
+        while True:
+            inner, inner_range = self.pin_reference()
+            self.next("=")
+            outer, outer_range = self.pin_reference()
+            connections.append(Connection(inner, inner_range, outer, outer_range))
+            if self.next() == ")":
+                break
+        self.next(";")
+        return Part(chip, connections)
+
+    def pin_reference(self) -> tuple[str, Optional[tuple[int, int]]]:
+        name = self.next()
+        if self.peek() != "[":
+            return name, None
+        self.next("[")
+        low = high = int(self.next())
+        if self.peek() == "..":
+            self.next("..")
+            high = int(self.next())
+        self.next("]")
+        return name, (low, high)
+
+
+# --- Builtin chips ---
+
+
+class BuiltinChip(ABC):
+    """
+    A chip simulated in Python. `READS` are the inputs its outputs depend on
+    within a cycle; `read` gets their values and returns the outputs in
+    `OUTPUTS` order. `clock` gets every input at the end of a cycle.
+    """
+
+    INPUTS: list[Pin] = []
+    OUTPUTS: list[Pin] = []
+    READS: list[str] = []
+
+    @abstractmethod
+    def read(self, *values: int) -> list[int]: ...
+
+    def clock(self, *values: int):
+        pass
+
+
+class RAM(BuiltinChip):
+    """Memory with one 16-bit word per address: `out` is the word at `address`."""
+
+    def __init__(self, address_width: int):
+        self.INPUTS = [Pin("in", 16), Pin("load"), Pin("address", address_width)]
+        self.OUTPUTS = [Pin("out", 16)]
+        self.READS = ["address"]
+        self.memory = array("H", bytes(2 << address_width))
+
+    def read(self, address: int) -> list[int]:
+        return [self.memory[address]]
+
+    def clock(self, value: int, load: int, address: int):
+        if load:
+            self.memory[address] = value
+
+
+class ROM32K(BuiltinChip):
+    INPUTS = [Pin("address", 15)]
+    OUTPUTS = [Pin("out", 16)]
+    READS = ["address"]
+
+    def __init__(self):
+        self.memory = array("H", bytes(2 << 15))
+
+    def load(self, machine_code: list[str]):
+        for address, word in enumerate(machine_code):
+            self.memory[address] = int(word, 2)
+
+    def read(self, address: int) -> list[int]:
+        return [self.memory[address]]
+
+
+class Keyboard(BuiltinChip):
+    OUTPUTS = [Pin("out", 16)]
+
+    def __init__(self):
+        self.key = 0
+
+    def read(self) -> list[int]:
+        return [self.key]
+
+
+class Register(BuiltinChip):
+    """A register of `width` bits: `out` is the stored value, replaced by `in` at the end of a cycle with `load`."""
+
+    def __init__(self, width: int = 16):
+        self.INPUTS = [Pin("in", width), Pin("load")]
+        self.OUTPUTS = [Pin("out", width)]
+        self.memory = array("H", [0])
+
+    def read(self) -> list[int]:
+        return [self.memory[0]]
+
+    def clock(self, value: int, load: int):
+        if load:
+            self.memory[0] = value
+
+
+class PC(BuiltinChip):
+    INPUTS = [Pin("in", 16), Pin("reset"), Pin("load"), Pin("inc")]
+    OUTPUTS = [Pin("out", 16)]
+
+    def __init__(self):
+        self.memory = array("H", [0])
+
+    def read(self) -> list[int]:
+        return [self.memory[0]]
+
+    def clock(self, value: int, reset: int, load: int, inc: int):
+        if reset:
+            self.memory[0] = 0
+        elif load:
+            self.memory[0] = value
+        elif inc:
+            self.memory[0] = (self.memory[0] + 1) & 0xFFFF
+
+
+BUILTIN_CHIPS: dict[str, Callable[[], BuiltinChip]] = {
+    "ROM32K": ROM32K,
+    "Screen": lambda: RAM(13),
+    "Keyboard": Keyboard,
+    "Bit": lambda: Register(1),
+    "Register": Register,
+    "PC": PC,
+    "RAM8": lambda: RAM(3),
+    "RAM64": lambda: RAM(6),
+    "RAM512": lambda: RAM(9),
+    "RAM4K": lambda: RAM(12),
+    "RAM16K": lambda: RAM(14),
+}
+BEHAVIORAL_CHIPS = ("Bit", "Register", "PC", "RAM8", "RAM64", "RAM512", "RAM4K", "RAM16K")  # have HDL too
+PRIMITIVES = {
+    "Nand": ([Pin("a"), Pin("b")], [Pin("out")]),
+    "DFF": ([Pin("in")], [Pin("out")]),
+}
+
+
+class ChipLibrary:
+    """
+    Finds chips by name: the primitives, the builtin chips named in
+    `builtins` or without an HDL file, then the .hdl files of `directories`.
+    """
+
+    def __init__(self, builtins: tuple[str, ...] = (), directories: list[str] = HDL_DIRECTORIES):
+        self.builtins = set(builtins)
+        self.files = {}
+        for directory in directories:
+            for file_name in sorted(os.listdir(directory)):
+                if file_name.endswith(".hdl"):
+                    self.files[file_name[:-4]] = os.path.join(directory, file_name)
+        self.chips: dict[str, Chip] = {}
+
+    def is_builtin(self, name: str) -> bool:
+        return name in BUILTIN_CHIPS and (name in self.builtins or name not in self.files)
+
+    def chip(self, name: str) -> Chip:
+        name = ALIASES.get(name, name)
+        if name not in self.chips:
+            if name not in self.files:
+                raise ValueError(f"Chip {name} not found")
+            with open(self.files[name], "r") as file:
+                self.chips[name] = HDLParser(file.read(), self.files[name]).parse()
+        return self.chips[name]
+
+    def pins(self, name: str) -> tuple[list[Pin], list[Pin]]:
+        if name in PRIMITIVES:
+            return PRIMITIVES[name]
+        if self.is_builtin(name):
+            chip = BUILTIN_CHIPS[name]()
+            return chip.INPUTS, chip.OUTPUTS
+        chip = self.chip(name)
+        return chip.inputs, chip.outputs
+
+
+# --- Flattening ---
+
+
+@dataclass
+class BuiltinInstance:
+    name: str
+    chip: BuiltinChip
+    inputs: list[list[int]]  # nets of each pin, in INPUTS order
+    outputs: list[list[int]]
+
+
+@dataclass
+class Netlist:
+    """
+    Single-bit nets numbered from 0, with 0 and 1 the constants false and
+    true. Every net is driven by exactly one of: a constant, a chip input,
+    a Nand, a DFF or a builtin chip output.
+    """
+
+    name: str
+    net_count: int
+    inputs: dict[str, list[int]]
+    outputs: dict[str, list[int]]
+    nands: list[tuple[int, int, int]]  # a, b, out
+    dffs: list[tuple[int, int]]  # in, out
+    builtins: list[BuiltinInstance]
+    nand_paths: list[str] = field(default_factory=list)  # instance path of each Nand, like CPU/ALU#13/Nand#0
+    dff_paths: list[str] = field(default_factory=list)
+
+
+class Flattener:
+    def __init__(self, library: ChipLibrary):
+        self.library = library
+        self.parents = [FALSE, TRUE]  # union-find over nets joined by connections
+        self.nands: list[tuple[int, int, int]] = []
+        self.dffs: list[tuple[int, int]] = []
+        self.builtins: list[BuiltinInstance] = []
+        self.nand_paths: list[str] = []
+        self.dff_paths: list[str] = []
+
+    def new_nets(self, count: int) -> list[int]:
+        start = len(self.parents)
+        self.parents += range(start, start + count)
+        return list(range(start, start + count))
+
+    def find(self, net: int) -> int:
+        root = net
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[net] != root:
+            self.parents[net], net = root, self.parents[net]
+        return root
+
+    def join(self, first: int, second: int):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            # Keep the constants as roots, so they stay recognizable.
+            if first in (FALSE, TRUE):
+                first, second = second, first
+            self.parents[first] = second
+
+    def flatten(self, name: str) -> Netlist:
+        inputs, outputs = self.library.pins(name)
+        input_nets = {pin.name: self.new_nets(pin.width) for pin in inputs}
+        output_nets = {pin.name: self.new_nets(pin.width) for pin in outputs}
+        self.instantiate(name, {**input_nets, **output_nets}, name)
+
+        find = self.find
+        return Netlist(
+            name,
+            len(self.parents),
+            {pin: [find(net) for net in nets] for pin, nets in input_nets.items()},
+            {pin: [find(net) for net in nets] for pin, nets in output_nets.items()},
+            [(find(a), find(b), find(out)) for a, b, out in self.nands],
+            [(find(net_in), find(out)) for net_in, out in self.dffs],
+            [
+                BuiltinInstance(
+                    instance.name,
+                    instance.chip,
+                    [[find(net) for net in nets] for nets in instance.inputs],
+                    [[find(net) for net in nets] for nets in instance.outputs],
+                )
+                for instance in self.builtins
+            ],
+            self.nand_paths,
+            self.dff_paths,
+        )
+
+    def instantiate(self, name: str, pins: dict[str, list[int]], path: str):
+        """Adds chip `name` whose pins are the nets `pins`, every bit of every pin."""
+        if name == "Nand":
+            self.nands.append((pins["a"][0], pins["b"][0], pins["out"][0]))
+            self.nand_paths.append(path)
+            return
+        if name == "DFF":
+            self.dffs.append((pins["in"][0], pins["out"][0]))
+            self.dff_paths.append(path)
+            return
+        if self.library.is_builtin(name):
+            chip = BUILTIN_CHIPS[name]()
+            self.builtins.append(
+                BuiltinInstance(
+                    path, chip, [pins[pin.name] for pin in chip.INPUTS], [pins[pin.name] for pin in chip.OUTPUTS]
+                )
+            )
+            return
+
+        chip = self.library.chip(name)
+        internal: dict[str, list[int]] = {}
+        for number, part in enumerate(chip.parts):
+            part_inputs, part_outputs = self.library.pins(part.chip)
+            widths = {pin.name: pin.width for pin in part_inputs + part_outputs}
+            part_pins = {pin.name: [FALSE] * pin.width for pin in part_inputs}
+            part_pins.update({pin.name: self.new_nets(pin.width) for pin in part_outputs})
+            is_output = {pin.name for pin in part_outputs}
+
+            for connection in part.connections:
+                where = f"{path}: {part.chip}({connection.inner}=...)"
+                if connection.inner not in widths:
+                    raise ValueError(f"{where}: {part.chip} has no pin {connection.inner}")
+                low, high = connection.inner_range or (0, widths[connection.inner] - 1)
+                if not 0 <= low <= high < widths[connection.inner]:
+                    raise ValueError(f"{where}: bits {low}..{high} out of range")
+                nets = self.outer_nets(chip, connection, high - low + 1, pins, internal, where)
+
+                inner = part_pins[connection.inner]
+                for offset, net in enumerate(nets):
+                    if connection.inner in is_output:
+                        if net in (FALSE, TRUE):
+                            raise ValueError(f"{where}: cannot drive a constant")
+                        self.join(inner[low + offset], net)
+                    else:
+                        inner[low + offset] = net
+
+            self.instantiate(ALIASES.get(part.chip, part.chip), part_pins, f"{path}/{part.chip}#{number}")
+
+    def outer_nets(
+        self,
+        chip: Chip,
+        connection: Connection,
+        width: int,
+        pins: dict[str, list[int]],
+        internal: dict[str, list[int]],
+        where: str,
+    ) -> list[int]:
+        outer = connection.outer
+        if outer in ("true", "false"):
+            return [TRUE if outer == "true" else FALSE] * width
+        if outer in pins:
+            low, high = connection.outer_range or (0, len(pins[outer]) - 1)
+            nets = pins[outer][low : high + 1]
+        else:
+            if connection.outer_range is not None:
+                raise ValueError(f"{where}: internal pin {outer} cannot be subscripted")
+            nets = internal.setdefault(outer, self.new_nets(width))
+        if len(nets) != width:
+            raise ValueError(f"{where}: {width} bits connected to {len(nets)} bits of {outer}")
+        return nets
+
+
+def flatten(name: str, library: ChipLibrary) -> Netlist:
+    return Flattener(library).flatten(name)
+
+
+# --- Compiling ---
+
+
+def sort_gates(netlist: Netlist) -> list[tuple[str, int]]:
+    """
+    The Nands and builtin reads, as ("nand", index) and ("builtin", index),
+    ordered so that every net is computed before it is used. Only the gates
+    that outputs, DFFs or builtin chips depend on are kept.
+    """
+    drivers: dict[int, tuple[str, int]] = {}
+    for index, (_, _, out) in enumerate(netlist.nands):
+        if out in drivers:
+            raise ValueError(f"{netlist.name}: a net is driven twice")
+        drivers[out] = ("nand", index)
+    for index, instance in enumerate(netlist.builtins):
+        for nets in instance.outputs:
+            for net in nets:
+                if net in drivers:
+                    raise ValueError(f"{netlist.name}: a net is driven twice")
+                drivers[net] = ("builtin", index)
+
+    def sources(gate: tuple[str, int]) -> list[int]:
+        kind, index = gate
+        if kind == "nand":
+            return list(netlist.nands[index][:2])
+        instance = netlist.builtins[index]
+        reads = [pin.name for pin in instance.chip.INPUTS]
+        return [net for pin in instance.chip.READS for net in instance.inputs[reads.index(pin)]]
+
+    needed = [net for nets in netlist.outputs.values() for net in nets]
+    needed += [net_in for net_in, _ in netlist.dffs]
+    needed += [net for instance in netlist.builtins for nets in instance.inputs for net in nets]
+    needed += [net for instance in netlist.builtins for nets in instance.outputs for net in nets]
+
+    order: list[tuple[str, int]] = []
+    state: dict[tuple[str, int], bool] = {}  # False while being visited, True when done
+    for root in needed:
+        if root not in drivers:
+            continue
+        stack = [(drivers[root], False)]
+        while stack:
+            gate, expanded = stack.pop()
+            if expanded:
+                state[gate] = True
+                order.append(gate)
+                continue
+            if gate in state:
+                if not state[gate]:
+                    raise ValueError(f"{netlist.name}: combinational loop")
+                continue
+            state[gate] = False
+            stack.append((gate, True))
+            for net in sources(gate):
+                if net in drivers:
+                    source = drivers[net]
+                    if state.get(source) is False:
+                        raise ValueError(f"{netlist.name}: combinational loop")
+                    if source not in state:
+                        stack.append((source, False))
+    return order
+
+
+def bus(nets: list[int], value: Callable[[int], str]) -> str:
+    """Python expression joining the bits `nets`, least significant first, into an integer."""
+    return " | ".join(value(net) if bit == 0 else f"{value(net)} << {bit}" for bit, net in enumerate(nets)) or "0"
+
+
+class GateWriter:
+    """
+    Writes the gates of `netlist` as Python statements, one variable per net,
+    folding Nands with constant inputs. `one` is the expression of a true net.
+    """
+
+    def __init__(self, netlist: Netlist, one: str = "1"):
+        self.netlist = netlist
+        self.one = one
+        self.constants = {FALSE: False, TRUE: True}
+        self.defined = {net for nets in netlist.inputs.values() for net in nets}
+        self.defined.update(out for _, out in netlist.dffs)
+        self.defined.update(net for instance in netlist.builtins for nets in instance.outputs for net in nets)
+        self.defined.update(out for _, _, out in netlist.nands)
+
+    def value(self, net: int) -> str:
+        if net in self.constants:
+            return self.one if self.constants[net] else "0"
+        if net not in self.defined:
+            raise ValueError(f"{self.netlist.name}: a pin is used but never driven")
+        return f"n{net}"
+
+    def nand(self, index: int) -> Optional[str]:
+        """The statement computing Nand `index`, or None if its output is constant."""
+        a, b, out = self.netlist.nands[index]
+        constants = self.constants
+        if constants.get(a) is False or constants.get(b) is False:
+            constants[out] = True
+        elif a in constants and b in constants:
+            constants[out] = False
+        elif a in constants or b in constants or a == b:
+            return f"n{out} = {self.one} ^ {self.value(b if a in constants else a)}"
+        else:
+            return f"n{out} = {self.one} ^ (n{a} & n{b})"
+        return None
+
+
+def generate_code(netlist: Netlist) -> str:
+    """
+    Source of `evaluate(inputs, state, chips)`, which computes a cycle from
+    the input pin values and DFF outputs `state`. It returns the output pin
+    values, the DFF inputs and, for each builtin chip, its input pin values.
+    """
+    writer = GateWriter(netlist)
+    value = writer.value
+
+    lines = ["def evaluate(inputs, state, chips):"]
+    for index, nets in enumerate(netlist.inputs.values()):
+        lines.append(f"    pin = inputs[{index}]")
+        for bit, net in enumerate(nets):
+            lines.append(f"    n{net} = pin >> {bit} & 1" if bit else f"    n{net} = pin & 1")
+    for index, (_, out) in enumerate(netlist.dffs):
+        lines.append(f"    n{out} = state[{index}]")
+
+    for kind, index in sort_gates(netlist):
+        if kind == "nand":
+            statement = writer.nand(index)
+            if statement:
+                lines.append(f"    {statement}")
+        else:
+            instance = netlist.builtins[index]
+            pins = [pin.name for pin in instance.chip.INPUTS]
+            arguments = ", ".join(bus(instance.inputs[pins.index(pin)], value) for pin in instance.chip.READS)
+            lines.append(f"    values = chips[{index}].read({arguments})")
+            for number, nets in enumerate(instance.outputs):
+                lines.append(f"    pin = values[{number}]")
+                for bit, net in enumerate(nets):
+                    lines.append(f"    n{net} = pin >> {bit} & 1")
+
+    outputs = ", ".join(bus(nets, value) for nets in netlist.outputs.values())
+    dff_inputs = ", ".join(value(net_in) for net_in, _ in netlist.dffs)
+    chip_inputs = ", ".join(
+        "(" + "".join(f"{bus(nets, value)}, " for nets in instance.inputs) + ")" for instance in netlist.builtins
+    )
+    lines.append(f"    return [{outputs}], [{dff_inputs}], [{chip_inputs}]")
+    return "\n".join(lines) + "\n"
+
+
+def generate_sliced_code(netlist: Netlist) -> str:
+    """
+    Source of `evaluate(inputs, ones)` for a combinational chip, bit-sliced:
+    `inputs` holds a word per input bit, in pin order, and each bit position
+    of the words is a separate test vector. `ones` is the word with every
+    position set. It returns a word per output bit.
+    """
+    if netlist.dffs or netlist.builtins:
+        raise ValueError(f"{netlist.name} is not combinational")
+    writer = GateWriter(netlist, "ones")
+
+    lines = ["def evaluate(inputs, ones):"]
+    bits = [net for nets in netlist.inputs.values() for net in nets]
+    for index, net in enumerate(bits):
+        lines.append(f"    n{net} = inputs[{index}]")
+    for _, index in sort_gates(netlist):
+        statement = writer.nand(index)
+        if statement:
+            lines.append(f"    {statement}")
+    outputs = ", ".join(writer.value(net) for nets in netlist.outputs.values() for net in nets)
+    lines.append(f"    return [{outputs}]")
+    return "\n".join(lines) + "\n"
+
+
+class Simulation:
+    """
+    Runs a compiled chip. Input pins are set with `set`, outputs read with
+    `get`, and `tick` ends the clock cycle, updating the DFFs and builtin
+    chips from the values the cycle computed.
+    """
+
+    def __init__(self, netlist: Netlist):
+        self.netlist = netlist
+        self.input_pins = {pin: index for index, pin in enumerate(netlist.inputs)}
+        self.output_pins = {pin: index for index, pin in enumerate(netlist.outputs)}
+        self.inputs = [0] * len(netlist.inputs)
+        self.state = [0] * len(netlist.dffs)
+        self.chips = [instance.chip for instance in netlist.builtins]
+        self.cycles = 0
+
+        namespace: dict = {}
+        exec(compile(generate_code(netlist), f"<{netlist.name}>", "exec"), namespace)
+        self.evaluate: Callable = namespace["evaluate"]
+        self.result: Optional[tuple] = None
+
+    def builtin(self, name: str) -> BuiltinChip:
+        """The first builtin chip named `name`, such as ROM32K."""
+        for instance in self.netlist.builtins:
+            if instance.name.rsplit("/", 1)[-1].split("#")[0] == name:
+                return instance.chip
+        raise KeyError(name)
+
+    def set(self, pin: str, value: int):
+        width = len(self.netlist.inputs[pin])
+        self.inputs[self.input_pins[pin]] = value & ((1 << width) - 1)
+        self.result = None
+
+    def get(self, pin: str) -> int:
+        if self.result is None:
+            self.result = self.evaluate(self.inputs, self.state, self.chips)
+        return self.result[0][self.output_pins[pin]]
+
+    def tick(self):
+        if self.result is None:
+            self.result = self.evaluate(self.inputs, self.state, self.chips)
+        _, self.state, chip_inputs = self.result
+        for chip, values in zip(self.chips, chip_inputs):
+            chip.clock(*values)
+        self.cycles += 1
+        self.result = None
+
+    def run(self, cycles: int):
+        evaluate, inputs, chips = self.evaluate, self.inputs, self.chips
+        state = self.state
+        for _ in range(cycles):
+            _, state, chip_inputs = evaluate(inputs, state, chips)
+            for chip, values in zip(chips, chip_inputs):
+                chip.clock(*values)
+        self.state = state
+        self.cycles += cycles
+        self.result = None
+
+
+LANES = 64  # test vectors in a uint64 word
+
+
+class SlicedSimulation:
+    """
+    Evaluates a combinational chip on many test vectors at once. Every net is
+    a word, a Python int or a NumPy uint64 array, and each bit position of the
+    words is an independent vector, so a Nand costs one `&` and one `^` for
+    all of them.
+    """
+
+    def __init__(self, netlist: Netlist):
+        self.netlist = netlist
+        namespace: dict = {}
+        exec(compile(generate_sliced_code(netlist), f"<{netlist.name} sliced>", "exec"), namespace)
+        self.function: Callable = namespace["evaluate"]
+
+    def evaluate(self, inputs: dict[str, list], ones) -> dict[str, list]:
+        """
+        `inputs` maps every input pin to a word per bit, least significant
+        first, and `ones` is the word with all positions set, such as
+        (1 << 64) - 1. Returns a word per bit of every output pin.
+        """
+        words = []
+        for pin, nets in self.netlist.inputs.items():
+            if len(inputs[pin]) != len(nets):
+                raise ValueError(f"{pin} needs {len(nets)} words, got {len(inputs[pin])}")
+            words += inputs[pin]
+        results = iter(self.function(words, ones))
+        return {pin: [next(results) for _ in nets] for pin, nets in self.netlist.outputs.items()}
+
+    def run(self, values: dict[str, "np.ndarray"]) -> dict[str, "np.ndarray"]:
+        """
+        Evaluates one vector per entry of the equally long arrays `values`,
+        the value of each input pin, and returns the value of each output pin.
+        """
+        if np is None:
+            raise ImportError("Running vectors from arrays needs NumPy: pip install numpy")
+        count = len(next(iter(values.values())))
+        inputs = {pin: pack(values[pin], len(nets)) for pin, nets in self.netlist.inputs.items()}
+        outputs = self.evaluate(inputs, np.uint64(0xFFFF_FFFF_FFFF_FFFF))
+        return {pin: unpack(words, count) for pin, words in outputs.items()}
+
+
+def pack(values: "np.ndarray", width: int) -> list["np.ndarray"]:
+    """Bit-slices `values`: word k of bit b holds bit b of values 64k to 64k + 63."""
+    words = -(-len(values) // LANES)
+    lanes = np.zeros(words * LANES, dtype=np.uint64)
+    lanes[: len(values)] = values
+    lanes = lanes.reshape(words, LANES)
+    positions = np.arange(LANES, dtype=np.uint64)
+    return [np.bitwise_or.reduce(((lanes >> np.uint64(bit)) & np.uint64(1)) << positions, axis=1) for bit in range(width)]
+
+
+def unpack(bits: list, count: int) -> "np.ndarray":
+    """The first `count` values of the bit-sliced words `bits`; the inverse of `pack`."""
+    words = -(-count // LANES)
+    positions = np.arange(LANES, dtype=np.uint64)
+    values = np.zeros(words * LANES, dtype=np.uint64)
+    for bit, word in enumerate(bits):
+        word = np.broadcast_to(np.asarray(word, dtype=np.uint64), (words,))
+        values |= (((word[:, None] >> positions) & np.uint64(1)) << np.uint64(bit)).reshape(-1)
+    return values[:count]
+
+
+def simulate(name: str, builtins: tuple[str, ...] = ()) -> Simulation:
+    return Simulation(flatten(name, ChipLibrary(builtins)))
+
+
+def simulate_sliced(name: str) -> SlicedSimulation:
+    return SlicedSimulation(flatten(name, ChipLibrary()))
+
+
+def check_builtin(name: str, cycles: int = 1000, seed: int = 0) -> Optional[str]:
+    """
+    Runs the HDL of chip `name`, with the behavioral versions of its parts,
+    and its behavioral version side by side on random inputs. Addresses come
+    from a few random ones, so words are read back after being written.
+    Returns the first difference, or None.
+    """
+    rng = random.Random(seed)
+    hdl = simulate(name, tuple(chip for chip in BEHAVIORAL_CHIPS if chip != name))
+    builtin = simulate(name, (name,))
+    widths = {pin: len(nets) for pin, nets in hdl.netlist.inputs.items()}
+    addresses = [rng.getrandbits(widths.get("address", 1)) for _ in range(8)]
+
+    for cycle in range(cycles):
+        for pin, width in widths.items():
+            if pin == "address":
+                value = rng.choice(addresses)
+            elif width == 1:
+                value = int(rng.random() < 0.3)
+            else:
+                value = rng.getrandbits(width)
+            hdl.set(pin, value)
+            builtin.set(pin, value)
+        for pin in hdl.netlist.outputs:
+            if hdl.get(pin) != builtin.get(pin):
+                inputs = ", ".join(f"{pin}={value}" for pin, value in zip(widths, hdl.inputs))
+                return f"{name}: cycle {cycle}, {inputs}: {pin} is {hdl.get(pin)} in HDL, {builtin.get(pin)} builtin"
+        hdl.tick()
+        builtin.tick()
+    return None
+
+
+def run_computer(machine_code: list[str], cycles: int, builtins: tuple[str, ...] = ("RAM16K",)) -> Simulation:
+    """Runs `machine_code` on Computer.hdl for `cycles` cycles after a reset cycle."""
+    computer = simulate("Computer", builtins)
+    computer.builtin("ROM32K").load(machine_code)
+    computer.set("reset", 1)
+    computer.tick()
+    computer.set("reset", 0)
+    computer.run(cycles)
+    return computer
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python hdl_simulator.py PROGRAM.asm [CYCLES]")
+        print("       python hdl_simulator.py --check-builtins [CYCLES]")
+    elif sys.argv[1] == "--check-builtins":
+        for chip in BEHAVIORAL_CHIPS:
+            difference = check_builtin(chip, int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+            print(difference or f"{chip}: same as its HDL")
+    else:
+        sys.path.append(os.path.join(ROOT, "project-06"))
+        from assembler import assemble
+
+        computer = run_computer(assemble(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+        ram = computer.builtin("RAM16K").memory
+        for address in range(16):
+            value = ram[address]
+            print(f"R{address}: {value - 0x10000 if value & 0x8000 else value}")
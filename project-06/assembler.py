@@ -79,44 +79,42 @@ JUMP_TABLE = {
     "JMP": "111",
 }
 
-VARIABLE_ADDRESS = 16
+VARIABLE_ADDRESS = 16  # RAM address of the first variable
+ROM_SIZE = 32768  # instructions the Hack ROM holds
 
 
 def cleanup_lines(lines: list[str]) -> list[str]:
     cleaned_lines = []
 
     for line in lines:
-        line = line.strip()
+        line = line.split("//")[0].strip()
         if line == "":
             continue
-        if line.startswith("//"):
-            continue
         cleaned_lines.append(line)
 
     return cleaned_lines
 
 
-def first_pass(lines: list[str]):
+def first_pass(lines: list[str]) -> dict[str, int]:
+    """Returns the predefined symbols plus the ROM address of every label."""
+    symbol_table = dict(SYMBOL_TABLE)
     line_counter = 0
 
     for line in lines:
         if line.startswith("("):
             label = line[1:-1]
-            SYMBOL_TABLE[label] = line_counter
+            symbol_table[label] = line_counter
         else:
             line_counter += 1
 
+    return symbol_table
+
 
-def parse_a_instruction(address):
-    global VARIABLE_ADDRESS
+def parse_a_instruction(address, symbol_table: dict[str, int]):
     if address.isdigit():
         return format(int(address), "016b")
 
-    if address not in SYMBOL_TABLE:
-        SYMBOL_TABLE[address] = VARIABLE_ADDRESS
-        VARIABLE_ADDRESS += 1
-
-    return format(SYMBOL_TABLE[address], "016b")
+    return format(symbol_table[address], "016b")
 
 
 def parse_c_instruction(line):
@@ -135,25 +133,52 @@ def parse_c_instruction(line):
     return "111" + comp_bin + dest_bin + jump_bin
 
 
-def second_pass(lines: list[str]):
+def second_pass(lines: list[str], symbol_table: dict[str, int]):
     out = []
+    variable_address = VARIABLE_ADDRESS
 
     for line in lines:
         if line.startswith("("):
             continue
         if line.startswith("@"):
-            out.append(parse_a_instruction(line[1:]))
+            address = line[1:]
+            if not address.isdigit() and address not in symbol_table:
+                symbol_table[address] = variable_address
+                variable_address += 1
+            out.append(parse_a_instruction(address, symbol_table))
         else:
             out.append(parse_c_instruction(line))
 
     return out
 
 
+def assemble_lines(asm_code: list[str]) -> list[str]:
+    """Assembles Hack assembly lines; every call starts from a fresh symbol table."""
+    clean_input = cleanup_lines(asm_code)
+    symbol_table = first_pass(clean_input)
+    machine_code = second_pass(clean_input, symbol_table)
+
+    if len(machine_code) > ROM_SIZE:
+        raise ValueError(
+            f"Program needs {len(machine_code)} instructions, "
+            f"{len(machine_code) - ROM_SIZE} more than the ROM holds ({ROM_SIZE})"
+        )
+
+    return machine_code
+
+
 def assemble(file_name):
     with open(file_name, "r") as file:
         asm_code = file.readlines()
-    clean_input = cleanup_lines(asm_code)
-    first_pass(clean_input)
-    machine_code = second_pass(clean_input)
 
-    return machine_code
+    return assemble_lines(asm_code)
+
+
+def source_map(asm_code: list[str]) -> list[str]:
+    """One `rom_address asm_line` row per instruction, with 1-based asm lines."""
+    rows = []
+    for asm_line, line in enumerate(asm_code, start=1):
+        line = line.split("//")[0].strip()
+        if line and not line.startswith("("):
+            rows.append(f"{len(rows)} {asm_line}")
+    return rows
@@ -0,0 +1,137 @@
+"""
+Lockstep Hack emulation of many machines with NumPy.
+
+All machines run the same ROM, each on its own RAM, so an input sweep such as
+Mult.asm on hundreds of (R0, R1) pairs becomes one run. Each step executes
+one instruction on every running machine: machines are grouped by program
+counter and each group runs its instruction on NumPy arrays at once, so
+machines in lockstep cost one group and diverged ones a few more.
+
+The semantics are those of Emulator, without traps: registers and RAM hold
+signed 16-bit integers, and a machine halts when its program counter leaves
+the ROM or it enters the `(END) @END 0;JMP` loop.
+
+NumPy is only needed here: `pip install numpy`.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # the rest of project 6 does not need it
+    np = None
+
+from emulator import RAM_SIZE
+
+
+class BatchEmulator:
+    """
+    `count` Hack machines sharing the decoded `machine_code`. The state is
+    kept as arrays with one row or entry per machine: `ram` of shape
+    (count, 32768) and `a`, `d`, `pc`, `cycles` and `halted` of shape (count,).
+    """
+
+    def __init__(self, machine_code: list[str], count: int):
+        if np is None:
+            raise ImportError("BatchEmulator needs NumPy: pip install numpy")
+
+        self.rom = [self.decode(word) for word in machine_code]
+        # An A-instruction at pc - 1 that loads pc - 1 makes a jump there a halt loop.
+        self.halt_loops = [pc > 0 and self.rom[pc - 1] == (None, pc - 1) for pc in range(len(self.rom))]
+        self.count = count
+        self.ram = np.zeros((count, RAM_SIZE), dtype=np.int16)
+        self.a = np.zeros(count, dtype=np.int32)
+        self.d = np.zeros(count, dtype=np.int32)
+        self.pc = np.zeros(count, dtype=np.int32)
+        self.cycles = np.zeros(count, dtype=np.int64)
+        self.halted = np.zeros(count, dtype=bool)
+
+    @staticmethod
+    def decode(word: str) -> tuple:
+        """
+        A-instructions become (None, value). C-instructions become the ALU
+        control bits (use M, zx, nx, zy, ny, f, no), the destination bits
+        (A, D, M) and the jump bits (negative, zero, positive).
+        """
+        if word[0] == "0":
+            return None, int(word, 2)
+        bits = [bit == "1" for bit in word]
+        return tuple(bits[3:10]), tuple(bits[10:13]), tuple(bits[13:16])
+
+    def reset(self):
+        """Restarts every machine, keeping the RAM contents."""
+        self.a[:] = self.d[:] = self.pc[:] = self.cycles[:] = 0
+        self.halted[:] = False
+
+    def execute(self, pc: int, lanes):
+        """Runs the instruction at `pc` on the machines `lanes`, an index array."""
+        instruction = self.rom[pc]
+        self.cycles[lanes] += 1
+        if instruction[0] is None:
+            self.a[lanes] = instruction[1]
+            self.pc[lanes] = pc + 1
+            return
+
+        (use_m, zx, nx, zy, ny, f, no), (write_a, write_d, write_m), (negative, zero, positive) = instruction
+        a = self.a[lanes]
+        address = a & 0x7FFF
+        x = np.zeros_like(a) if zx else self.d[lanes]
+        y = self.ram[lanes, address].astype(np.int32) if use_m else a
+        if zy:
+            y = np.zeros_like(a)
+        if nx:
+            x = ~x
+        if ny:
+            y = ~y
+        value = x + y if f else x & y
+        if no:
+            value = ~value
+        value = value.astype(np.int16).astype(np.int32)  # wraps to 16 bits
+
+        if write_m:
+            self.ram[lanes, address] = value
+        if write_a:
+            self.a[lanes] = value
+        if write_d:
+            self.d[lanes] = value
+
+        if negative and zero and positive:
+            jumps = np.ones(len(lanes), dtype=bool)
+        else:
+            jumps = np.zeros(len(lanes), dtype=bool)
+            if negative:
+                jumps |= value < 0
+            if zero:
+                jumps |= value == 0
+            if positive:
+                jumps |= value > 0
+        next_pc = np.where(jumps, address, pc + 1)
+        if self.halt_loops[pc]:
+            halting = jumps & (address == pc - 1)
+            next_pc[halting] = pc  # like Emulator, stop on the jump
+            self.halted[lanes[halting]] = True
+        self.pc[lanes] = next_pc
+
+    def run(self, max_cycles: int = 10_000_000) -> int:
+        """
+        Runs until every machine halted or `max_cycles` steps ran; a running
+        machine executes one instruction per step. Returns the number of steps.
+        """
+        rom_size = len(self.rom)
+        steps = 0
+        while steps < max_cycles:
+            self.halted |= (self.pc < 0) | (self.pc >= rom_size)
+            running = np.flatnonzero(~self.halted)
+            if len(running) == 0:
+                break
+            steps += 1
+
+            pcs = self.pc[running]
+            first = pcs[0]
+            if (pcs == first).all():
+                self.execute(int(first), running)
+                continue
+            order = np.argsort(pcs, kind="stable")
+            pcs = pcs[order]
+            starts = np.flatnonzero(np.diff(pcs)) + 1
+            for group in np.split(running[order], starts):
+                self.execute(int(self.pc[group[0]]), group)
+        return steps
@@ -0,0 +1,70 @@
+"""Runs input sweeps on BatchEmulator and checks every machine against Emulator.
+
+Mult.asm gets random (R0, R1) pairs, so the machines leave the loop at
+different times and halt one by one. Fill.asm never halts and branches on
+a different keyboard value per machine, so the machines stay diverged.
+"""
+
+import random
+import time
+from assembler import assemble
+from batch_emulator import BatchEmulator
+from emulator import KBD, Emulator
+
+MACHINES = 300
+FILL_CYCLES = 20_000
+
+
+def run_one_by_one(machine_code: list[str], rams: list[dict[int, int]], max_cycles: int) -> tuple[list[Emulator], float]:
+    start = time.perf_counter()
+    emulators = []
+    for ram in rams:
+        emulator = Emulator(machine_code)
+        for address, value in ram.items():
+            emulator.ram[address] = value
+        emulator.run(max_cycles)
+        emulators.append(emulator)
+    return emulators, time.perf_counter() - start
+
+
+def run_batched(machine_code: list[str], rams: list[dict[int, int]], max_cycles: int) -> tuple[BatchEmulator, float]:
+    start = time.perf_counter()
+    batch = BatchEmulator(machine_code, len(rams))
+    for machine, ram in enumerate(rams):
+        for address, value in ram.items():
+            batch.ram[machine, address] = value
+    batch.run(max_cycles)
+    return batch, time.perf_counter() - start
+
+
+def same_machines(emulators: list[Emulator], batch: BatchEmulator, addresses: range) -> bool:
+    for machine, emulator in enumerate(emulators):
+        state = (emulator.a, emulator.d, emulator.pc, emulator.cycles, emulator.halted)
+        batch_state = tuple(
+            value.item()
+            for value in (batch.a[machine], batch.d[machine], batch.pc[machine], batch.cycles[machine], batch.halted[machine])
+        )
+        if state != batch_state or emulator.ram[addresses.start : addresses.stop] != batch.ram[machine, addresses.start : addresses.stop].tolist():
+            return False
+    return True
+
+
+def check(name: str, rams: list[dict[int, int]], max_cycles: int, addresses: range) -> bool:
+    machine_code = assemble(f"../project-04/{name}.asm")
+    emulators, sequential_time = run_one_by_one(machine_code, rams, max_cycles)
+    batch, batched_time = run_batched(machine_code, rams, max_cycles)
+    print(
+        f"{name}: {len(rams)} machines, {sum(emulator.cycles for emulator in emulators)} cycles, "
+        f"{sequential_time:.2f}s one by one, {batched_time:.2f}s batched"
+    )
+    return same_machines(emulators, batch, addresses)
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    mult_rams = [{0: rng.randint(-300, 300), 1: rng.randint(0, 200)} for _ in range(MACHINES)]
+    fill_rams = [{KBD: rng.choice((0, 0, 65, 32))} for _ in range(MACHINES)]
+
+    error_found = not check("Mult", mult_rams, 10_000_000, range(0, 16))
+    error_found = not check("Fill", fill_rams, FILL_CYCLES, range(0, KBD + 1)) or error_found
+    print("Error found" if error_found else "No errors found!")
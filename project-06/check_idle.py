@@ -0,0 +1,105 @@
+"""Checks idle loop detection against plain runs.
+
+POLL counts down, then calls a subroutine reading the keyboard until a key
+is pressed, like Keyboard.readChar on the compiled OS. Without keys it must
+stop as idle soon after the countdown. With a key due at a far cycle, the
+poll loop is skipped up to that cycle, and the program must end in the same
+state as a plain run given the key at the same cycle. Fill.asm, which keeps
+rewriting the screen, gets the same treatment with a longer loop.
+"""
+
+import time
+from assembler import assemble, assemble_lines
+from emulator import KBD, Emulator
+
+POLL = """
+@1000
+D=A
+@R1
+M=D
+(COUNT)
+@R1
+MD=M-1
+@COUNT
+D;JGT
+(WAIT)
+@RETURN
+D=A
+@R2
+M=D
+@POLL
+0;JMP
+(RETURN)
+@R3
+D=M
+@WAIT
+D;JEQ
+@R0
+M=D
+(END)
+@END
+0;JMP
+(POLL)
+@KBD
+D=M
+@R3
+M=D
+@R2
+A=M
+0;JMP
+""".split("\n")
+
+KEY_CYCLE = 5_000_000
+FILL_PERIOD = 200_000
+
+
+def state(emulator: Emulator) -> tuple:
+    return emulator.pc, emulator.a, emulator.d, emulator.cycles, emulator.halted, emulator.ram
+
+
+def plain_run(machine_code: list[str], key_cycle: int, max_cycles: int) -> Emulator:
+    emulator = Emulator(machine_code)
+    emulator.run(key_cycle)
+    emulator.ram[KBD] = 65
+    emulator.run(max_cycles - key_cycle)
+    return emulator
+
+
+def skipping_run(machine_code: list[str], key_cycle: int, max_cycles: int, max_period: int) -> Emulator:
+    emulator = Emulator(machine_code)
+    emulator.run_until_idle(key_cycle, until=key_cycle, max_period=max_period)
+    emulator.ram[KBD] = 65
+    emulator.run_until_idle(max_cycles - key_cycle, until=max_cycles, max_period=max_period)
+    return emulator
+
+
+def check(name: str, machine_code: list[str], key_cycle: int, max_cycles: int, max_period: int) -> bool:
+    start = time.perf_counter()
+    expected = plain_run(machine_code, key_cycle, max_cycles)
+    plain_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = skipping_run(machine_code, key_cycle, max_cycles, max_period)
+    skipping_time = time.perf_counter() - start
+    print(f"{name}: key at cycle {key_cycle}, {plain_time:.2f}s plain, {skipping_time:.2f}s skipping idle loops")
+    return state(expected) == state(actual)
+
+
+if __name__ == "__main__":
+    poll = assemble_lines(POLL)
+    waiting = Emulator(poll)
+    waiting.run_until_idle()
+    print(f"POLL: idle after {waiting.cycles} cycles")
+    plain = Emulator(poll)
+    plain.run(waiting.cycles)
+    error_found = not waiting.idle or waiting.ram[1] != 0 or state(waiting) != state(plain)
+
+    error_found = not check("POLL", poll, KEY_CYCLE, KEY_CYCLE + 100, 100) or error_found
+
+    mult = Emulator(assemble("../project-04/Mult.asm"))
+    mult.ram[0], mult.ram[1] = 7, 6
+    mult.run_until_idle()
+    error_found = not mult.halted or mult.idle or mult.ram[2] != 42 or error_found
+
+    fill = assemble("../project-04/Fill.asm")
+    error_found = not check("Fill", fill, 2_000_000, 2_500_000, FILL_PERIOD) or error_found
+    print("Error found" if error_found else "No errors found!")
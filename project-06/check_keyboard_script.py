@@ -0,0 +1,77 @@
+"""Checks scripted keyboard input against setting the keyboard register by hand.
+
+Fill.asm and Pong are played from scripts, with frames captured, and must
+end as plain runs that set RAM[KBD] at the same cycles do. The keys must
+move Pong's bat. Digits are keys and `#` marks key codes, also in saved
+scripts. Bad scripts must be rejected with the line at fault.
+"""
+
+import hashlib
+import os
+import tempfile
+from assembler import assemble
+from emulator import KBD, Emulator
+from keyboard_script import FRAME_CYCLES, parse_script, play, read_script, screen_bytes, write_script
+
+FILL_SCRIPT = """
+// black, then white again
+3f    a
+7f    none
+""".split("\n")
+
+# The game is on screen from about frame 50.
+PONG_SCRIPT = """
+52f   left
+58f   none
+60f   right
+62f   none
+""".split("\n")
+
+
+def plain_run(machine_code: list[str], script: list[str], max_cycles: int) -> Emulator:
+    emulator = Emulator(machine_code)
+    for event in parse_script(script):
+        emulator.run(event.cycle - emulator.cycles)
+        emulator.ram[KBD] = event.key
+    emulator.run(max_cycles - emulator.cycles)
+    return emulator
+
+
+def check(name: str, machine_code: list[str], script: list[str], max_cycles: int) -> bool:
+    expected = plain_run(machine_code, script, max_cycles)
+    played = Emulator(machine_code)
+    frames = []
+    play(played, parse_script(script), max_cycles, FRAME_CYCLES, lambda frame: frames.append(screen_bytes(played.ram)))
+    digest = hashlib.sha256(b"".join(frames)).hexdigest()[:16]
+    print(f"{name}: {played.cycles} cycles, {len(frames)} frames, frames sha256 {digest}")
+    state = (expected.pc, expected.a, expected.d, expected.cycles, expected.ram)
+    same = state == (played.pc, played.a, played.d, played.cycles, played.ram)
+    return same and len(frames) == max_cycles // FRAME_CYCLES
+
+
+def rejected(script: list[str]) -> bool:
+    try:
+        parse_script(script)
+        return False
+    except ValueError as error:
+        print(f"Rejected: {error}")
+        return True
+
+
+if __name__ == "__main__":
+    fill = assemble("../project-04/Fill.asm")
+    error_found = not check("Fill", fill, FILL_SCRIPT, 1_000_000)
+    pong = assemble("files/pong.asm")
+    error_found = not check("Pong", pong, PONG_SCRIPT, 6_500_000) or error_found
+    still = screen_bytes(plain_run(pong, [], 6_500_000).ram)
+    error_found = screen_bytes(plain_run(pong, PONG_SCRIPT, 6_500_000).ram) == still or error_found
+    error_found = not rejected(["10 left", "12x right"]) or not rejected(["10 lefty"]) or error_found
+    error_found = not rejected(["10 #x"]) or not rejected(["10 53"]) or error_found
+
+    events = parse_script(["10 5", "20 #53", "30 A", "40 #130", "50 right", "60 none"])
+    error_found = [event.key for event in events] != [53, 53, 65, 130, 132, 0] or error_found
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "keys.txt")
+        write_script(file_name, events)
+        error_found = read_script(file_name) != events or error_found
+    print("Error found" if error_found else "No errors found!")
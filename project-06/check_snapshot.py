@@ -0,0 +1,68 @@
+"""Checks emulator snapshots on Pong: resuming after the OS init must match running on.
+
+Pong is run until Main.main is called, past the OS initialization, and
+saved. A fresh emulator restored from the snapshot and the original then run
+on side by side. Restoring into another program must fail.
+"""
+
+import os
+import tempfile
+import time
+from assembler import assemble, cleanup_lines, first_pass
+from emulator import Emulator
+
+MORE_CYCLES = 200_000
+
+
+def same_state(first: Emulator, second: Emulator) -> bool:
+    return (first.pc, first.a, first.d, first.cycles, first.halted, first.ram) == (
+        second.pc,
+        second.a,
+        second.d,
+        second.cycles,
+        second.halted,
+        second.ram,
+    )
+
+
+def stop(emulator: Emulator):
+    emulator.halted = True
+
+
+if __name__ == "__main__":
+    with open("files/pong.asm", "r") as file:
+        main = first_pass(cleanup_lines(file.readlines()))["main.main"]
+    machine_code = assemble("files/pong.asm")
+
+    booted = Emulator(machine_code)
+    booted.traps = {main: stop}
+    start = time.perf_counter()
+    booted.run()
+    boot_time = time.perf_counter() - start
+    booted.traps = {}
+    booted.halted = False
+
+    error_found = False
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pong.snapshot")
+        booted.save_snapshot(path)
+
+        resumed = Emulator(machine_code)
+        start = time.perf_counter()
+        resumed.load_snapshot(path)
+        restore_time = time.perf_counter() - start
+        print(f"Booting took {booted.cycles} cycles, {boot_time:.2f}s; restoring {restore_time * 1000:.1f}ms")
+        print(f"Snapshot size: {os.path.getsize(path)} bytes")
+        error_found = not same_state(booted, resumed)
+
+        booted.run(MORE_CYCLES)
+        resumed.run(MORE_CYCLES)
+        error_found = not same_state(booted, resumed) or error_found
+
+        try:
+            Emulator(assemble("files/max.asm")).load_snapshot(path)
+            error_found = True
+        except ValueError as error:
+            print(f"Other program: {error}")
+
+    print("Error found" if error_found else "No errors found!")
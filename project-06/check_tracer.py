@@ -0,0 +1,103 @@
+"""Checks the tracing emulator on Pong against Emulator and against single steps.
+
+A traced run must end in the same state as a plain one, also with a trap
+on Math.multiply that writes to RAM and halts the machine at its
+TRAP_CALLS-th call, since TracingEmulator.run repeats the loop of
+Emulator.run rather than calling it. Its records
+must be the last instructions as seen by stepping the machine one
+instruction at a time, whether the tracing emulator ran them or stepped
+them. A run starting at a later cycle must keep only the instructions it
+ran, numbered from there. A watchpoint on SP must stop the run right after
+the first write to it.
+"""
+
+import time
+from io import StringIO
+from assembler import assemble, cleanup_lines, first_pass
+from emulator import Emulator
+from tracer import NO_WRITE, TracingEmulator
+
+CYCLES = 1_000_000
+SIZE = 500
+STEPPED_CYCLES = 50_000
+TRAP_CALLS = 100
+TRAP_ADDRESS = 16383  # the last heap word, which Pong leaves alone
+
+
+def trap(emulator: Emulator):
+    """Counts calls of Math.multiply in RAM, halting at the TRAP_CALLS-th."""
+    emulator.ram[TRAP_ADDRESS] += 1
+    emulator.halted = emulator.ram[TRAP_ADDRESS] == TRAP_CALLS
+
+
+def state(emulator: Emulator) -> tuple:
+    return emulator.pc, emulator.a, emulator.d, emulator.cycles, emulator.halted, emulator.ram
+
+
+def stepped_records(machine_code: list[str], cycles: int, size: int) -> list[tuple]:
+    """The last `size` records of the first `cycles` instructions, from Emulator.step."""
+    emulator = Emulator(machine_code)
+    records = []
+    for cycle in range(1, cycles + 1):
+        pc = emulator.pc
+        instruction = emulator.rom[pc]
+        address = emulator.a & 0x7FFF if instruction[0] is not None and instruction[3] else NO_WRITE
+        emulator.step()
+        if cycle > cycles - size:
+            value = emulator.ram[address] if address != NO_WRITE else None
+            records.append((cycle, pc, emulator.a, emulator.d, address, value))
+    return records
+
+
+if __name__ == "__main__":
+    machine_code = assemble("files/pong.asm")
+
+    plain = Emulator(machine_code)
+    start = time.perf_counter()
+    plain.run(CYCLES)
+    plain_time = time.perf_counter() - start
+
+    traced = TracingEmulator(machine_code, SIZE, output=None)
+    start = time.perf_counter()
+    traced.run(CYCLES)
+    traced_time = time.perf_counter() - start
+    print(f"{CYCLES} cycles: {plain_time:.2f}s plain, {traced_time:.2f}s traced")
+
+    error_found = state(plain) != state(traced)
+
+    with open("files/pong.asm", "r", encoding="utf-8") as f:
+        multiply = first_pass(cleanup_lines(f.read().split("\n")))["math.multiply"]
+    trapped, traced_trapped = Emulator(machine_code), TracingEmulator(machine_code, SIZE, output=None)
+    for emulator in (trapped, traced_trapped):
+        emulator.traps = {multiply: trap}
+        emulator.run(CYCLES)
+    print(f"Trap on Math.multiply: halted after {trapped.cycles} cycles plain, {traced_trapped.cycles} traced")
+    error_found = not trapped.halted or state(trapped) != state(traced_trapped) or error_found
+
+    expected = stepped_records(machine_code, STEPPED_CYCLES, SIZE)
+    short = TracingEmulator(machine_code, SIZE, output=None)
+    short.run(STEPPED_CYCLES)
+    actual = [
+        (cycle, pc, a, d, address, value if address != NO_WRITE else None)
+        for cycle, pc, a, d, address, value in short.records()
+    ]
+    error_found = actual != expected or error_found
+
+    stepping = TracingEmulator(machine_code, SIZE, output=None)
+    stepping.run(STEPPED_CYCLES - 100)
+    for _ in range(100):
+        stepping.step()
+    error_found = stepping.records() != short.records() or error_found
+
+    late = TracingEmulator(machine_code, 8, output=None)
+    late.cycles = 500
+    late.run(3)
+    error_found = [record[:2] for record in late.records()] != [(501, 0), (502, 1), (503, 2)] or error_found
+
+    watched = TracingEmulator(machine_code, 5, watch=(0,), output=StringIO())
+    watched.run(CYCLES)
+    last = watched.records()[-1]
+    error_found = watched.stop_reason != "watch" or last[4] != 0 or watched.cycles != last[0] or error_found
+    print(watched.output.getvalue().rstrip())
+
+    print("Error found" if error_found else "No errors found!")
@@ -0,0 +1,296 @@
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from typing import Callable, Optional
+from assembler import COMP_TABLE, DEST_TABLE, JUMP_TABLE
+
+RAM_SIZE = 32768
+SCREEN = 16384
+KBD = 24576
+
+# Snapshot files: this header, then the RAM as little-endian 16-bit words.
+SNAPSHOT_MAGIC = b"HACKSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sH32sHhhqB")  # magic, version, ROM hash, pc, a, d, cycles, halted
+
+IDLE_CHECK_INTERVAL = 100_000  # cycles between checks for an idle loop
+IDLE_PERIOD = 1000  # longest idle loop looked for, in cycles
+
+COMPUTATIONS: dict[str, Callable[[int, int, int], int]] = {
+    "0": lambda a, d, m: 0,
+    "1": lambda a, d, m: 1,
+    "-1": lambda a, d, m: -1,
+    "D": lambda a, d, m: d,
+    "A": lambda a, d, m: a,
+    "M": lambda a, d, m: m,
+    "!D": lambda a, d, m: ~d,
+    "!A": lambda a, d, m: ~a,
+    "!M": lambda a, d, m: ~m,
+    "-D": lambda a, d, m: -d,
+    "-A": lambda a, d, m: -a,
+    "-M": lambda a, d, m: -m,
+    "D+1": lambda a, d, m: d + 1,
+    "A+1": lambda a, d, m: a + 1,
+    "M+1": lambda a, d, m: m + 1,
+    "D-1": lambda a, d, m: d - 1,
+    "A-1": lambda a, d, m: a - 1,
+    "M-1": lambda a, d, m: m - 1,
+    "D+A": lambda a, d, m: d + a,
+    "D+M": lambda a, d, m: d + m,
+    "D-A": lambda a, d, m: d - a,
+    "D-M": lambda a, d, m: d - m,
+    "A-D": lambda a, d, m: a - d,
+    "M-D": lambda a, d, m: m - d,
+    "D&A": lambda a, d, m: d & a,
+    "D&M": lambda a, d, m: d & m,
+    "D|A": lambda a, d, m: d | a,
+    "D|M": lambda a, d, m: d | m,
+}
+
+JUMPS: dict[str, Callable[[int], bool]] = {
+    "": lambda value: False,
+    "JGT": lambda value: value > 0,
+    "JEQ": lambda value: value == 0,
+    "JGE": lambda value: value >= 0,
+    "JLT": lambda value: value < 0,
+    "JNE": lambda value: value != 0,
+    "JLE": lambda value: value <= 0,
+    "JMP": lambda value: True,
+}
+
+COMP_BITS = {bits: comp for comp, bits in COMP_TABLE.items()}
+DEST_BITS = {bits: dest for dest, bits in DEST_TABLE.items()}
+JUMP_BITS = {bits: jump for jump, bits in JUMP_TABLE.items()}
+
+
+def to_signed(value: int) -> int:
+    """Wraps `value` to a 16-bit two's complement integer."""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def decode(word: str) -> tuple:
+    """Decodes a 16-bit machine code word.
+
+    A-instructions become (None, value); C-instructions become
+    (computation, writes A, writes D, writes M, jump).
+    """
+    if word[0] == "0":
+        return None, int(word, 2)
+
+    computation = COMPUTATIONS[COMP_BITS[word[3:10]]]
+    dest = DEST_BITS[word[10:13]]
+    jump = JUMP_BITS[word[13:16]]
+    return computation, "A" in dest, "D" in dest, "M" in dest, JUMPS[jump]
+
+
+class Emulator:
+    """
+    Runs Hack machine code, as produced by the assembler, on a 32K-word RAM.
+
+    Registers and RAM hold signed 16-bit integers. The machine halts when the
+    program counter leaves the ROM or the program enters the `(END) @END 0;JMP`
+    loop that Hack programs end with.
+
+    `traps` maps ROM addresses to functions run instead of the code there
+    whenever a jump lands on them. A trap is given the emulator, must set `pc`
+    and may set `halted`.
+
+    The machine state can be saved to a snapshot file and restored later, in
+    an emulator of the same program, to skip the cycles that led to it.
+
+    A machine is idle when its state repeats: it is in a loop that only input
+    can end, such as polling the keyboard. `run_until_idle` stops idle
+    machines, or skips ahead to the next input.
+    """
+
+    def __init__(self, machine_code: list[str]):
+        self.rom = [decode(word) for word in machine_code]
+        self.rom_hash = hashlib.sha256("\n".join(machine_code).encode()).digest()
+        self.ram = [0] * RAM_SIZE
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+        self.idle = False
+        self.traps: dict[int, Callable[["Emulator"], None]] = {}
+
+    def reset(self):
+        """Restarts the program, keeping the RAM contents."""
+        self.a = self.d = self.pc = self.cycles = 0
+        self.halted = self.idle = False
+
+    def save_snapshot(self, path: str):
+        """Writes the registers, cycle count and RAM, with the hash of the ROM they belong to."""
+        ram = array("h", self.ram)
+        if sys.byteorder == "big":
+            ram.byteswap()
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.rom_hash, self.pc, self.a, self.d, self.cycles, self.halted
+        )
+        with open(path, "wb") as file:
+            file.write(header)
+            file.write(ram.tobytes())
+
+    def load_snapshot(self, path: str):
+        """
+        Restores a snapshot written by `save_snapshot`, which must be of this
+        program. The RAM list is updated in place, so code sharing it sees
+        the restored contents.
+        """
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if len(data) != SNAPSHOT_HEADER.size + 2 * RAM_SIZE:
+                raise ValueError(f"{path} is not a Hack snapshot")
+            magic, version, rom_hash, pc, a, d, cycles, halted = SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} Hack snapshot")
+            if rom_hash != self.rom_hash:
+                raise ValueError(f"{path} is a snapshot of a different program")
+            ram = array("h")
+            ram.frombytes(data[SNAPSHOT_HEADER.size :])
+
+        if sys.byteorder == "big":
+            ram.byteswap()
+        self.ram[:] = ram.tolist()
+        self.pc, self.a, self.d, self.cycles, self.halted = pc, a, d, cycles, bool(halted)
+
+    def is_halt_loop(self, target: int) -> bool:
+        """True if jumping from pc to `target` re-enters an `@target 0;JMP` loop."""
+        return target == self.pc - 1 and self.rom[target] == (None, target)
+
+    def step(self) -> bool:
+        """Executes one instruction; returns False once the machine has halted."""
+        # run below and TracingEmulator.run in tracer.py repeat this loop body
+        # for speed; a change to it goes into all three, see check_tracer.py.
+        if self.halted or not 0 <= self.pc < len(self.rom):
+            self.halted = True
+            return False
+
+        instruction = self.rom[self.pc]
+        self.cycles += 1
+        computation = instruction[0]
+        if computation is None:
+            self.a = instruction[1]
+            self.pc += 1
+            return True
+
+        _, write_a, write_d, write_m, jump = instruction
+        address = self.a & 0x7FFF
+        value = to_signed(computation(self.a, self.d, self.ram[address]))
+        if write_m:
+            self.ram[address] = value
+        if write_a:
+            self.a = value
+        if write_d:
+            self.d = value
+
+        if jump(value):
+            if self.is_halt_loop(address):
+                self.halted = True
+                return False
+            self.pc = address
+            if address in self.traps:
+                self.traps[address](self)
+                return not self.halted
+        else:
+            self.pc += 1
+        return True
+
+    def run(self, max_cycles: int = 10_000_000) -> int:
+        """Runs until the machine halts or `max_cycles` more instructions ran."""
+        # The body of step, inlined with the registers in locals; it is
+        # copied again in TracingEmulator.run.
+        rom = self.rom
+        ram = self.ram
+        traps = self.traps
+        a, d, pc = self.a, self.d, self.pc
+        end = self.cycles + max_cycles
+        cycles = self.cycles
+
+        while cycles < end:
+            if not 0 <= pc < len(rom):
+                self.halted = True
+                break
+            instruction = rom[pc]
+            cycles += 1
+            computation = instruction[0]
+            if computation is None:
+                a = instruction[1]
+                pc += 1
+                continue
+
+            _, write_a, write_d, write_m, jump = instruction
+            address = a & 0x7FFF
+            value = computation(a, d, ram[address]) & 0xFFFF
+            if value & 0x8000:
+                value -= 0x10000
+            if write_m:
+                ram[address] = value
+            if write_a:
+                a = value
+            if write_d:
+                d = value
+
+            if jump(value):
+                if address == pc - 1 and rom[address] == (None, address):
+                    self.halted = True
+                    break
+                pc = address
+                if address in traps:
+                    self.a, self.d, self.pc = a, d, pc
+                    traps[address](self)
+                    a, d, pc = self.a, self.d, self.pc
+                    if self.halted:
+                        break
+            else:
+                pc += 1
+
+        executed = cycles - self.cycles
+        self.a, self.d, self.pc, self.cycles = a, d, pc, cycles
+        return executed
+
+    def idle_period(self, max_period: int = IDLE_PERIOD) -> Optional[int]:
+        """
+        Steps the machine until its registers and RAM are back to what they
+        were and returns the cycles that took, or None if they were not
+        within `max_period` cycles. Traps must only depend on the machine
+        state for a repeated state to mean an endless loop.
+        """
+        start = (self.pc, self.a, self.d)
+        ram = self.ram[:]
+        for period in range(1, max_period + 1):
+            if not self.step():
+                return None
+            if (self.pc, self.a, self.d) == start and self.ram == ram:
+                return period
+        return None
+
+    def run_until_idle(
+        self, max_cycles: int = 10_000_000, until: Optional[int] = None, max_period: int = IDLE_PERIOD
+    ) -> int:
+        """
+        Runs like `run`, looking for an idle loop every IDLE_CHECK_INTERVAL
+        cycles, and sets `idle` when it finds one. Without input to come, an
+        idle machine stops there. Given the cycle `until` of the next input,
+        whole iterations of the loop are skipped up to it instead, and the
+        run stops there for the input to be applied. Returns the cycles run
+        or skipped.
+        """
+        start = self.cycles
+        end = start + max_cycles if until is None else min(start + max_cycles, until)
+        self.idle = False
+        while not self.halted and self.cycles < end:
+            self.run(min(IDLE_CHECK_INTERVAL, end - self.cycles))
+            if self.halted or self.cycles >= end:
+                break
+            period = self.idle_period(min(max_period, end - self.cycles))
+            if period is None:
+                continue
+            self.idle = True
+            if until is None:
+                break
+            self.cycles += (end - self.cycles) // period * period
+        return self.cycles - start
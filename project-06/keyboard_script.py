@@ -0,0 +1,175 @@
+"""
+Scripted keyboard input, so interactive programs run the same way every time.
+
+A script has one event per line: a time and the key held from then on, until
+the next event. Times are cycles, or frames when they end in `f`. Keys are
+the names in KEY_NAMES, single characters, or Hack key codes marked with
+`#`, so `5` is the digit key and `#53` the same key by its code; `none`
+releases the key. Blank lines and `//` comments are ignored:
+
+    // Pong is on screen from about frame 50: move the bat left, then right
+    52f    left
+    58f    none
+    60f    #132
+    62f    none
+
+A frame is FRAME_CYCLES cycles by default. A session recorded by another
+front end is played back by saving its key changes in this format.
+
+Usage: python keyboard_script.py Prog.asm SCRIPT [--max-cycles N] [--frames DIR]
+
+The program runs until it halts, goes idle after the last event, or reaches
+the maximum. With --frames, the screen is written to DIR at every frame, as
+frame-NNNNNN.pbm.
+"""
+
+import hashlib
+import os
+import sys
+from dataclasses import dataclass
+from typing import Callable, Optional
+from assembler import assemble
+from emulator import IDLE_PERIOD, KBD, SCREEN, Emulator
+
+FRAME_CYCLES = 100_000  # a nominal 6 MHz Hack at 60 frames per second
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+SCREEN_WORDS = SCREEN_WIDTH * SCREEN_HEIGHT // 16
+
+KEY_NAMES = {
+    "none": 0,
+    "space": 32,
+    "newline": 128,
+    "enter": 128,
+    "backspace": 129,
+    "left": 130,
+    "up": 131,
+    "right": 132,
+    "down": 133,
+    "home": 134,
+    "end": 135,
+    "pageup": 136,
+    "pagedown": 137,
+    "insert": 138,
+    "delete": 139,
+    "esc": 140,
+    **{f"f{number}": 140 + number for number in range(1, 13)},
+}
+
+
+@dataclass(frozen=True)
+class KeyEvent:
+    cycle: int
+    key: int
+
+
+def parse_key(text: str) -> int:
+    if text.lower() in KEY_NAMES:
+        return KEY_NAMES[text.lower()]
+    if len(text) == 1:
+        return ord(text)
+    if text.startswith("#") and text[1:].isdigit():
+        return int(text[1:])
+    raise ValueError(f"unknown key {text!r}")
+
+
+def parse_script(lines: list[str], frame_cycles: int = FRAME_CYCLES) -> list[KeyEvent]:
+    """The events of a script, in time order."""
+    events = []
+    for number, line in enumerate(lines, start=1):
+        line = line.split("//")[0].strip()
+        if not line:
+            continue
+        fields = line.split()
+        if len(fields) != 2:
+            raise ValueError(f"line {number}: expected a time and a key")
+        time, key = fields
+        digits = time[:-1] if time.endswith("f") else time
+        if not digits.isdigit():
+            raise ValueError(f"line {number}: bad time {time!r}")
+        try:
+            events.append(KeyEvent(int(digits) * (frame_cycles if time.endswith("f") else 1), parse_key(key)))
+        except ValueError as error:
+            raise ValueError(f"line {number}: {error}") from None
+    return sorted(events, key=lambda event: event.cycle)
+
+
+def read_script(file_name: str, frame_cycles: int = FRAME_CYCLES) -> list[KeyEvent]:
+    with open(file_name, "r", encoding="utf-8") as f:
+        return parse_script(f.read().split("\n"), frame_cycles)
+
+
+def write_script(file_name: str, events: list[KeyEvent]):
+    """Saves the key changes of a session as a script of cycles and key codes."""
+    with open(file_name, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(f"{event.cycle} #{event.key}\n")
+
+
+def play(
+    emulator: Emulator,
+    events: list[KeyEvent],
+    max_cycles: int = 100_000_000,
+    frame_cycles: Optional[int] = None,
+    on_frame: Optional[Callable[[int], None]] = None,
+    max_period: int = IDLE_PERIOD,
+) -> int:
+    """
+    Runs `emulator` from cycle 0, setting the keyboard register at each event,
+    until it halts, is idle with no events left, or ran `max_cycles`. Idle
+    loops before an event are skipped. `on_frame` is called with the frame
+    number every `frame_cycles` cycles. Returns the cycles run.
+    """
+    pending = [event for event in events if event.cycle < max_cycles]
+    next_event = 0
+    while not emulator.halted and emulator.cycles < max_cycles:
+        while next_event < len(pending) and pending[next_event].cycle <= emulator.cycles:
+            emulator.ram[KBD] = pending[next_event].key
+            next_event += 1
+
+        until = pending[next_event].cycle if next_event < len(pending) else None
+        if on_frame is not None and frame_cycles:
+            frame_end = (emulator.cycles // frame_cycles + 1) * frame_cycles
+            until = frame_end if until is None else min(until, frame_end)
+        emulator.run_until_idle(max_cycles - emulator.cycles, until, max_period)
+        if emulator.idle and next_event == len(pending):
+            break  # nothing left to wake it up
+        if on_frame is not None and frame_cycles and emulator.cycles % frame_cycles == 0:
+            on_frame(emulator.cycles // frame_cycles)
+    return emulator.cycles
+
+
+def screen_bytes(ram: list[int]) -> bytes:
+    """The screen as rows of bytes, leftmost pixel in the high bit, black as 1."""
+    rows = bytearray()
+    for value in ram[SCREEN : SCREEN + SCREEN_WORDS]:
+        word = int(f"{value & 0xFFFF:016b}"[::-1], 2)  # pixel 0 is the low bit in Hack
+        rows += word.to_bytes(2, "big")
+    return bytes(rows)
+
+
+def write_pbm(file_name: str, ram: list[int]):
+    with open(file_name, "wb") as f:
+        f.write(f"P4\n{SCREEN_WIDTH} {SCREEN_HEIGHT}\n".encode())
+        f.write(screen_bytes(ram))
+
+
+def option(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1].startswith("--"):
+        print("Usage: python keyboard_script.py Prog.asm SCRIPT [--max-cycles N] [--frames DIR]")
+    else:
+        emulator = Emulator(assemble(sys.argv[1]))
+        frames = option("--frames", "")
+        on_frame = None
+        if frames:
+            os.makedirs(frames, exist_ok=True)
+            on_frame = lambda frame: write_pbm(os.path.join(frames, f"frame-{frame:06d}.pbm"), emulator.ram)
+        play(emulator, read_script(sys.argv[2]), int(option("--max-cycles", "100000000")), FRAME_CYCLES, on_frame)
+
+        state = "halted" if emulator.halted else "idle" if emulator.idle else "stopped"
+        print(f"{state} after {emulator.cycles} cycles")
+        print(f"screen sha256: {hashlib.sha256(screen_bytes(emulator.ram)).hexdigest()}")
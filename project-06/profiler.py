@@ -0,0 +1,165 @@
+"""
+Sampling profiler that attributes the cycles of a Hack program to its Jack source.
+
+Each stage of the toolchain writes a source map with one row per item:
+- the compiler: `vm_line jack_line jack_column` per VM command (`Main.vm.map`),
+- the VM translator: `asm_line vm_file vm_line function` per VM command, at
+  the comment the command's code starts with (`Prog.asm.map`),
+- the assembler: `rom_address asm_line` per instruction (`source_map`).
+
+The profiler runs the program on the emulator in chunks of a random number of
+cycles and charges every chunk to the instruction it stopped at. Chaining the
+maps leads from that ROM address to the VM command whose code holds it, and
+from there to the Jack statement that produced the command.
+"""
+
+import os
+import random
+import sys
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from assembler import assemble_lines, source_map
+from emulator import Emulator
+
+SAMPLE_INTERVAL = 100  # average cycles between samples
+
+
+@dataclass(frozen=True)
+class Location:
+    function: str
+    vm_file: str
+    vm_line: int
+    jack_line: Optional[int] = None  # None without a compiler source map
+    jack_column: Optional[int] = None
+
+
+def read_rows(file_name: str) -> list[str]:
+    with open(file_name, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class SourceMap:
+    """Chains the assembler, translator and compiler maps of one program."""
+
+    def __init__(self, rom_rows: list[str], asm_rows: list[str], vm_rows: dict[str, list[str]]):
+        self.asm_lines: dict[int, int] = {}
+        for row in rom_rows:
+            rom_address, asm_line = row.split()
+            self.asm_lines[int(rom_address)] = int(asm_line)
+
+        self.command_lines: list[int] = []  # asm line of each command's comment, ascending
+        self.commands: list[tuple[str, int, str]] = []
+        for row in asm_rows:
+            asm_line, vm_file, vm_line, function = row.split()
+            self.command_lines.append(int(asm_line))
+            self.commands.append((vm_file, int(vm_line), function))
+
+        self.jack_positions: dict[tuple[str, int], tuple[int, int]] = {}
+        for vm_file, rows in vm_rows.items():
+            for row in rows:
+                vm_line, jack_line, jack_column = map(int, row.split())
+                self.jack_positions[vm_file, vm_line] = (jack_line, jack_column)
+
+    def locate(self, rom_address: int) -> Optional[Location]:
+        """Source of the instruction at `rom_address`, None for code outside any command."""
+        asm_line = self.asm_lines.get(rom_address)
+        index = bisect_right(self.command_lines, asm_line) - 1 if asm_line else -1
+        if index < 0:
+            return None  # bootstrap code
+
+        vm_file, vm_line, function = self.commands[index]
+        jack_line, jack_column = self.jack_positions.get((vm_file, vm_line), (None, None))
+        return Location(function, vm_file, vm_line, jack_line, jack_column)
+
+
+def sample(
+    emulator: Emulator,
+    max_cycles: int,
+    interval: int = SAMPLE_INTERVAL,
+    seed: int = 0,
+) -> Counter[int]:
+    """
+    Runs `emulator` for up to `max_cycles` and returns the cycles charged to
+    each ROM address. Chunk lengths are drawn around `interval` so samples do
+    not lock onto the period of a loop.
+    """
+    rng = random.Random(seed)
+    cycles: Counter[int] = Counter()
+    end = emulator.cycles + max_cycles
+    while not emulator.halted and emulator.cycles < end:
+        chunk = min(rng.randint(1, 2 * interval - 1), end - emulator.cycles)
+        executed = emulator.run(chunk)
+        cycles[emulator.pc] += executed
+    return cycles
+
+
+def attribute(cycles: Counter[int], locations: SourceMap) -> tuple[Counter, Counter]:
+    """Totals `cycles` by (file, Jack line) and by function."""
+    by_line: Counter[tuple[str, Optional[int]]] = Counter()
+    by_function: Counter[str] = Counter()
+    for rom_address, count in cycles.items():
+        location = locations.locate(rom_address)
+        if location is None:
+            by_line["bootstrap", None] += count
+            by_function["bootstrap"] += count
+            continue
+        by_line[location.vm_file, location.jack_line] += count
+        by_function[location.function] += count
+    return by_line, by_function
+
+
+def print_report(
+    by_line: Counter,
+    by_function: Counter,
+    sources: dict[str, list[str]],
+    top: int = 10,
+):
+    """Prints the hottest functions and Jack lines; `sources` holds the lines of each .jack file."""
+    total = sum(by_function.values()) or 1
+
+    print("Hottest functions:")
+    for function, count in by_function.most_common(top):
+        print(f"  {100 * count / total:5.1f}%  {count:>10}  {function}")
+
+    print("Hottest lines:")
+    for (vm_file, jack_line), count in by_line.most_common(top):
+        text = ""
+        if jack_line is not None and vm_file in sources:
+            text = sources[vm_file][jack_line - 1].strip()
+        where = f"{vm_file}.jack:{jack_line}" if jack_line is not None else vm_file
+        print(f"  {100 * count / total:5.1f}%  {count:>10}  {where:<24} {text}")
+
+
+def main(asm_file: str, max_cycles: int):
+    """
+    Profiles `asm_file` using `{asm_file}.map` and, for every VM file it names,
+    `{vm_file}.vm.map` and `{vm_file}.jack` next to it when they exist.
+    """
+    directory = os.path.dirname(asm_file)
+    with open(asm_file, "r", encoding="utf-8") as f:
+        asm_code = f.read().split("\n")
+    asm_rows = read_rows(f"{asm_file}.map")
+
+    vm_rows, sources = {}, {}
+    for vm_file in {row.split()[1] for row in asm_rows}:
+        base = os.path.join(directory, vm_file)
+        if os.path.exists(f"{base}.vm.map"):
+            vm_rows[vm_file] = read_rows(f"{base}.vm.map")
+        if os.path.exists(f"{base}.jack"):
+            with open(f"{base}.jack", "r", encoding="utf-8") as f:
+                sources[vm_file] = f.read().split("\n")
+
+    locations = SourceMap(source_map(asm_code), asm_rows, vm_rows)
+    emulator = Emulator(assemble_lines(asm_code))
+    cycles = sample(emulator, max_cycles)
+    print(f"{emulator.cycles} cycles{', halted' if emulator.halted else ''}")
+    print_report(*attribute(cycles, locations), sources)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python profiler.py Prog.asm [max_cycles]")
+    else:
+        main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000)
@@ -0,0 +1,230 @@
+"""
+Execution trace of the last instructions a Hack program ran, cheap enough to
+leave on for runs of billions of cycles.
+
+TracingEmulator keeps one record per instruction (its cycle and pc, and A,
+D and the memory write after it) in lists allocated up front and used as a
+ring buffer, so only the last `size` records are kept and a step allocates
+nothing. Records carry their own cycle, as the cycle count does not tell
+which instructions were traced: a run may start at any cycle, and the idle
+loops `run_until_idle` skips leave gaps. The trace is dumped when the
+machine halts, when it writes to a watched RAM address, and when the run
+raises, e.g. on Ctrl-C.
+
+Usage: python tracer.py Prog.asm [--size N] [--watch ADDRESS,...] [--max-cycles N]
+
+The dump names, for each instruction, the `// command` comment the VM
+translator put before its code.
+"""
+
+import sys
+from typing import Optional, TextIO
+from assembler import assemble_lines
+from emulator import Emulator
+
+TRACE_SIZE = 1000
+NO_WRITE = -1
+
+
+def vm_comments(asm_code: list[str]) -> list[str]:
+    """For every ROM address, the last full-line comment before its instruction."""
+    comments = []
+    comment = ""
+    for line in asm_code:
+        line = line.strip()
+        if line.startswith("//"):
+            comment = line[2:].strip()
+        elif line.split("//")[0].strip() and not line.startswith("("):
+            comments.append(comment)
+    return comments
+
+
+class TracingEmulator(Emulator):
+    """
+    Emulator whose `run` and `step` record the last `size` instructions.
+    `watch` holds RAM addresses to stop at after a write to them.
+    `stop_reason` tells why the last run stopped: "halt", "watch", "error",
+    or None when it used up its cycles. Loading a snapshot or resetting
+    clears the trace.
+
+    Traps are not traced: a jump to a trap shows as the jump alone.
+    """
+
+    def __init__(
+        self,
+        machine_code: list[str],
+        size: int = TRACE_SIZE,
+        watch: tuple[int, ...] = (),
+        output: Optional[TextIO] = sys.stderr,
+        comments: Optional[list[str]] = None,
+    ):
+        super().__init__(machine_code)
+        self.size = size
+        self.watch = set(watch)
+        self.output = output  # None to not dump
+        self.comments = comments
+        self.stop_reason: Optional[str] = None
+        self.last_slot = size - 1
+        self.recorded = 0  # records kept, up to `size`
+        self.cycle_numbers = [0] * size
+        self.pcs = [0] * size
+        self.a_values = [0] * size
+        self.d_values = [0] * size
+        self.write_addresses = [NO_WRITE] * size
+        self.write_values = [0] * size
+
+    def clear_trace(self):
+        self.last_slot = self.size - 1
+        self.recorded = 0
+
+    def reset(self):
+        super().reset()
+        self.clear_trace()
+
+    def load_snapshot(self, path: str):
+        super().load_snapshot(path)
+        self.clear_trace()
+
+    def records(self) -> list[tuple[int, int, int, int, int, int]]:
+        """The kept records as (cycle, pc, a, d, write address, value), oldest first."""
+        records = []
+        for index in range(self.last_slot - self.recorded + 1, self.last_slot + 1):
+            slot = index % self.size
+            records.append(
+                (
+                    self.cycle_numbers[slot],
+                    self.pcs[slot],
+                    self.a_values[slot],
+                    self.d_values[slot],
+                    self.write_addresses[slot],
+                    self.write_values[slot],
+                )
+            )
+        return records
+
+    def dump(self, output: TextIO):
+        records = self.records()
+        print(
+            f"Last {len(records)} instructions, at {self.cycles} cycles ({self.stop_reason}), pc={self.pc}:",
+            file=output,
+        )
+        print(f"{'cycle':>12} {'pc':>6} {'A':>6} {'D':>6}  write", file=output)
+        for cycle, pc, a, d, address, value in records:
+            write = f"RAM[{address}]={value}" if address != NO_WRITE else ""
+            line = f"{cycle:>12} {pc:>6} {a:>6} {d:>6}  {write}"
+            if self.comments and pc < len(self.comments) and self.comments[pc]:
+                line = f"{line:<52} // {self.comments[pc]}"
+            print(line.rstrip(), file=output)
+
+    def run(self, max_cycles: int = 10_000_000) -> int:
+        """Runs like `Emulator.run`, recording every instruction."""
+        # A copy of the loop of Emulator.run, which must stay in step with it
+        # and Emulator.step; check_tracer.py compares them, traps included.
+        rom = self.rom
+        ram = self.ram
+        traps = self.traps
+        watch = self.watch
+        size = self.size
+        slot = self.last_slot
+        cycle_numbers = self.cycle_numbers
+        pcs, a_values, d_values = self.pcs, self.a_values, self.d_values
+        write_addresses, write_values = self.write_addresses, self.write_values
+        a, d, pc = self.a, self.d, self.pc
+        end = self.cycles + max_cycles
+        start = cycles = self.cycles
+        self.stop_reason = None
+
+        try:
+            while cycles < end:
+                if not 0 <= pc < len(rom):
+                    self.halted = True
+                    break
+                instruction = rom[pc]
+                cycles += 1
+                slot += 1
+                if slot == size:
+                    slot = 0
+                cycle_numbers[slot] = cycles
+                pcs[slot] = pc
+                computation = instruction[0]
+                if computation is None:
+                    a = instruction[1]
+                    a_values[slot] = a
+                    d_values[slot] = d
+                    write_addresses[slot] = NO_WRITE
+                    pc += 1
+                    continue
+
+                _, write_a, write_d, write_m, jump = instruction
+                address = a & 0x7FFF
+                value = computation(a, d, ram[address]) & 0xFFFF
+                if value & 0x8000:
+                    value -= 0x10000
+                if write_m:
+                    ram[address] = value
+                    write_addresses[slot] = address
+                    write_values[slot] = value
+                    if address in watch:
+                        self.stop_reason = "watch"
+                        end = cycles  # stop once this instruction is done
+                else:
+                    write_addresses[slot] = NO_WRITE
+                if write_a:
+                    a = value
+                if write_d:
+                    d = value
+                a_values[slot] = a
+                d_values[slot] = d
+
+                if jump(value):
+                    if address == pc - 1 and rom[address] == (None, address):
+                        self.halted = True
+                        break
+                    pc = address
+                    if address in traps:
+                        self.a, self.d, self.pc = a, d, pc
+                        traps[address](self)
+                        a, d, pc = self.a, self.d, self.pc
+                        if self.halted:
+                            break
+                else:
+                    pc += 1
+        except BaseException:
+            self.stop_reason = "error"
+            raise
+        finally:
+            self.recorded = min(size, self.recorded + cycles - start)
+            self.a, self.d, self.pc, self.cycles = a, d, pc, cycles
+            self.last_slot = slot
+            if self.halted and self.stop_reason is None:
+                self.stop_reason = "halt"
+            if self.stop_reason is not None and self.output is not None:
+                self.dump(self.output)
+
+        return cycles - start
+
+    def step(self) -> bool:
+        """Executes and records one instruction, like `Emulator.step`."""
+        if self.halted:
+            return False
+        self.run(1)
+        return not self.halted
+
+
+def option(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--"):
+        print("Usage: python tracer.py Prog.asm [--size N] [--watch ADDRESS,...] [--max-cycles N]")
+    else:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            asm_code = f.read().split("\n")
+        watch = tuple(int(address) for address in option("--watch", "").split(",") if address)
+        emulator = TracingEmulator(
+            assemble_lines(asm_code), int(option("--size", "20")), watch, sys.stdout, vm_comments(asm_code)
+        )
+        emulator.run(int(option("--max-cycles", "10000000")))
+        if emulator.stop_reason is None:
+            print(f"Still running after {emulator.cycles} cycles")
@@ -0,0 +1,5 @@
+// Expected results from SimpleAdd.tst and SimpleAdd.cmp
+cycles 60
+set 0 256
+expect 0 257
+expect 256 15
@@ -0,0 +1,14 @@
+// Expected results from StackTest.tst and StackTest.cmp
+cycles 1000
+set 0 256
+expect 0 266
+expect 256 -1
+expect 257 0
+expect 258 0
+expect 259 0
+expect 260 -1
+expect 261 0
+expect 262 -1
+expect 263 0
+expect 264 0
+expect 265 -91
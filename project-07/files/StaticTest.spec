@@ -0,0 +1,4 @@
+// Expected results from StaticTest.tst and StaticTest.cmp
+cycles 200
+set 0 256
+expect 256 1110
@@ -0,0 +1,265 @@
+"""
+Control-flow optimizations over generated Hack assembly.
+
+The program is split into basic blocks, which start at labels and end after
+jumps. A jump's target is known when the instruction before it loads a
+label; other labels loaded into A (return addresses) may be reached by the
+computed jumps of `return`, so their blocks are always kept.
+
+The passes run until nothing changes:
+- labels at the same address are merged into the function entry among
+  them, else into the first one,
+- jumps to a block that only jumps on are pointed at its final target,
+- a conditional jump over an unconditional one becomes the inverse jump,
+- jumps to the next block are dropped,
+- blocks that neither the entry point nor a jump can reach are removed.
+
+Like the translator's own output, the result assumes code after a label sets
+A before reading it, since a removed or retargeted jump leaves another
+address in A.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+INVERSE_JUMPS = {
+    "JGT": "JLE",
+    "JEQ": "JNE",
+    "JGE": "JLT",
+    "JLT": "JGE",
+    "JNE": "JEQ",
+    "JLE": "JGT",
+}
+
+
+@dataclass
+class Block:
+    lines: list[str] = field(default_factory=list)  # labels and comments, then code and comments
+
+    @property
+    def labels(self) -> list[str]:
+        return [line[1:-1] for line in self.lines if is_label(line)]
+
+    @property
+    def instructions(self) -> list[int]:
+        """Positions of the instructions in `lines`."""
+        return [index for index, line in enumerate(self.lines) if is_instruction(line)]
+
+
+def is_label(line: str) -> bool:
+    return line.startswith("(")
+
+
+def is_instruction(line: str) -> bool:
+    return not line.startswith(("(", "//"))
+
+
+def split_jump(line: str) -> tuple[str, str, str]:
+    """Splits a C-instruction into dest, comp and jump."""
+    dest, _, rest = line.rpartition("=") if "=" in line else ("", "", line)
+    comp, _, jump = rest.partition(";")
+    return dest, comp, jump
+
+
+def jump_of(line: str) -> Optional[str]:
+    if line.startswith("@") or ";" not in line:
+        return None
+    return split_jump(line)[2]
+
+
+def split_blocks(lines: list[str]) -> list[Block]:
+    blocks = [Block()]
+    for line in lines:
+        current = blocks[-1]
+        if is_label(line) and current.instructions:
+            blocks.append(Block())
+        blocks[-1].lines.append(line)
+        if jump_of(line):
+            blocks.append(Block())
+    return [block for block in blocks if block.lines]
+
+
+class AsmOptimizer:
+    def __init__(self, lines: list[str]):
+        self.blocks = split_blocks(lines)
+
+    def get_lines(self) -> list[str]:
+        return [line for block in self.blocks for line in block.lines]
+
+    def optimize(self) -> list[str]:
+        changed = True
+        while changed:
+            changed = False
+            for optimization in (
+                self.merge_labels,
+                self.thread_jumps,
+                self.invert_branches,
+                self.remove_jumps_to_next,
+                self.remove_unreachable,
+            ):
+                changed |= optimization()
+        return self.get_lines()
+
+    # --- Analysis ---
+
+    def terminator(self, block: Block) -> Optional[tuple[int, int, Optional[str]]]:
+        """(A-instruction position, jump position, target label) of the jump ending `block`."""
+        positions = block.instructions
+        if not positions or not jump_of(block.lines[positions[-1]]):
+            return None
+
+        jump_position = positions[-1]
+        if len(positions) < 2 or not block.lines[positions[-2]].startswith("@"):
+            return None, jump_position, None
+
+        load_position = positions[-2]
+        _, comp, _ = split_jump(block.lines[jump_position])
+        target = block.lines[load_position][1:]
+        if "A" in comp or "M" in comp or target not in self.label_blocks():
+            return None, jump_position, None  # the jump also uses A, or jumps to an address
+        return load_position, jump_position, target
+
+    def label_blocks(self) -> dict[str, int]:
+        return {label: index for index, block in enumerate(self.blocks) for label in block.labels}
+
+    def address_taken(self) -> set[str]:
+        """Labels loaded into A for something other than a known jump."""
+        jump_loads = set()
+        for block in self.blocks:
+            terminator = self.terminator(block)
+            if terminator and terminator[0] is not None:
+                jump_loads.add((id(block), terminator[0]))
+
+        labels = self.label_blocks()
+        taken = set()
+        for block in self.blocks:
+            for position in block.instructions:
+                line = block.lines[position]
+                if line.startswith("@") and line[1:] in labels and (id(block), position) not in jump_loads:
+                    taken.add(line[1:])
+        return taken
+
+    def is_unconditional(self, block: Block) -> bool:
+        positions = block.instructions
+        return bool(positions) and jump_of(block.lines[positions[-1]]) == "JMP"
+
+    def forwarding_target(self, block: Block) -> Optional[str]:
+        """The label a block jumps to if all it does is `@label 0;JMP`."""
+        positions = block.instructions
+        if len(positions) != 2 or block.lines[positions[1]] != "0;JMP":
+            return None
+        terminator = self.terminator(block)
+        return terminator[2] if terminator else None
+
+    # --- Passes ---
+
+    def rename_labels(self, renames: dict[str, str]):
+        for block in self.blocks:
+            for position in block.instructions:
+                line = block.lines[position]
+                if line.startswith("@") and line[1:] in renames:
+                    block.lines[position] = f"@{renames[line[1:]]}"
+
+    def merge_labels(self) -> bool:
+        renames = {}
+        for block in self.blocks:
+            labels = block.labels
+            if len(labels) < 2:
+                continue
+            # Function names stay, for tools that look functions up by symbol.
+            functions = {line.split()[2] for line in block.lines if line.startswith("// function ")}
+            kept = next((label for label in labels if label in functions), labels[0])
+            merged = [label for label in labels if label != kept]
+            renames.update((label, kept) for label in merged)
+            block.lines = [line for line in block.lines if not (is_label(line) and line[1:-1] in merged)]
+        self.rename_labels(renames)
+        return bool(renames)
+
+    def thread_jumps(self) -> bool:
+        labels = self.label_blocks()
+        changed = False
+        for block in self.blocks:
+            terminator = self.terminator(block)
+            if not terminator or terminator[2] is None:
+                continue
+            load_position, _, target = terminator
+
+            seen = {target}
+            final = target
+            while True:
+                next_target = self.forwarding_target(self.blocks[labels[final]])
+                if next_target is None or next_target in seen:
+                    break
+                seen.add(next_target)
+                final = next_target
+
+            if final != target:
+                block.lines[load_position] = f"@{final}"
+                changed = True
+        return changed
+
+    def invert_branches(self) -> bool:
+        changed = False
+        index = 0
+        while index < len(self.blocks) - 2:
+            block, skipped, following = self.blocks[index : index + 3]
+            terminator = self.terminator(block)
+            jump = terminator and jump_of(block.lines[terminator[1]])
+            over = self.forwarding_target(skipped)
+            if (
+                terminator
+                and terminator[2] in following.labels
+                and jump in INVERSE_JUMPS
+                and over is not None
+                and not skipped.labels
+            ):
+                load_position, jump_position, _ = terminator
+                dest, comp, _ = split_jump(block.lines[jump_position])
+                block.lines[load_position] = f"@{over}"
+                inverted = f"{comp};{INVERSE_JUMPS[jump]}"
+                block.lines[jump_position] = f"{dest}={inverted}" if dest else inverted
+                block.lines += [line for line in skipped.lines if not is_instruction(line)]
+                del self.blocks[index + 1]
+                changed = True
+            index += 1
+        return changed
+
+    def remove_jumps_to_next(self) -> bool:
+        changed = False
+        for index, block in enumerate(self.blocks[:-1]):
+            terminator = self.terminator(block)
+            if not terminator or terminator[2] not in self.blocks[index + 1].labels:
+                continue
+            load_position, jump_position, _ = terminator
+            if "=" in block.lines[jump_position]:
+                continue  # the jump also stores a result
+            del block.lines[jump_position]
+            del block.lines[load_position]
+            changed = True
+        return changed
+
+    def remove_unreachable(self) -> bool:
+        labels = self.label_blocks()
+        pending = [0] + [labels[label] for label in self.address_taken()]
+        reachable = set()
+        while pending:
+            index = pending.pop()
+            if index in reachable or index >= len(self.blocks):
+                continue
+            reachable.add(index)
+            block = self.blocks[index]
+            terminator = self.terminator(block)
+            if terminator and terminator[2] is not None:
+                pending.append(labels[terminator[2]])
+            if not self.is_unconditional(block):
+                pending.append(index + 1)
+
+        if len(reachable) == len(self.blocks):
+            return False
+        self.blocks = [block for index, block in enumerate(self.blocks) if index in reachable]
+        return True
+
+
+def optimize_asm(lines: list[str]) -> list[str]:
+    """Optimized copy of the assembly `lines`."""
+    return AsmOptimizer(lines).optimize()
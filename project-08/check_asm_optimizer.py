@@ -0,0 +1,151 @@
+"""Checks the assembly optimizer pass by pass and on whole programs.
+
+1. Each pass of AsmOptimizer, run once on a small program made for it, must
+   report a change and leave the expected lines.
+2. Every project 7 and 8 test program, translated plainly and with the
+   optimizing translator, must leave the same RAM on the emulator with and
+   without optimize_asm. The optimizer moves code, so words that hold a
+   return address are compared by the labels at it, which may have been
+   merged into one.
+3. The project 9 and 11 programs must print the same text and leave the
+   same heap with and without optimize_asm, using the native OS. Programs
+   that wait for keys forever are not compared.
+"""
+
+import glob
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+
+from asm_optimizer import AsmOptimizer, optimize_asm
+from assembler import assemble_lines, cleanup_lines, first_pass
+from emulator import Emulator
+from native_os import NativeOS, native_traps, natives_for, stub_files
+from regression import DIRECTORIES, find_specs, read_spec, translate
+from rom_budget import Mode
+from vm_translator import VMTranslator, read_vm_files
+
+MAX_CYCLES = 5_000_000
+KEYS = [ord(char) for char in "3\n10\n20\n33\n".replace("\n", "\x80")]  # for the Average programs
+PROGRAMS = sorted(glob.glob(os.path.join(ROOT, "project-09", "*"))) + sorted(
+    glob.glob(os.path.join(ROOT, "project-11", "files", "*"))
+)
+
+# pass: (program, its lines after the pass)
+PASSES = {
+    "merge_labels": (
+        ["@SECOND", "0;JMP", "(FIRST)", "(SECOND)", "D=1"],
+        ["@FIRST", "0;JMP", "(FIRST)", "D=1"],
+    ),
+    "thread_jumps": (
+        ["@HOP", "0;JMP", "(HOP)", "@END", "0;JMP", "(END)", "D=1"],
+        ["@END", "0;JMP", "(HOP)", "@END", "0;JMP", "(END)", "D=1"],
+    ),
+    "invert_branches": (
+        ["@SKIP", "D;JEQ", "@FAR", "0;JMP", "(SKIP)", "D=1", "(FAR)", "D=0"],
+        ["@FAR", "D;JNE", "(SKIP)", "D=1", "(FAR)", "D=0"],
+    ),
+    "remove_jumps_to_next": (
+        ["D=1", "@NEXT", "0;JMP", "(NEXT)", "D=0"],
+        ["D=1", "(NEXT)", "D=0"],
+    ),
+    "remove_unreachable": (
+        ["@END", "0;JMP", "(DEAD)", "D=1", "(END)", "@END", "0;JMP"],
+        ["@END", "0;JMP", "(END)", "@END", "0;JMP"],
+    ),
+}
+
+
+def check_passes() -> bool:
+    correct = True
+    for name, (lines, expected) in PASSES.items():
+        optimizer = AsmOptimizer(lines)
+        changed = getattr(optimizer, name)()
+        result = optimizer.get_lines()
+        print(f"  {name}: {result}")
+        correct = correct and changed and result == expected
+    return correct
+
+
+def labels_at(asm: list[str]) -> dict[int, set[str]]:
+    labels: dict[int, set[str]] = {}
+    for label, address in first_pass(cleanup_lines(asm)).items():
+        labels.setdefault(address, set()).add(label)
+    return labels
+
+
+def same_ram(ram: list[int], asm: list[str], optimized_ram: list[int], optimized_asm: list[str]) -> bool:
+    """True if the RAMs are the same, with return addresses that are at the same labels taken as equal."""
+    labels, optimized_labels = labels_at(asm), labels_at(optimized_asm)
+    return all(
+        value == optimized_value
+        or any(label.startswith("ret.") for label in labels.get(value, ()))
+        and bool(labels[value] & optimized_labels.get(optimized_value, set()))
+        for value, optimized_value in zip(ram, optimized_ram)
+    )
+
+
+def check_specs() -> bool:
+    same = True
+    for spec_file in find_specs(DIRECTORIES):
+        spec = read_spec(spec_file)
+        for optimize in (False, True):
+            runs = []
+            for cfg in (False, True):
+                asm = translate(spec, Mode(optimize=optimize, cfg=cfg))
+                emulator = Emulator(assemble_lines(asm))
+                for address, value in spec.ram.items():
+                    emulator.ram[address] = value
+                emulator.run(spec.cycles)
+                runs += [emulator.ram, asm]
+            matches = same_ram(*runs)
+            print(f"  {spec.name}, {'optimized' if optimize else 'plain'}: {'same' if matches else 'DIFFERENT'}")
+            same = same and matches
+    return same
+
+
+def emulate(files: dict[str, list[str]], optimize: bool, cfg: bool) -> tuple[str, list[int], bool]:
+    """The text printed, the heap, and whether the program halted."""
+    native = NativeOS([0] * 32768, KEYS)
+    natives = natives_for(native, files)
+    translator = VMTranslator(optimize)
+    translator.bootstrap()
+    translator.translate_files({**files, **stub_files(files, natives)})
+    asm = translator.get_translated_code()
+    if cfg:
+        asm = optimize_asm(asm)
+
+    emulator = Emulator(assemble_lines(asm))
+    emulator.ram = native.ram
+    emulator.traps = native_traps(natives, first_pass(cleanup_lines(asm)))
+    emulator.run(MAX_CYCLES)
+    return native.get_output(), native.ram[2048:16384], native.halted
+
+
+def check_programs() -> bool:
+    same = True
+    for directory in PROGRAMS:
+        files = read_vm_files(sorted(glob.glob(os.path.join(directory, "*.vm"))))
+        name = os.path.relpath(directory, ROOT)
+        for optimize in (False, True):
+            plain, optimized = emulate(files, optimize, False), emulate(files, optimize, True)
+            mode = "optimized" if optimize else "plain"
+            if not (plain[2] and optimized[2]):
+                print(f"  {name}, {mode}: still running, not compared")  # square waits for keys forever
+                continue
+            matches = plain == optimized
+            print(f"  {name}, {mode}: {'same' if matches else 'DIFFERENT'}: {plain[0]!r}")
+            same = same and matches
+    return same
+
+
+if __name__ == "__main__":
+    print("Passes:")
+    error_found = not check_passes()
+    print("Project 7 and 8 programs with and without optimize_asm:")
+    error_found = not check_specs() or error_found
+    print("Project 9 and 11 programs with and without optimize_asm:")
+    error_found = not check_programs() or error_found
+    print("Error found" if error_found else "No errors found!")
@@ -0,0 +1,96 @@
+"""Checks the heap tracker on a Jack driver with a known leak.
+
+The driver keeps one Box in a static, frees another and leaves the Array
+allocated by Main.leak unreachable once it returns. On the VM interpreter
+and on the emulator, the tracker must count the three allocations and the
+one deallocation by the function that made them, reach the expected
+high-water mark, and report the Array, and only it, as leaked.
+"""
+
+import os
+import sys
+from io import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-11"))
+
+from compile_engine import CompileEngine
+from heap_tracker import Block, run
+from tokenizer import get_tokens, remove_comments
+
+MAX_STEPS = 100_000
+LEAKED_SIZE = 5
+BOX_SIZE = 3
+
+CLASSES = {
+    "Main": f"""
+class Main {{
+    static Box kept;
+
+    function void main() {{
+        var Box freed;
+        let kept = Box.new();
+        do Main.leak();
+        let freed = Box.new();
+        do freed.dispose();
+        return;
+    }}
+
+    function void leak() {{
+        var Array lost;
+        let lost = Array.new({LEAKED_SIZE});
+        let lost[0] = 1;
+        return;
+    }}
+}}
+""",
+    "Box": """
+class Box {
+    field int a, b, c;
+
+    constructor Box new() {
+        let a = 1;
+        return this;
+    }
+
+    method void dispose() {
+        do Memory.deAlloc(this);
+        return;
+    }
+}
+""",
+}
+ALLOCS = {"Box.new": 2, "Main.leak": 1}
+FREES = {"Box.new": 1}
+HIGH_WATER = BOX_SIZE + LEAKED_SIZE + BOX_SIZE  # the second Box is made before it is freed
+
+
+def compile_jack(code: str) -> list[str]:
+    output_stream = StringIO()
+    CompileEngine(get_tokens(remove_comments(code)), output_stream)
+    return output_stream.getvalue().splitlines()
+
+
+def check(use_emulator: bool) -> bool:
+    files = {class_name: compile_jack(code) for class_name, code in CLASSES.items()}
+    runner, tracker, _ = run(files, use_emulator, MAX_STEPS, [])
+    leaks = list(tracker.leaks().values())
+    print(
+        f"  {'emulator' if use_emulator else 'interpreter'}: allocations {dict(tracker.allocs)}, "
+        f"deallocations {dict(tracker.frees)}, high-water mark {tracker.high_water}, leaks {leaks}"
+    )
+    return (
+        runner.halted
+        and tracker.allocs == ALLOCS
+        and tracker.frees == FREES
+        and tracker.bad_frees == 0
+        and tracker.high_water == HIGH_WATER
+        and leaks == [Block(LEAKED_SIZE, "Main.leak", 2)]
+    )
+
+
+if __name__ == "__main__":
+    print("Heap of the driver:")
+    error_found = not check(False)
+    error_found = not check(True) or error_found
+    print("Error found" if error_found else "No errors found!")
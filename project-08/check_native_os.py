@@ -0,0 +1,249 @@
+"""Checks the native OS against Jack implementations and across the two machines.
+
+1. Math: a driver runs Math on random operands twice, once with the textbook
+   Jack algorithms below compiled by project 11, once with the natives. Both
+   runs must store the same results, on the VM interpreter and on the Hack
+   emulator, and the native runs should be much faster.
+2. Natives without arguments, whose return value goes where the return
+   address was, must give their values on both machines.
+3. The project 9 programs must print the same text and leave the same heap
+   on the VM interpreter and on the emulator, both using the natives.
+"""
+
+import glob
+import os
+import random
+import sys
+import time
+from io import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+sys.path.append(os.path.join(ROOT, "project-11"))
+
+from assembler import assemble_lines, cleanup_lines, first_pass
+from compile_engine import CompileEngine
+from emulator import Emulator
+from native_os import KBD, NativeOS, native_traps, natives_for, stub_files
+from tokenizer import get_tokens, remove_comments
+from vm_interpreter import VMInterpreter
+from vm_translator import VMTranslator, read_vm_files
+
+PAIRS = 200
+INPUT, OUTPUT = 8000, 9000  # operand pairs, then six results per pair
+MAX_STEPS = 10_000_000  # VM commands
+CYCLES_PER_COMMAND = 20  # about, so the emulator gets as far as the interpreter
+KEYS = [ord(char) for char in "3\n10\n20\n33\n".replace("\n", "\x80")]  # for project-09/average
+
+DRIVER = f"""
+class Main {{
+    function void main() {{
+        var Array input, output;
+        var int i, x, y;
+        let input = {INPUT};
+        let output = {OUTPUT};
+        while (i < {PAIRS}) {{
+            let x = input[i + i];
+            let y = input[i + i + 1];
+            let output[0] = x * y;
+            let output[1] = x / y;
+            let output[2] = Math.sqrt(Math.abs(x));
+            let output[3] = Math.min(x, y);
+            let output[4] = Math.max(x, y);
+            let output[5] = Math.abs(y);
+            let output = output + 6;
+            let i = i + 1;
+        }}
+        return;
+    }}
+}}
+"""
+
+ZERO_ARGUMENTS = f"""
+class Main {{
+    function void main() {{
+        var Array output;
+        let output = {OUTPUT};
+        let output[0] = String.newLine();
+        let output[1] = String.backSpace();
+        let output[2] = String.doubleQuote();
+        let output[3] = Keyboard.keyPressed();
+        let output[4] = 7;
+        return;
+    }}
+}}
+"""
+KEY = 65
+ZERO_ARGUMENT_RESULTS = [128, 129, 34, KEY, 7]  # the last one is stored after the calls returned
+
+MATH = """
+class Math {
+    function int abs(int x) {
+        if (x < 0) { return -x; }
+        return x;
+    }
+
+    function int min(int x, int y) {
+        if (x < y) { return x; }
+        return y;
+    }
+
+    function int max(int x, int y) {
+        if (x > y) { return x; }
+        return y;
+    }
+
+    function int multiply(int x, int y) {
+        var int sum, shiftedX, mask, i;
+        let shiftedX = x;
+        let mask = 1;
+        while (i < 16) {
+            if (~((y & mask) = 0)) { let sum = sum + shiftedX; }
+            let shiftedX = shiftedX + shiftedX;
+            let mask = mask + mask;
+            let i = i + 1;
+        }
+        return sum;
+    }
+
+    function int divide(int x, int y) {
+        var int result;
+        if (y = 0) { do Sys.error(3); }
+        let result = Math.dividePositive(Math.abs(x), Math.abs(y));
+        if ((x < 0) = (y < 0)) { return result; }
+        return -result;
+    }
+
+    function int dividePositive(int x, int y) {
+        var int q;
+        if ((y > x) | (y < 0)) { return 0; }
+        let q = Math.dividePositive(x, y + y);
+        if ((x - (q * (y + y))) < y) { return q + q; }
+        return q + q + 1;
+    }
+
+    function int sqrt(int x) {
+        var int y, power, approx, square;
+        if (x < 0) { do Sys.error(4); }
+        let power = 128;
+        while (power > 0) {
+            let approx = y + power;
+            let square = approx * approx;
+            if (~(square > x) & (square > 0)) { let y = approx; }
+            let power = power / 2;
+        }
+        return y;
+    }
+}
+"""
+
+
+def compile_jack(code: str) -> list[str]:
+    output_stream = StringIO()
+    CompileEngine(get_tokens(remove_comments(code)), output_stream)
+    return output_stream.getvalue().splitlines()
+
+
+def operands(seed: int = 0) -> list[int]:
+    """Random operand pairs; -32768 and zero divisors are left out, where the textbook code errs."""
+    rng = random.Random(seed)
+    values = []
+    for _ in range(PAIRS):
+        limit = rng.choice((10, 200, 32767))
+        values.append(rng.randint(-limit, limit))
+        values.append(rng.choice((-1, 1)) * rng.randint(1, limit))
+    return values
+
+
+def interpret(files: dict[str, list[str]], ram: list[int], keys=(), max_steps: int = MAX_STEPS):
+    native = NativeOS(ram, keys)
+    natives = natives_for(native, files)
+    files = {**files, **stub_files(files, natives)}
+    interpreter = VMInterpreter(files, natives, ram)
+    interpreter.bootstrap()
+    start = time.perf_counter()
+    interpreter.run(max_steps)
+    return interpreter, native, time.perf_counter() - start
+
+
+def emulate(files: dict[str, list[str]], ram: list[int], keys=(), max_steps: int = MAX_STEPS):
+    native = NativeOS(ram, keys)
+    natives = natives_for(native, files)
+    files = {**files, **stub_files(files, natives)}
+    translator = VMTranslator()
+    translator.bootstrap()
+    for file_name, code in files.items():
+        translator.translate_file(file_name, code)
+    asm = translator.get_translated_code()
+
+    emulator = Emulator(assemble_lines(asm))
+    emulator.ram = ram
+    emulator.traps = native_traps(natives, first_pass(cleanup_lines(asm)))
+    start = time.perf_counter()
+    emulator.run(max_steps * CYCLES_PER_COMMAND)
+    return emulator, native, time.perf_counter() - start
+
+
+def check_math() -> bool:
+    driver = {"Main": compile_jack(DRIVER)}
+    reference = {**driver, "Math": compile_jack(MATH)}
+    values = operands()
+    results = {}
+    for machine in (interpret, emulate):
+        for name, files in (("Jack Math", reference), ("native Math", driver)):
+            ram = [0] * 32768
+            ram[INPUT : INPUT + len(values)] = values
+            runner, native, seconds = machine(files, ram)
+            work = runner.steps if machine is interpret else runner.cycles
+            unit = "VM commands" if machine is interpret else "cycles"
+            print(f"  {machine.__name__} with {name}: {work} {unit}, {seconds:.3f}s")
+            results[machine.__name__, name] = ram[OUTPUT : OUTPUT + 6 * PAIRS]
+
+    expected = results["interpret", "Jack Math"]
+    return all(result == expected for result in results.values())
+
+
+def check_zero_arguments() -> bool:
+    files = {"Main": compile_jack(ZERO_ARGUMENTS)}
+    same = True
+    for machine in (interpret, emulate):
+        ram = [0] * 32768
+        ram[KBD] = KEY
+        machine(files, ram, max_steps=10_000)
+        results = ram[OUTPUT : OUTPUT + len(ZERO_ARGUMENT_RESULTS)]
+        print(f"  {machine.__name__}: {results}")
+        same = same and results == ZERO_ARGUMENT_RESULTS
+    return same
+
+
+def check_programs() -> bool:
+    same = True
+    for directory in sorted(glob.glob(os.path.join(ROOT, "project-09", "*"))):
+        files = read_vm_files(sorted(glob.glob(os.path.join(directory, "*.vm"))))
+        runs = []
+        for machine in (interpret, emulate):
+            ram = [0] * 32768
+            runner, native, seconds = machine(files, ram, KEYS, max_steps=100_000)
+            runs.append((native.get_output(), ram[2048:16384], runner.halted))
+
+        name = os.path.basename(directory)
+        if not (runs[0][2] and runs[1][2]):
+            print(f"  {name}: still running, not compared")  # square waits for keys forever
+            continue
+        print(f"  {name}: {runs[0][0]!r}")
+        same = same and runs[0] == runs[1]
+    return same
+
+
+def main():
+    print("Math against the textbook Jack implementation:")
+    error_found = not check_math()
+    print("Natives without arguments:")
+    error_found = not check_zero_arguments() or error_found
+    print("Project 9 programs on both machines:")
+    error_found = not check_programs() or error_found
+    print("Error found" if error_found else "No errors found!")
+
+
+if __name__ == "__main__":
+    main()
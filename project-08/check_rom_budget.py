@@ -0,0 +1,86 @@
+"""Checks the ROM budget against the assembler.
+
+1. A program of exactly ROM_SIZE instructions assembles; one more
+   instruction, or a VM program whose budget overflows, raises ValueError in
+   assemble_lines.
+2. For the project 8, 9 and 11 programs, the total measure() gives in every
+   mode must be the number of words assemble_lines makes of the same
+   program.
+"""
+
+import glob
+import itertools
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+
+from asm_optimizer import optimize_asm
+from assembler import assemble_lines
+from inliner import ROM_SIZE, Inliner
+from rom_budget import Mode, measure, read_program
+from vm_translator import VMTranslator, count_instructions, instruction_count
+
+PROGRAMS = (
+    sorted(glob.glob(os.path.join(ROOT, "project-08", "files", "*", "")))
+    + sorted(glob.glob(os.path.join(ROOT, "project-09", "*", "")))
+    + sorted(glob.glob(os.path.join(ROOT, "project-11", "files", "*", "")))
+)
+MODES = [Mode(*flags) for flags in itertools.product((False, True), repeat=3)]
+OVERFLOWING = {"Sys": ["function Sys.init 0"] + ["push constant 1", "pop static 0"] * (ROM_SIZE // 8)}
+
+
+def translate(files: dict[str, list[str]], mode: Mode) -> list[str]:
+    """The assembly of `files` in `mode`, translated the way measure() translates it."""
+    translator = VMTranslator(mode.optimize)
+    if any(command == "function Sys.init 0" for code in files.values() for command in code):
+        translator.bootstrap()
+    if mode.inline:
+        inliner = Inliner(files, instruction_count, ROM_SIZE - count_instructions(translator.lines))
+        inliner.inline()
+        files = inliner.get_files()
+    translator.translate_files(files)
+    asm = translator.get_translated_code()
+    return optimize_asm(asm) if mode.cfg else asm
+
+
+def raises_value_error(asm: list[str]) -> bool:
+    try:
+        assemble_lines(asm)
+    except ValueError as error:
+        print(f"    ValueError: {error}")
+        return True
+    return False
+
+
+def check_rom_size() -> bool:
+    fits = len(assemble_lines(["@0"] * ROM_SIZE)) == ROM_SIZE
+    print(f"  {ROM_SIZE} instructions: {'assembled' if fits else 'NOT assembled'}")
+    print(f"  {ROM_SIZE + 1} instructions:")
+    one_more = raises_value_error(["@0"] * (ROM_SIZE + 1))
+    budget = measure(OVERFLOWING, Mode())
+    print(f"  VM program of {budget.instructions} instructions, overflow {budget.overflow}:")
+    overflowing = raises_value_error(translate(OVERFLOWING, Mode()))
+    return fits and one_more and budget.overflow > 0 and overflowing
+
+
+def check_totals() -> bool:
+    same = True
+    for directory in PROGRAMS:
+        files = read_program([directory])
+        totals = [(measure(files, mode).instructions, len(assemble_lines(translate(files, mode)))) for mode in MODES]
+        matches = all(measured == assembled for measured, assembled in totals)
+        print(f"  {os.path.relpath(directory, ROOT)}: {' '.join(str(measured) for measured, _ in totals)}")
+        if not matches:
+            print(f"    assembled: {' '.join(str(assembled) for _, assembled in totals)}")
+        same = same and matches
+    return same
+
+
+if __name__ == "__main__":
+    print("ROM size:")
+    error_found = not check_rom_size()
+    print(f"Budget totals against assembled programs, in modes {', '.join(map(str, MODES))}:")
+    error_found = not check_totals() or error_found
+    print("Error found" if error_found else "No errors found!")
@@ -0,0 +1,115 @@
+"""Runs deep tail recursion on the emulator with and without the optimizing translator.
+
+Without tail calls every level leaves a frame on the stack, which grows past
+the heap base at 2048; with them the stack stays at a constant depth.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project-06"))
+
+from assembler import assemble_lines
+from emulator import Emulator, to_signed
+from vm_translator import VMTranslator, clean
+
+HEAP_BASE = 2048
+DEPTH = 1000
+
+PROGRAM = f"""
+function Sys.init 0
+    push constant {DEPTH}
+    push constant 0
+    call Main.sum 2
+    pop static 0
+    push constant {DEPTH + 1}
+    call Main.isEven 1
+    pop static 1
+label END
+    goto END
+
+// sum(n, total) = n == 0 ? total : sum(n - 1, total + n), recursing into itself
+function Main.sum 0
+    push argument 0
+    push constant 0
+    eq
+    if-goto SUM_DONE
+    push argument 0
+    push constant 1
+    sub
+    push argument 1
+    push argument 0
+    add
+    call Main.sum 2
+    return
+label SUM_DONE
+    push argument 1
+    return
+
+// isEven(n) and isOdd(n, unused) call each other with different argument counts
+function Main.isEven 0
+    push argument 0
+    push constant 0
+    eq
+    if-goto EVEN_DONE
+    push argument 0
+    push constant 1
+    sub
+    push constant 0
+    call Main.isOdd 2
+    return
+label EVEN_DONE
+    push constant 0
+    not
+    return
+
+function Main.isOdd 1
+    push argument 0
+    push constant 0
+    eq
+    if-goto ODD_DONE
+    push argument 0
+    push constant 1
+    sub
+    call Main.isEven 1
+    return
+label ODD_DONE
+    push constant 0
+    return
+"""
+
+
+def run(optimize: bool) -> tuple[int, int, int, int]:
+    """Returns sum, isEven, the highest stack pointer and the cycle count."""
+    translator = VMTranslator(optimize)
+    translator.bootstrap()
+    translator.translate_files({"Main": clean(PROGRAM.splitlines())})
+
+    emulator = Emulator(assemble_lines(translator.get_translated_code()))
+    highest_sp = 0
+    while emulator.step():
+        highest_sp = max(highest_sp, emulator.ram[0])
+
+    # Main.0 and Main.1 are the first variables, at 16 and 17
+    return emulator.ram[16], emulator.ram[17], highest_sp, emulator.cycles
+
+
+def main():
+    expected = (to_signed(DEPTH * (DEPTH + 1) // 2), 0)
+    error_found = False
+
+    for optimize in (False, True):
+        total, is_even, highest_sp, cycles = run(optimize)
+        name = "with tail calls" if optimize else "without tail calls"
+        print(f"{name}: sum={total} isEven={is_even} highest SP={highest_sp} cycles={cycles}")
+
+        if (total, is_even) != expected:
+            error_found = True
+        if optimize and highest_sp >= HEAP_BASE:
+            error_found = True
+
+    print("Error found" if error_found else "No errors found!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+// Expected results from BasicLoop.tst and BasicLoop.cmp
+cycles 600
+set 0 256
+set 1 300
+set 2 400
+set 400 3
+expect 0 257
+expect 256 6
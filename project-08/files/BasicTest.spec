@@ -0,0 +1,15 @@
+// Expected results from BasicTest.tst and BasicTest.cmp
+cycles 600
+set 0 256
+set 1 300
+set 2 400
+set 3 3000
+set 4 3010
+expect 256 472
+expect 300 10
+expect 401 21
+expect 402 22
+expect 3006 36
+expect 3012 42
+expect 3015 45
+expect 11 510
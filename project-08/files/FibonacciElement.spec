@@ -0,0 +1,5 @@
+// Expected results from FibonacciElement.tst and FibonacciElement.cmp
+cycles 6000
+bootstrap
+expect 0 262
+expect 261 3
@@ -0,0 +1,13 @@
+// Expected results from FibonacciSeries.tst and FibonacciSeries.cmp
+cycles 1100
+set 0 256
+set 1 300
+set 2 400
+set 400 6
+set 401 3000
+expect 3000 0
+expect 3001 1
+expect 3002 1
+expect 3003 2
+expect 3004 3
+expect 3005 5
@@ -0,0 +1,23 @@
+// Expected results from NestedCall.tst and NestedCall.cmp: starts in Sys.init,
+// with the stack as the bootstrap would leave it
+cycles 4000
+set 0 261
+set 1 261
+set 2 256
+set 3 -3
+set 4 -4
+set 5 -1
+set 6 -1
+set 256 1234
+set 257 -1
+set 258 -2
+set 259 -3
+set 260 -4
+set 261..299 -1
+expect 0 261
+expect 1 261
+expect 2 256
+expect 3 4000
+expect 4 5000
+expect 5 135
+expect 6 246
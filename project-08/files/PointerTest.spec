@@ -0,0 +1,8 @@
+// Expected results from PointerTest.tst and PointerTest.cmp
+cycles 450
+set 0 256
+expect 256 6084
+expect 3 3030
+expect 4 3040
+expect 3032 32
+expect 3046 46
@@ -0,0 +1,20 @@
+// Expected results from SimpleFunction.tst and SimpleFunction.cmp
+cycles 300
+set 0 317
+set 1 317
+set 2 310
+set 3 3000
+set 4 4000
+set 310 1234
+set 311 37
+set 312 1000
+set 313 305
+set 314 300
+set 315 3010
+set 316 4010
+expect 0 311
+expect 1 305
+expect 2 300
+expect 3 3010
+expect 4 4010
+expect 310 1196
@@ -0,0 +1,6 @@
+// Expected results from StaticsTest.tst and StaticsTest.cmp
+cycles 2500
+bootstrap
+expect 0 263
+expect 261 -2
+expect 262 8
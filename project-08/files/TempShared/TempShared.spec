@@ -0,0 +1,5 @@
+// Sys.init keeps 100 in temp 0 while it calls the leaf function Main.f
+cycles 1000
+bootstrap
+expect 5 100
+expect 6 14
@@ -0,0 +1,229 @@
+"""
+Heap allocation tracker for Jack programs running on the native OS.
+
+Every Memory.alloc and Memory.deAlloc, including the ones made by String.new,
+Array.new and the dispose functions, is recorded with the function that
+called into the OS. The tracker keeps the live blocks, the high-water mark of
+live words and per-function totals, and at exit reports leak candidates: live
+blocks that no static, stack slot, pointer register or other reachable block
+refers to any more.
+
+Usage: python heap_tracker.py DIRECTORY [--emulator] [--max-steps N] [--keys TEXT]
+
+DIRECTORY holds the program's .vm files. It runs on the VM interpreter, or
+translated and assembled on the Hack emulator with --emulator, for at most N
+VM commands (about 20 cycles each on the emulator), which makes soak tests of
+programs that never halt possible. TEXT is typed on the keyboard, with `\\n`
+for the newline key.
+"""
+
+import bisect
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+
+from assembler import assemble_lines, cleanup_lines, first_pass
+from emulator import Emulator
+from native_os import (
+    HEAP_BASE,
+    HEAP_END,
+    NEW_LINE,
+    NativeOS,
+    defined_functions,
+    native_traps,
+    natives_for,
+    stub_files,
+)
+from vm_interpreter import VMInterpreter
+from vm_translator import VMTranslator, read_vm_files
+
+MAX_STEPS = 10_000_000
+CYCLES_PER_COMMAND = 20
+STACK_BASE = 256
+TOP_FUNCTIONS = 10
+
+
+@dataclass
+class Block:
+    size: int
+    function: str
+    event: int  # number of the alloc event
+
+
+class HeapTracker:
+    """
+    Wraps the alloc and de_alloc methods of `native`, so it must be made
+    before `native.functions()` is. `caller` names the Jack function making
+    the current OS call; it is only called on allocation and can be set once
+    the machine running the program exists.
+    """
+
+    def __init__(self, native: NativeOS, caller: Callable[[], str] = lambda: ""):
+        self.native = native
+        self.caller = caller
+        self.live: dict[int, Block] = {}
+        self.live_words = 0
+        self.high_water = 0
+        self.high_water_event = 0
+        self.events = 0
+        self.allocs: Counter[str] = Counter()
+        self.alloc_words: Counter[str] = Counter()
+        self.frees: Counter[str] = Counter()  # by the function that allocated the block
+        self.bad_frees = 0  # addresses that are not live blocks
+
+        alloc, de_alloc = native.alloc, native.de_alloc
+
+        def tracked_alloc(size: int) -> int:
+            address = alloc(size)
+            function = self.caller()
+            self.events += 1
+            self.live[address] = Block(size, function, self.events)
+            self.allocs[function] += 1
+            self.alloc_words[function] += size
+            self.live_words += size
+            if self.live_words > self.high_water:
+                self.high_water = self.live_words
+                self.high_water_event = self.events
+            return address
+
+        def tracked_de_alloc(address: int) -> int:
+            self.events += 1
+            block = self.live.pop(address, None)
+            if block is None:
+                self.bad_frees += 1
+            else:
+                self.frees[block.function] += 1
+                self.live_words -= block.size
+            return de_alloc(address)
+
+        # Instance attributes shadow the methods, so the dispatch table and
+        # the natives that allocate internally both go through the tracker.
+        native.alloc = tracked_alloc  # type: ignore[method-assign]
+        native.de_alloc = tracked_de_alloc  # type: ignore[method-assign]
+
+    def reachable(self) -> set[int]:
+        """
+        Live blocks reachable from the statics, the stack and THIS/THAT. Any
+        word holding a block's address counts as a pointer to it, so this
+        errs on the side of keeping blocks.
+        """
+        ram = self.native.ram
+        pending = [*ram[16:STACK_BASE], *ram[STACK_BASE : ram[0]], ram[3], ram[4]]
+        found: set[int] = set()
+        while pending:
+            value = pending.pop()
+            if value in self.live and value not in found:
+                found.add(value)
+                pending += ram[value : value + self.live[value].size]
+        return found
+
+    def leaks(self) -> dict[int, Block]:
+        reachable = self.reachable()
+        return {address: block for address, block in self.live.items() if address not in reachable}
+
+
+def caller_in_emulator(emulator: Emulator, symbols: dict[str, int], functions: set[str]) -> Callable[[], str]:
+    """The function whose code holds the return address of the trapped call's frame."""
+    starts = sorted((symbols[name], name) for name in functions if name in symbols)
+    addresses = [address for address, _ in starts]
+
+    def caller() -> str:
+        ram = emulator.ram
+        index = bisect.bisect_right(addresses, ram[ram[1] - 5]) - 1
+        return starts[index][1] if index >= 0 else "bootstrap"
+
+    return caller
+
+
+def run(files: dict[str, list[str]], use_emulator: bool, max_steps: int, keys: list[int]):
+    ram = [0] * 32768
+    native = NativeOS(ram, keys)
+    tracker = HeapTracker(native)
+    natives = natives_for(native, files)
+    files = {**files, **stub_files(files, natives)}
+
+    if not use_emulator:
+        runner = VMInterpreter(files, natives, ram)
+        tracker.caller = runner.function
+        runner.bootstrap()
+        start = time.perf_counter()
+        runner.run(max_steps)
+        return runner, tracker, time.perf_counter() - start
+
+    translator = VMTranslator()
+    translator.bootstrap()
+    for file_name, code in files.items():
+        translator.translate_file(file_name, code)
+    asm = translator.get_translated_code()
+    symbols = first_pass(cleanup_lines(asm))
+
+    emulator = Emulator(assemble_lines(asm))
+    emulator.ram = ram
+    tracker.caller = caller_in_emulator(emulator, symbols, defined_functions(files))
+    emulator.traps = native_traps(natives, symbols)
+    start = time.perf_counter()
+    emulator.run(max_steps * CYCLES_PER_COMMAND)
+    return emulator, tracker, time.perf_counter() - start
+
+
+def print_report(tracker: HeapTracker):
+    allocs = sum(tracker.allocs.values())
+    frees = sum(tracker.frees.values())
+    print(f"{allocs} allocations, {frees} deallocations, {len(tracker.live)} blocks live")
+    print(
+        f"Live words: {tracker.live_words} now, high-water mark {tracker.high_water} "
+        f"of {HEAP_END - HEAP_BASE} at event {tracker.high_water_event} of {tracker.events}"
+    )
+    if tracker.bad_frees:
+        print(f"{tracker.bad_frees} deallocations of addresses that were not allocated")
+
+    print("Allocations by calling function:")
+    for function, count in tracker.allocs.most_common(TOP_FUNCTIONS):
+        live = count - tracker.frees[function]
+        print(f"  {count:>8} blocks  {tracker.alloc_words[function]:>8} words  {live:>6} live  {function}")
+
+    leaks = tracker.leaks()
+    if not leaks:
+        print("No leak candidates.")
+        return
+    by_function: Counter[str] = Counter()
+    words: Counter[str] = Counter()
+    for block in leaks.values():
+        by_function[block.function] += 1
+        words[block.function] += block.size
+    print(f"Leak candidates, unreachable live blocks: {len(leaks)}, {sum(words.values())} words")
+    for function, count in by_function.most_common(TOP_FUNCTIONS):
+        print(f"  {count:>8} blocks  {words[function]:>8} words  {function}")
+
+
+def main(directory: str, use_emulator: bool, max_steps: int, keys: list[int]):
+    files = read_vm_files(sorted(glob.glob(os.path.join(directory, "*.vm"))))
+    if not files:
+        print("Error: no .vm files found.")
+        return
+
+    runner, tracker, seconds = run(files, use_emulator, max_steps, keys)
+    work = f"{runner.cycles} cycles" if use_emulator else f"{runner.steps} VM commands"
+    state = "halted" if runner.halted else "still running"
+    print(f"Ran {work} in {seconds:.2f}s, {state}")
+    print_report(tracker)
+
+
+def option(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    if not arguments:
+        print("Usage: python heap_tracker.py DIRECTORY [--emulator] [--max-steps N] [--keys TEXT]")
+    else:
+        keys = [NEW_LINE if char == "\n" else ord(char) for char in option("--keys", "").replace("\\n", "\n")]
+        main(arguments[0], "--emulator" in sys.argv, int(option("--max-steps", str(MAX_STEPS))), keys)
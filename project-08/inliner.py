@@ -0,0 +1,298 @@
+"""
+Inlining of small VM functions into their callers.
+
+A call `call G n` is replaced by G's body. The caller gets extra locals that
+hold G's arguments and locals: the arguments are popped into them at the call
+site and G's locals are cleared there, just like a real call would. Labels of
+the body get unique names, a `return` becomes a jump to the end of the body
+with the result left on the stack, and pointers the body changes are saved
+and restored around it because a return would restore them.
+
+Only functions whose body has exactly one value on the stack at every
+return, that are not recursive, and that use no statics of another file are
+inlined. Inlining stops when the measured program would outgrow the ROM, and
+functions left without callers are removed.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+ROM_SIZE = 32768
+INLINE_THRESHOLD = 12  # body size, in VM commands, of functions worth inlining
+
+BINARY_COMMANDS = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+
+
+@dataclass
+class VMFunction:
+    file_name: str
+    name: str
+    n_locals: int
+    body: list[str]
+
+    def header(self) -> str:
+        return f"function {self.name} {self.n_locals}"
+
+
+@dataclass
+class InlineReport:
+    name: str
+    sites: int
+    rom_delta: int  # instructions added to the program, negative if it shrank
+    cycles_saved: int  # per call, estimated from the straight-line code
+    removed: bool
+
+
+def stack_effect(command: str) -> int:
+    parts = command.split()
+    if parts[0] == "push":
+        return 1
+    if parts[0] in ("pop", "if-goto") or command in BINARY_COMMANDS:
+        return -1
+    if parts[0] == "call":
+        return 1 - int(parts[2])
+    return 0
+
+
+def returns_single_value(body: list[str]) -> bool:
+    """True if the stack holds exactly the result at every return of `body`."""
+    depth: Optional[int] = 0
+    depths: dict[str, int] = {}
+    skipped: set[str] = set()  # labels reached only by jumps seen after them
+
+    for command in body:
+        parts = command.split()
+        if parts[0] == "label":
+            known = depths.get(parts[1])
+            if depth is None:
+                depth = known
+            elif known is not None and known != depth:
+                return False
+            if depth is None:
+                skipped.add(parts[1])
+            else:
+                depths[parts[1]] = depth
+            continue
+        if depth is None:
+            continue  # unreachable
+
+        if parts[0] == "return":
+            if depth != 1:
+                return False
+            depth = None
+            continue
+
+        depth += stack_effect(command)
+        if depth < 0:
+            return False
+        if parts[0] in ("goto", "if-goto"):
+            if parts[1] in skipped or depths.setdefault(parts[1], depth) != depth:
+                return False
+            if parts[0] == "goto":
+                depth = None
+
+    return depth is None
+
+
+class Inliner:
+    """
+    Inlines small functions across the VM files of one program.
+
+    `measure(file_name, code)` returns the number of Hack instructions `code`
+    translates to; it drives both the ROM budget and the report.
+    """
+
+    def __init__(
+        self,
+        files: dict[str, list[str]],
+        measure: Callable[[str, list[str]], int],
+        rom_size: int = ROM_SIZE,
+    ):
+        self.measure = measure
+        self.rom_size = rom_size
+        self.preambles: dict[str, list[str]] = {}
+        self.functions: dict[str, VMFunction] = {}
+        self.inline_count = 0
+
+        for file_name, code in files.items():
+            self.preambles[file_name] = []
+            function = None
+            for command in code:
+                parts = command.split()
+                if parts[0] == "function":
+                    function = VMFunction(file_name, parts[1], int(parts[2]), [])
+                    self.functions[function.name] = function
+                elif function:
+                    function.body.append(command)
+                else:
+                    self.preambles[file_name].append(command)
+
+    def get_files(self) -> dict[str, list[str]]:
+        files = {file_name: list(preamble) for file_name, preamble in self.preambles.items()}
+        for function in self.functions.values():
+            files[function.file_name] += [function.header()] + function.body
+        return files
+
+    def program_size(self) -> int:
+        return sum(self.measure(file_name, code) for file_name, code in self.get_files().items())
+
+    def callees(self, function: VMFunction) -> set[str]:
+        return {command.split()[1] for command in function.body if command.startswith("call ")}
+
+    def recursive_functions(self) -> set[str]:
+        """Functions that can reach themselves through calls."""
+        recursive = set()
+        for name in self.functions:
+            pending = list(self.callees(self.functions[name]))
+            seen = set()
+            while pending:
+                callee = pending.pop()
+                if callee == name:
+                    recursive.add(name)
+                    break
+                if callee in seen or callee not in self.functions:
+                    continue
+                seen.add(callee)
+                pending.extend(self.callees(self.functions[callee]))
+        return recursive
+
+    def can_inline(self, callee: VMFunction, caller: VMFunction) -> bool:
+        uses_statics = any(command.split()[1:2] == ["static"] for command in callee.body)
+        return caller is not callee and not (uses_statics and caller.file_name != callee.file_name)
+
+    def callers(self, callee: VMFunction) -> list[VMFunction]:
+        return [function for function in self.functions.values() if callee.name in self.callees(function)]
+
+    def is_called(self, name: str) -> bool:
+        code = [command for preamble in self.preambles.values() for command in preamble]
+        code += [command for function in self.functions.values() for command in function.body]
+        return name == "Sys.init" or any(
+            command.startswith("call ") and command.split()[1] == name for command in code
+        )
+
+    def saved_pointers(self, callee: VMFunction) -> list[str]:
+        return [index for index in "01" if f"pop pointer {index}" in callee.body]
+
+    def expand(self, callee: VMFunction, n_args: int, base: int) -> list[str]:
+        """The commands replacing `call callee n_args` in a caller whose free locals start at `base`."""
+        self.inline_count += 1
+        suffix = f"$inline.{self.inline_count}"
+        end_label = f"{callee.name}{suffix}"
+        locals_base = base + n_args
+        save_base = locals_base + callee.n_locals
+        pointers = self.saved_pointers(callee)
+
+        code = [f"pop local {base + index}" for index in reversed(range(n_args))]
+        for index in range(callee.n_locals):
+            code += ["push constant 0", f"pop local {locals_base + index}"]
+        for offset, pointer in enumerate(pointers):
+            code += [f"push pointer {pointer}", f"pop local {save_base + offset}"]
+
+        for position, command in enumerate(callee.body):
+            parts = command.split()
+            if parts[0] in ("push", "pop") and parts[1] == "argument":
+                code.append(f"{parts[0]} local {base + int(parts[2])}")
+            elif parts[0] in ("push", "pop") and parts[1] == "local":
+                code.append(f"{parts[0]} local {locals_base + int(parts[2])}")
+            elif parts[0] in ("label", "goto", "if-goto"):
+                code.append(f"{parts[0]} {parts[1]}{suffix}")
+            elif parts[0] == "return":
+                if position < len(callee.body) - 1:
+                    code.append(f"goto {end_label}")
+            else:
+                code.append(command)
+
+        code.append(f"label {end_label}")
+        for offset, pointer in enumerate(pointers):
+            code += [f"push local {save_base + offset}", f"pop pointer {pointer}"]
+        return code
+
+    def locals_needed(self, callee: VMFunction, n_args: int) -> int:
+        return n_args + callee.n_locals + len(self.saved_pointers(callee))
+
+    def call_overhead(self, callee: VMFunction, n_args: int) -> int:
+        """Instructions run by a call and return, minus the moves inlining uses instead.
+
+        This counts clearing the caller's extra locals on entry as well, as if
+        the caller made one call per run.
+        """
+        call = [f"call {callee.name} {n_args}", callee.header(), "return"]
+        moves = ["push constant 0"] * self.locals_needed(callee, n_args)
+        moves += [f"pop local {index}" for index in range(n_args)]
+        moves += ["push constant 0", "pop local 0"] * callee.n_locals
+        moves += ["push pointer 0", "pop local 0", "push local 0", "pop pointer 0"] * len(
+            self.saved_pointers(callee)
+        )
+        return self.measure(callee.file_name, call) - self.measure(callee.file_name, moves)
+
+    def argument_count(self, callee: VMFunction, callers: list[VMFunction]) -> int:
+        """Number of arguments `callers` pass to `callee`."""
+        for caller in callers:
+            for command in caller.body:
+                parts = command.split()
+                if parts[0] == "call" and parts[1] == callee.name:
+                    return int(parts[2])
+        return 0
+
+    def inline_calls(self, callee: VMFunction, callers: list[VMFunction]) -> int:
+        """Replaces every call to `callee` in `callers`; returns the number of sites.
+
+        Each caller gets new locals for `callee`, shared by all of its sites: a
+        site may be inside code inlined earlier, whose locals are still in use.
+        """
+        sites = 0
+        for caller in callers:
+            base = caller.n_locals
+            body = []
+            for command in caller.body:
+                parts = command.split()
+                if parts[0] != "call" or parts[1] != callee.name:
+                    body.append(command)
+                    continue
+                n_args = int(parts[2])
+                body += self.expand(callee, n_args, base)
+                caller.n_locals = max(caller.n_locals, base + self.locals_needed(callee, n_args))
+                sites += 1
+            caller.body = body
+        return sites
+
+    def inline(self) -> list[InlineReport]:
+        reports = []
+        size = self.program_size()
+        recursive = self.recursive_functions()
+        candidates = sorted(self.functions.values(), key=lambda function: len(function.body))
+
+        for callee in candidates:
+            if (
+                callee.name == "Sys.init"
+                or callee.name in recursive
+                or len(callee.body) > INLINE_THRESHOLD
+                or not returns_single_value(callee.body)
+            ):
+                continue
+            callers = [caller for caller in self.callers(callee) if self.can_inline(callee, caller)]
+            n_args = self.argument_count(callee, callers)
+            if not callers or self.call_overhead(callee, n_args) <= 0:
+                continue
+
+            functions = dict(self.functions)
+            snapshot = [(function, function.body, function.n_locals) for function in functions.values()]
+            sites = self.inline_calls(callee, callers)
+
+            removed = not self.is_called(callee.name)
+            if removed:
+                del self.functions[callee.name]
+
+            new_size = self.program_size()
+            if new_size > self.rom_size:
+                # Over budget: undo this function and try the next one.
+                self.functions = functions
+                for function, body, n_locals in snapshot:
+                    function.body, function.n_locals = body, n_locals
+                continue
+
+            cycles_saved = self.call_overhead(callee, n_args)
+            reports.append(InlineReport(callee.name, sites, new_size - size, cycles_saved, removed))
+            size = new_size
+
+        return reports
@@ -0,0 +1,460 @@
+"""
+Python implementations of the Jack OS for fast functional testing.
+
+NativeOS works directly on the emulated RAM, so programs see the same memory
+they would with the compiled OS: objects live on the heap at 2048-16383,
+Screen draws into the screen memory map at 16384 and Keyboard reads the
+keyboard register at 24576. Calls to its functions are trapped by name in
+the VM interpreter and by ROM address in the Hack emulator.
+
+Differences from the compiled OS: Output records text in `output` instead of
+drawing characters on the screen, and the Keyboard read functions take their
+keys from `keys` instead of waiting for the keyboard. Errors halt the
+program the way Sys.error does, printing `ERR<code>`.
+"""
+
+import math
+from collections import deque
+from typing import Callable, Iterable
+
+HEAP_BASE = 2048
+HEAP_END = 16384
+SCREEN = 16384
+KBD = 24576
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+WORDS_PER_ROW = SCREEN_WIDTH // 16
+OUTPUT_ROWS = 23
+OUTPUT_COLUMNS = 64
+
+NEW_LINE = 128
+BACKSPACE = 129
+DOUBLE_QUOTE = 34
+
+# String objects: the character array, the current length and the capacity.
+STRING_CHARS, STRING_LENGTH, STRING_CAPACITY = 0, 1, 2
+
+
+class Halt(Exception):
+    """Raised by a native function to stop the program."""
+
+
+def to_signed(value: int) -> int:
+    """Wraps `value` to a 16-bit two's complement integer."""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def less_than(x: int, y: int) -> bool:
+    """Jack's `x < y`: the compiled code tests the sign of x - y, which overflows for far apart operands."""
+    return to_signed(x - y) < 0
+
+
+class NativeOS:
+    """
+    The OS classes Math, Memory, Array, String, Screen, Output, Keyboard and
+    Sys over a RAM list. `functions()` maps Jack function names to the Python
+    implementations, which take the call's arguments and return its value.
+
+    Functions raise Halt when the program must stop: it called Sys.halt or
+    Sys.error, or a Keyboard function ran out of `keys`.
+    """
+
+    def __init__(self, ram: list[int], keys: Iterable[int] = ()):
+        self.ram = ram
+        self.keys = deque(keys)
+        self.output: list[str] = []
+        self.halted = False
+        self.error_code = 0
+        self.waiting_for_key = False
+        self.color = True
+        self.cursor = (0, 0)
+        self.free_list = HEAP_BASE
+        self.init_heap()
+
+    def functions(self) -> dict[str, Callable[..., int]]:
+        return {
+            "Math.multiply": self.multiply,
+            "Math.divide": self.divide,
+            "Math.sqrt": self.sqrt,
+            "Math.min": lambda x, y: x if less_than(x, y) else y,
+            "Math.max": lambda x, y: y if less_than(x, y) else x,
+            "Math.abs": lambda x: to_signed(abs(x)),
+            "Memory.peek": lambda address: self.ram[address & 0x7FFF],
+            "Memory.poke": self.poke,
+            "Memory.alloc": self.alloc,
+            "Memory.deAlloc": self.de_alloc,
+            "Array.new": self.new_array,
+            "Array.dispose": self.de_alloc,
+            "String.new": self.new_string,
+            "String.dispose": self.dispose_string,
+            "String.length": lambda string: self.ram[string + STRING_LENGTH],
+            "String.charAt": self.char_at,
+            "String.setCharAt": self.set_char_at,
+            "String.appendChar": self.append_char,
+            "String.eraseLastChar": self.erase_last_char,
+            "String.intValue": lambda string: self.int_value(self.read_string(string)),
+            "String.setInt": self.set_int,
+            "String.backSpace": lambda: BACKSPACE,
+            "String.doubleQuote": lambda: DOUBLE_QUOTE,
+            "String.newLine": lambda: NEW_LINE,
+            "Screen.clearScreen": self.clear_screen,
+            "Screen.setColor": self.set_color,
+            "Screen.drawPixel": self.draw_pixel,
+            "Screen.drawLine": self.draw_line,
+            "Screen.drawRectangle": self.draw_rectangle,
+            "Screen.drawCircle": self.draw_circle,
+            "Output.moveCursor": self.move_cursor,
+            "Output.printChar": self.print_char,
+            "Output.printString": self.print_string,
+            "Output.printInt": lambda number: self.print_text(str(number)),
+            "Output.println": lambda: self.print_char(NEW_LINE),
+            "Output.backSpace": lambda: self.print_char(BACKSPACE),
+            "Keyboard.keyPressed": lambda: self.ram[KBD],
+            "Keyboard.readChar": self.read_char,
+            "Keyboard.readLine": self.read_line,
+            "Keyboard.readInt": lambda message: self.int_value(self.read_text(message)),
+            "Sys.halt": self.halt,
+            "Sys.error": self.error,
+            "Sys.wait": self.wait,
+        }
+
+    def get_output(self) -> str:
+        return "".join(self.output)
+
+    # --- Sys ---
+
+    def halt(self) -> int:
+        self.halted = True
+        raise Halt()
+
+    def error(self, code: int) -> int:
+        self.print_text(f"ERR{code}")
+        self.error_code = code
+        return self.halt()
+
+    def wait(self, duration: int) -> int:
+        return self.error(1) if duration < 0 else 0
+
+    # --- Math ---
+
+    def multiply(self, x: int, y: int) -> int:
+        return to_signed(x * y)
+
+    def divide(self, x: int, y: int) -> int:
+        if y == 0:
+            return self.error(3)
+        quotient = abs(x) // abs(y)
+        return to_signed(-quotient if (x < 0) != (y < 0) else quotient)
+
+    def sqrt(self, x: int) -> int:
+        return self.error(4) if x < 0 else math.isqrt(x)
+
+    # --- Memory and Array ---
+
+    def init_heap(self):
+        """One free block spanning the heap: its size, then the next free block."""
+        self.free_list = HEAP_BASE
+        self.ram[HEAP_BASE] = HEAP_END - HEAP_BASE - 1
+        self.ram[HEAP_BASE + 1] = 0
+
+    def poke(self, address: int, value: int) -> int:
+        self.ram[address & 0x7FFF] = value
+        return 0
+
+    def alloc(self, size: int) -> int:
+        """
+        First fit over the free list. Every block starts with a header holding
+        the number of words after it; free blocks keep the next free block in
+        their first word. Large blocks are split, giving away their end.
+        """
+        if size <= 0:
+            return self.error(5)
+
+        ram = self.ram
+        previous, block = 0, self.free_list
+        while block:
+            available = ram[block]
+            if available >= size + 2:
+                ram[block] = available - size - 1
+                allocated = block + available - size
+                ram[allocated] = size
+                return allocated + 1
+            if available >= size:
+                if previous:
+                    ram[previous + 1] = ram[block + 1]
+                else:
+                    self.free_list = ram[block + 1]
+                return block + 1
+            previous, block = block, ram[block + 1]
+        return self.error(6)
+
+    def de_alloc(self, address: int) -> int:
+        block = address - 1
+        self.ram[block + 1] = self.free_list
+        self.free_list = block
+        return 0
+
+    def new_array(self, size: int) -> int:
+        return self.error(2) if size <= 0 else self.alloc(size)
+
+    # --- String ---
+
+    def new_string(self, capacity: int) -> int:
+        if capacity < 0:
+            return self.error(14)
+        string = self.alloc(3)
+        self.ram[string + STRING_CHARS] = self.alloc(capacity) if capacity else 0
+        self.ram[string + STRING_LENGTH] = 0
+        self.ram[string + STRING_CAPACITY] = capacity
+        return string
+
+    def dispose_string(self, string: int) -> int:
+        if self.ram[string + STRING_CHARS]:
+            self.de_alloc(self.ram[string + STRING_CHARS])
+        return self.de_alloc(string)
+
+    def char_at(self, string: int, index: int) -> int:
+        if not 0 <= index < self.ram[string + STRING_LENGTH]:
+            return self.error(15)
+        return self.ram[self.ram[string + STRING_CHARS] + index]
+
+    def set_char_at(self, string: int, index: int, char: int) -> int:
+        if not 0 <= index < self.ram[string + STRING_LENGTH]:
+            return self.error(16)
+        self.ram[self.ram[string + STRING_CHARS] + index] = char
+        return 0
+
+    def append_char(self, string: int, char: int) -> int:
+        length = self.ram[string + STRING_LENGTH]
+        if length >= self.ram[string + STRING_CAPACITY]:
+            return self.error(17)
+        self.ram[self.ram[string + STRING_CHARS] + length] = char
+        self.ram[string + STRING_LENGTH] = length + 1
+        return string
+
+    def erase_last_char(self, string: int) -> int:
+        if self.ram[string + STRING_LENGTH] == 0:
+            return self.error(18)
+        self.ram[string + STRING_LENGTH] -= 1
+        return 0
+
+    def set_int(self, string: int, number: int) -> int:
+        text = str(number)
+        if len(text) > self.ram[string + STRING_CAPACITY]:
+            return self.error(19)
+        chars = self.ram[string + STRING_CHARS]
+        for index, char in enumerate(text):
+            self.ram[chars + index] = ord(char)
+        self.ram[string + STRING_LENGTH] = len(text)
+        return 0
+
+    def read_string(self, string: int) -> list[int]:
+        chars = self.ram[string + STRING_CHARS]
+        return self.ram[chars : chars + self.ram[string + STRING_LENGTH]]
+
+    @staticmethod
+    def int_value(chars: list[int]) -> int:
+        """The number at the start of `chars`, an optional minus sign followed by digits."""
+        negative = chars[:1] == [ord("-")]
+        value = 0
+        for char in chars[negative:]:
+            if not ord("0") <= char <= ord("9"):
+                break
+            value = to_signed(value * 10 + char - ord("0"))
+        return to_signed(-value) if negative else value
+
+    def make_string(self, chars: list[int]) -> int:
+        string = self.new_string(len(chars))
+        for char in chars:
+            self.append_char(string, char)
+        return string
+
+    # --- Screen ---
+
+    def clear_screen(self) -> int:
+        self.ram[SCREEN:KBD] = [0] * (KBD - SCREEN)
+        return 0
+
+    def set_color(self, color: int) -> int:
+        self.color = color != 0
+        return 0
+
+    def fill_row(self, y: int, x1: int, x2: int):
+        """Sets or clears the pixels x1..x2 of row y in the current color."""
+        row = SCREEN + y * WORDS_PER_ROW
+        for word in range(x1 // 16, x2 // 16 + 1):
+            low = max(x1, word * 16) - word * 16
+            high = min(x2, word * 16 + 15) - word * 16
+            mask = ((1 << (high + 1)) - 1) ^ ((1 << low) - 1)
+            value = self.ram[row + word] & 0xFFFF
+            value = value | mask if self.color else value & ~mask
+            self.ram[row + word] = to_signed(value)
+
+    def draw_pixel(self, x: int, y: int) -> int:
+        if not (0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT):
+            return self.error(7)
+        self.fill_row(y, x, x)
+        return 0
+
+    def draw_line(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        if not all(0 <= x < SCREEN_WIDTH for x in (x1, x2)) or not all(
+            0 <= y < SCREEN_HEIGHT for y in (y1, y2)
+        ):
+            return self.error(8)
+        if y1 == y2:
+            self.fill_row(y1, min(x1, x2), max(x1, x2))
+            return 0
+
+        # Steps towards the target, keeping the pixels closest to the line.
+        dx, dy = abs(x2 - x1), abs(y2 - y1)
+        step_x = 1 if x2 >= x1 else -1
+        step_y = 1 if y2 >= y1 else -1
+        a = b = 0
+        difference = 0  # a * dy - b * dx
+        while a <= dx and b <= dy:
+            self.fill_row(y1 + b * step_y, x1 + a * step_x, x1 + a * step_x)
+            if difference < 0:
+                a += 1
+                difference += dy
+            else:
+                b += 1
+                difference -= dx
+        return 0
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        if not (0 <= x1 <= x2 < SCREEN_WIDTH and 0 <= y1 <= y2 < SCREEN_HEIGHT):
+            return self.error(9)
+        for y in range(y1, y2 + 1):
+            self.fill_row(y, x1, x2)
+        return 0
+
+    def draw_circle(self, x: int, y: int, r: int) -> int:
+        if not (0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT):
+            return self.error(12)
+        if not 0 <= r <= 181:
+            return self.error(13)
+        for dy in range(-r, r + 1):
+            if 0 <= y + dy < SCREEN_HEIGHT:
+                half = self.sqrt(r * r - dy * dy)
+                self.fill_row(y + dy, max(x - half, 0), min(x + half, SCREEN_WIDTH - 1))
+        return 0
+
+    # --- Output ---
+
+    def move_cursor(self, row: int, column: int) -> int:
+        if not (0 <= row < OUTPUT_ROWS and 0 <= column < OUTPUT_COLUMNS):
+            return self.error(20)
+        self.cursor = (row, column)
+        return 0
+
+    def print_char(self, char: int) -> int:
+        row, column = self.cursor
+        if char == NEW_LINE:
+            self.output.append("\n")
+            row, column = (row + 1) % OUTPUT_ROWS, 0
+        elif char == BACKSPACE:
+            if self.output and self.output[-1] != "\n":
+                self.output.pop()
+            column = max(column - 1, 0)
+        else:
+            self.output.append(chr(char) if 32 <= char < 127 else "?")
+            column += 1
+            if column == OUTPUT_COLUMNS:
+                row, column = (row + 1) % OUTPUT_ROWS, 0
+        self.cursor = (row, column)
+        return 0
+
+    def print_text(self, text: str) -> int:
+        for char in text:
+            self.print_char(ord(char))
+        return 0
+
+    def print_string(self, string: int) -> int:
+        for char in self.read_string(string):
+            self.print_char(char)
+        return 0
+
+    # --- Keyboard ---
+
+    def read_char(self) -> int:
+        if not self.keys:
+            self.waiting_for_key = True
+            self.halt()
+        char = self.keys.popleft()
+        self.print_char(char)
+        return char
+
+    def read_text(self, message: int) -> list[int]:
+        """Prints the String `message`, then reads keys up to a new line, handling backspace."""
+        self.print_string(message)
+        chars: list[int] = []
+        while True:
+            char = self.read_char()
+            if char == NEW_LINE:
+                return chars
+            if char == BACKSPACE:
+                chars = chars[:-1]
+            else:
+                chars.append(char)
+
+    def read_line(self, message: int) -> int:
+        return self.make_string(self.read_text(message))
+
+
+def defined_functions(files: dict[str, list[str]]) -> set[str]:
+    return {command.split()[1] for code in files.values() for command in code if command.startswith("function ")}
+
+
+def natives_for(native: NativeOS, files: dict[str, list[str]]) -> dict[str, Callable[..., int]]:
+    """The native functions not defined by `files`, so a program's own OS classes take precedence."""
+    defined = defined_functions(files)
+    return {name: function for name, function in native.functions().items() if name not in defined}
+
+
+def stub_files(files: dict[str, list[str]], names: Iterable[str]) -> dict[str, list[str]]:
+    """
+    VM code for the functions in `names` that `files` calls but does not
+    define, to be trapped instead of run, plus a Sys.init that calls Main.main
+    and Sys.halt when the program has none.
+    """
+    defined = defined_functions(files)
+    called = {command.split()[1] for code in files.values() for command in code if command.startswith("call ")}
+    code = []
+    if "Sys.init" not in defined:
+        code += ["function Sys.init 0", "call Main.main 0", "pop temp 0", "call Sys.halt 0", "pop temp 0"]
+        called.add("Sys.halt")
+    for name in sorted(set(names) & (called - defined)):
+        code += [f"function {name} 0", "push constant 0", "return"]
+    return {"NativeOS": code} if code else {}
+
+
+def native_traps(natives: dict[str, Callable[..., int]], symbols: dict[str, int]) -> dict[int, Callable]:
+    """
+    Emulator traps, by the ROM address of each function in `symbols`, that
+    run the native function on a call made by translated code instead.
+
+    On entry the call has pushed the caller's frame: the arguments are at ARG
+    and LCL is just past the frame, so there are LCL - ARG - 5 of them. The
+    trap then does what the function's `return` would.
+    """
+    traps = {}
+    for name, function in natives.items():
+        if name in symbols:
+            traps[symbols[name]] = lambda emulator, function=function: return_from_native(emulator, function)
+    return traps
+
+
+def return_from_native(emulator, function: Callable[..., int]):
+    ram = emulator.ram
+    frame, arguments = ram[1], ram[2]
+    try:
+        value = function(*ram[arguments : frame - 5])
+    except Halt:
+        emulator.halted = True
+        return
+    address = ram[frame - 5]  # with no arguments, the return value goes where this is
+    ram[arguments] = to_signed(value)
+    ram[0] = arguments + 1
+    ram[4], ram[3], ram[2], ram[1] = ram[frame - 1], ram[frame - 2], ram[frame - 3], ram[frame - 4]
+    emulator.pc = address
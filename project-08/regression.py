@@ -0,0 +1,200 @@
+"""
+Regression runner for the VM test programs of projects 7 and 8.
+
+Every test has a spec next to its code, `Name.spec` beside `Name.vm`, or in
+a directory of .vm files that make up one program. The spec takes the place
+of the course's .tst and .cmp files, one statement per line:
+
+    cycles N            run for at most N cycles
+    bootstrap           start with the bootstrap code, which calls Sys.init
+    set ADDRESS VALUE   set RAM[ADDRESS] before the run; ADDRESS may be FIRST..LAST
+    expect ADDRESS VALUE
+
+Each test is translated, assembled and run on the emulator in a worker
+process of its own. The summary gives the cycles every test ran until it
+halted, so a code generation change shows up as a change in cycles; save
+them with --save and compare a later run with --baseline.
+
+Usage: python regression.py [DIRECTORY...] [--optimize] [--inline] [--optimize-asm]
+                            [--save FILE] [--baseline FILE]
+
+The directories default to project 7's and project 8's files.
+"""
+
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+
+from assembler import assemble_lines
+from asm_optimizer import optimize_asm
+from emulator import Emulator
+from inliner import ROM_SIZE, Inliner
+from rom_budget import Mode
+from vm_translator import VMTranslator, count_instructions, instruction_count, read_vm_files
+
+DIRECTORIES = [os.path.join(ROOT, "project-07", "files"), os.path.join(ROOT, "project-08", "files")]
+
+
+@dataclass
+class Spec:
+    name: str
+    vm_files: list[str]
+    cycles: int = 0
+    bootstrap: bool = False
+    ram: dict[int, int] = field(default_factory=dict)
+    expected: dict[int, int] = field(default_factory=dict)
+
+
+@dataclass
+class Result:
+    name: str
+    cycles: int = 0
+    halted: bool = False
+    mismatches: list[tuple[int, int, int]] = field(default_factory=list)  # address, expected, actual
+    error: Optional[str] = None
+
+    @property
+    def passed(self) -> bool:
+        return self.error is None and not self.mismatches
+
+
+def addresses(text: str) -> range:
+    first, _, last = text.partition("..")
+    return range(int(first), int(last or first) + 1)
+
+
+def read_spec(spec_file: str) -> Spec:
+    """Reads `spec_file`, whose program is the .vm file of the same name or the .vm files of its directory."""
+    base = os.path.splitext(spec_file)[0]
+    if os.path.exists(f"{base}.vm"):
+        vm_files = [f"{base}.vm"]
+    else:
+        vm_files = sorted(glob.glob(os.path.join(os.path.dirname(spec_file), "*.vm")))
+    spec = Spec(os.path.relpath(base, ROOT).replace(os.sep, "/"), vm_files)
+
+    with open(spec_file, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            parts = line.split("//")[0].split()
+            if not parts:
+                continue
+            if parts[0] == "cycles" and len(parts) == 2:
+                spec.cycles = int(parts[1])
+            elif parts == ["bootstrap"]:
+                spec.bootstrap = True
+            elif parts[0] in ("set", "expect") and len(parts) == 3:
+                cells = spec.ram if parts[0] == "set" else spec.expected
+                for address in addresses(parts[1]):
+                    cells[address] = int(parts[2])
+            else:
+                raise ValueError(f"{spec_file}:{number}: cannot parse {line.strip()!r}")
+    return spec
+
+
+def find_specs(directories: list[str]) -> list[str]:
+    specs = []
+    for directory in directories:
+        specs += sorted(glob.glob(os.path.join(directory, "*.spec")))
+        specs += sorted(glob.glob(os.path.join(directory, "*", "*.spec")))
+    return specs
+
+
+def translate(spec: Spec, mode: Mode) -> list[str]:
+    translator = VMTranslator(mode.optimize)
+    if spec.bootstrap:
+        translator.bootstrap()
+    files = read_vm_files(spec.vm_files)
+    if mode.inline:
+        inliner = Inliner(files, instruction_count, ROM_SIZE - count_instructions(translator.lines))
+        inliner.inline()
+        files = inliner.get_files()
+    translator.translate_files(files)
+    asm = translator.get_translated_code()
+    return optimize_asm(asm) if mode.cfg else asm
+
+
+def run_test(spec_file: str, mode: Mode) -> Result:
+    """Runs one test; this is what each worker process does."""
+    result = Result(spec_file)
+    try:
+        spec = read_spec(spec_file)
+        result.name = spec.name
+        emulator = Emulator(assemble_lines(translate(spec, mode)))
+        for address, value in spec.ram.items():
+            emulator.ram[address] = value
+        emulator.run(spec.cycles)
+    except Exception as error:
+        result.error = f"{type(error).__name__}: {error}"
+        return result
+
+    result.cycles, result.halted = emulator.cycles, emulator.halted
+    for address, value in spec.expected.items():
+        if emulator.ram[address] != value:
+            result.mismatches.append((address, value, emulator.ram[address]))
+    return result
+
+
+def run_all(spec_files: list[str], mode: Mode) -> list[Result]:
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(run_test, spec_files, [mode] * len(spec_files)))
+
+
+def read_cycles(file_name: str) -> dict[str, int]:
+    with open(file_name, "r", encoding="utf-8") as f:
+        return {name: int(cycles) for name, cycles in (line.split() for line in f if line.strip())}
+
+
+def write_cycles(file_name: str, results: list[Result]):
+    with open(file_name, "w", encoding="utf-8") as f:
+        f.write("".join(f"{result.name} {result.cycles}\n" for result in results if result.passed))
+
+
+def print_summary(results: list[Result], baseline: dict[str, int]):
+    print(f"{'test':<42} {'result':<6} {'cycles':>8} {'change':>8}")
+    for result in results:
+        status = "pass" if result.passed else "FAIL"
+        change = ""
+        if result.name in baseline and result.error is None:
+            change = f"{result.cycles - baseline[result.name]:+d}"
+        cycles = "" if result.error else f"{result.cycles}{'' if result.halted else '+'}"
+        print(f"{result.name:<42} {status:<6} {cycles:>8} {change:>8}")
+        if result.error:
+            print(f"    {result.error}")
+        for address, expected, actual in result.mismatches:
+            print(f"    RAM[{address}] is {actual}, expected {expected}")
+
+
+def option(name: str) -> Optional[str]:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else None
+
+
+def main():
+    values = {option(name) for name in ("--save", "--baseline")}
+    directories = [arg for arg in sys.argv[1:] if not arg.startswith("--") and arg not in values] or DIRECTORIES
+    mode = Mode("--optimize" in sys.argv, "--inline" in sys.argv, "--optimize-asm" in sys.argv)
+    spec_files = find_specs(directories)
+    if not spec_files:
+        print("Error: no .spec files found.")
+        return
+
+    start = time.perf_counter()
+    results = run_all(spec_files, mode)
+    seconds = time.perf_counter() - start
+    baseline_file = option("--baseline")
+    print_summary(results, read_cycles(baseline_file) if baseline_file else {})
+    failed = sum(not result.passed for result in results)
+    print(f"{len(results) - failed} passed, {failed} failed ({mode}) in {seconds:.2f}s")
+    if option("--save"):
+        write_cycles(option("--save"), results)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+ROM budget of a VM program under each optimization mode.
+
+The program is translated with every combination of --optimize, --inline and
+--optimize-asm and the instruction counts are compared with the 32K ROM. The
+selected mode is then broken down by the VM command kind and the function
+each instruction comes from, so the largest contributors show up first.
+
+Usage: python rom_budget.py PATH... [--optimize] [--inline] [--optimize-asm]
+
+PATH is a .vm file or a directory of them. The bootstrap is added when the
+program defines Sys.init. With --optimize, VM commands are lowered together,
+so the code of a command may be counted under one that follows it.
+"""
+
+import glob
+import itertools
+import os
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from asm_optimizer import optimize_asm
+from inliner import ROM_SIZE, Inliner
+from vm_translator import VMTranslator, count_instructions, instruction_count, line_sources, read_vm_files
+
+COMPARISONS = {"eq", "gt", "lt"}
+ARITHMETIC = {"add", "sub", "neg", "and", "or", "not"}
+TOP_FUNCTIONS = 15
+
+
+@dataclass(frozen=True)
+class Mode:
+    optimize: bool = False
+    inline: bool = False
+    cfg: bool = False
+
+    def __str__(self) -> str:
+        flags = [
+            flag
+            for flag, enabled in (
+                ("--optimize", self.optimize),
+                ("--inline", self.inline),
+                ("--optimize-asm", self.cfg),
+            )
+            if enabled
+        ]
+        return " ".join(flags) or "default"
+
+
+@dataclass
+class Budget:
+    mode: Mode
+    instructions: int
+    by_kind: Counter
+    by_function: Counter
+
+    @property
+    def overflow(self) -> int:
+        return max(0, self.instructions - ROM_SIZE)
+
+
+def command_kind(command: str) -> str:
+    """Groups VM commands: push and pop by segment, comparisons, other arithmetic, then by name."""
+    parts = command.split()
+    if parts[0] in ("push", "pop"):
+        return f"{parts[0]} {parts[1]}"
+    if parts[0] in COMPARISONS:
+        return "comparison"
+    if parts[0] in ARITHMETIC:
+        return "arithmetic"
+    return parts[0]
+
+
+def measure(files: dict[str, list[str]], mode: Mode) -> Budget:
+    translator = VMTranslator(mode.optimize)
+    if any(command == "function Sys.init 0" for code in files.values() for command in code):
+        translator.bootstrap()
+    if mode.inline:
+        inliner = Inliner(files, instruction_count, ROM_SIZE - count_instructions(translator.lines))
+        inliner.inline()
+        files = inliner.get_files()
+    translator.translate_files(files)
+
+    asm = translator.get_translated_code()
+    if mode.cfg:
+        asm = optimize_asm(asm)
+
+    by_kind: Counter[str] = Counter()
+    by_function: Counter[str] = Counter()
+    for line, source in zip(asm, line_sources(asm, translator)):
+        if line.startswith(("//", "(")):
+            continue
+        if source is None:
+            by_kind["bootstrap"] += 1
+            by_function["bootstrap"] += 1
+            continue
+        by_kind[command_kind(translator.lines[source.asm_line][3:])] += 1
+        by_function[source.function or source.file_name] += 1
+    return Budget(mode, sum(by_kind.values()), by_kind, by_function)
+
+
+def print_breakdown(title: str, counts: Counter, total: int, top: Optional[int] = None):
+    print(title)
+    for name, count in counts.most_common(top):
+        print(f"  {count:>8}  {100 * count / total:5.1f}%  {name}")
+    if top is not None and len(counts) > top:
+        rest = sum(count for _, count in counts.most_common()[top:])
+        print(f"  {rest:>8}  {100 * rest / total:5.1f}%  ({len(counts) - top} more)")
+
+
+def read_program(paths: list[str]) -> dict[str, list[str]]:
+    vm_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            vm_files += sorted(glob.glob(os.path.join(path, "*.vm")))
+        else:
+            vm_files.append(path)
+    return read_vm_files(vm_files)
+
+
+def main(paths: list[str], selected: Mode):
+    files = read_program(paths)
+    if not files:
+        print("Error: no .vm files found.")
+        return
+
+    print(f"ROM size: {ROM_SIZE} instructions")
+    budgets = {}
+    for flags in itertools.product((False, True), repeat=3):
+        mode = Mode(*flags)
+        budget = budgets[mode] = measure(files, mode)
+        status = f"OVERFLOW by {budget.overflow}" if budget.overflow else "fits"
+        print(f"  {budget.instructions:>8}  {100 * budget.instructions / ROM_SIZE:5.1f}%  {str(mode):<38} {status}")
+
+    budget = budgets[selected]
+    print()
+    print(f"{selected}: {budget.instructions} instructions")
+    print_breakdown("By VM command kind:", budget.by_kind, budget.instructions)
+    print_breakdown("Largest functions:", budget.by_function, budget.instructions, TOP_FUNCTIONS)
+
+
+if __name__ == "__main__":
+    paths = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    if not paths:
+        print("Usage: python rom_budget.py PATH... [--optimize] [--inline] [--optimize-asm]")
+    else:
+        main(
+            paths,
+            Mode(
+                optimize="--optimize" in sys.argv,
+                inline="--inline" in sys.argv,
+                cfg="--optimize-asm" in sys.argv,
+            ),
+        )
@@ -0,0 +1,255 @@
+"""
+Interpreter for VM programs, running them on the same RAM layout as the
+translated Hack code: SP, LCL, ARG, THIS and THAT at 0-4, temp at 5-12,
+statics from 16 in order of first use, the stack from 256.
+
+Arithmetic follows the translation too: values wrap to 16 bits and `gt` and
+`lt` compare through x - y, so they see the same overflow. Return addresses
+on the stack are command indices instead of ROM addresses.
+
+Functions can be given as Python `natives`; calls to them take the arguments
+off the stack and push the result without building a frame. A native stops
+the program by raising Halt.
+"""
+
+from typing import Callable, Optional
+from native_os import Halt, to_signed
+
+RAM_SIZE = 32768
+STACK_BASE = 256
+STATIC_BASE = 16
+HALT_ADDRESS = -1  # return address of the bootstrap call
+
+SEGMENT_POINTERS = {"local": 1, "argument": 2, "this": 3, "that": 4}
+
+# Decoded commands are (opcode, operand, operand).
+(
+    PUSH_CONSTANT,
+    PUSH_SEGMENT,
+    PUSH_FIXED,
+    POP_SEGMENT,
+    POP_FIXED,
+    ADD,
+    SUB,
+    AND,
+    OR,
+    EQ,
+    GT,
+    LT,
+    NEG,
+    NOT,
+    LABEL,
+    GOTO,
+    IF_GOTO,
+    FUNCTION,
+    CALL,
+    CALL_NATIVE,
+    RETURN,
+) = range(21)
+
+OPCODES = {"add": ADD, "sub": SUB, "and": AND, "or": OR, "eq": EQ, "gt": GT, "lt": LT, "neg": NEG, "not": NOT}
+
+
+class VMInterpreter:
+    def __init__(
+        self,
+        files: dict[str, list[str]],
+        natives: Optional[dict[str, Callable[..., int]]] = None,
+        ram: Optional[list[int]] = None,
+    ):
+        """Loads the cleaned VM code of `files`; calls to `natives` run in Python."""
+        self.ram = ram if ram is not None else [0] * RAM_SIZE
+        self.natives = natives or {}
+        self.commands: list[tuple[str, int]] = []  # file name and command number of each command
+        self.command_functions: list[str] = []
+        self.program: list[tuple] = []
+        self.functions: dict[str, int] = {}
+        self.statics: dict[str, int] = {}
+        self.pc = 0
+        self.steps = 0
+        self.native_calls = 0
+        self.halted = False
+        self.load(files)
+
+    # --- Loading ---
+
+    def load(self, files: dict[str, list[str]]):
+        parsed = []
+        labels: dict[tuple[str, str], int] = {}
+        function = ""
+        for file_name, code in files.items():
+            for number, command in enumerate(code, start=1):
+                parts = command.split()
+                if parts[0] == "function":
+                    function = parts[1]
+                    self.functions[function] = len(parsed)
+                elif parts[0] == "label":
+                    labels[function, parts[1]] = len(parsed)
+                parsed.append((file_name, function, parts))
+                self.commands.append((file_name, number))
+                self.command_functions.append(function)
+
+        for file_name, function, parts in parsed:
+            self.program.append(self.decode(file_name, function, parts, labels))
+
+    def decode(self, file_name: str, function: str, parts: list[str], labels: dict) -> tuple:
+        name = parts[0]
+        if name in ("push", "pop"):
+            segment, index = parts[1], int(parts[2])
+            if segment == "constant":
+                return PUSH_CONSTANT, index, 0
+            if segment in SEGMENT_POINTERS:
+                return PUSH_SEGMENT if name == "push" else POP_SEGMENT, SEGMENT_POINTERS[segment], index
+            if segment == "temp":
+                address = 5 + index
+            elif segment == "pointer":
+                address = 3 + index
+            elif segment == "static":
+                address = self.statics.setdefault(f"{file_name}.{index}", STATIC_BASE + len(self.statics))
+            else:
+                raise Exception(f"Invalid segment: {' '.join(parts)}")
+            return PUSH_FIXED if name == "push" else POP_FIXED, address, 0
+        if name in OPCODES:
+            return OPCODES[name], 0, 0
+        if name == "label":
+            return LABEL, 0, 0
+        if name in ("goto", "if-goto"):
+            if (function, parts[1]) not in labels:
+                raise Exception(f"Unknown label {parts[1]} in {function or file_name}")
+            return GOTO if name == "goto" else IF_GOTO, labels[function, parts[1]], 0
+        if name == "function":
+            return FUNCTION, int(parts[2]), 0
+        if name == "call":
+            callee, n_args = parts[1], int(parts[2])
+            if callee in self.natives:
+                return CALL_NATIVE, self.natives[callee], n_args
+            if callee not in self.functions:
+                raise Exception(f"Call to undefined function {callee}")
+            return CALL, self.functions[callee], n_args
+        if name == "return":
+            return RETURN, 0, 0
+        raise Exception(f"Unsupported command: {' '.join(parts)}")
+
+    def bootstrap(self):
+        """Sets SP to 256 and calls Sys.init, like the translator's bootstrap code."""
+        ram = self.ram
+        ram[0] = STACK_BASE
+        frame = [HALT_ADDRESS, ram[1], ram[2], ram[3], ram[4]]
+        ram[STACK_BASE : STACK_BASE + 5] = frame
+        ram[0] = ram[1] = STACK_BASE + 5
+        ram[2] = STACK_BASE
+        self.pc = self.functions["Sys.init"]
+
+    # --- Running ---
+
+    def source(self) -> tuple[str, int]:
+        """File name and command number of the next command."""
+        return self.commands[self.pc]
+
+    def function(self) -> str:
+        """Function of the next command; while a native runs, the function that called it."""
+        return self.command_functions[self.pc]
+
+    def run(self, max_steps: int = 10_000_000) -> int:
+        """
+        Runs until the program halts or `max_steps` more commands ran, and
+        returns the number run. The program halts when Sys.init returns, a
+        native raises Halt, or it enters a `label X; goto X` loop.
+        """
+        ram = self.ram
+        program = self.program
+        pc = self.pc
+        steps = 0
+
+        while steps < max_steps:
+            if not 0 <= pc < len(program):
+                self.halted = True
+                break
+            opcode, x, y = program[pc]
+            steps += 1
+            pc += 1
+
+            if opcode == PUSH_CONSTANT:
+                ram[ram[0]] = x
+                ram[0] += 1
+            elif opcode == PUSH_SEGMENT:
+                ram[ram[0]] = ram[(ram[x] + y) & 0x7FFF]
+                ram[0] += 1
+            elif opcode == PUSH_FIXED:
+                ram[ram[0]] = ram[x]
+                ram[0] += 1
+            elif opcode == POP_SEGMENT:
+                ram[0] -= 1
+                ram[(ram[x] + y) & 0x7FFF] = ram[ram[0]]
+            elif opcode == POP_FIXED:
+                ram[0] -= 1
+                ram[x] = ram[ram[0]]
+            elif opcode <= LT:
+                sp = ram[0] - 1
+                ram[0] = sp
+                left, right = ram[sp - 1], ram[sp]
+                if opcode == ADD:
+                    value = left + right
+                elif opcode == SUB:
+                    value = left - right
+                elif opcode == AND:
+                    value = left & right
+                elif opcode == OR:
+                    value = left | right
+                elif opcode == EQ:
+                    value = -1 if left == right else 0
+                else:
+                    difference = to_signed(left - right)
+                    value = -1 if (difference > 0 if opcode == GT else difference < 0) else 0
+                ram[sp - 1] = to_signed(value)
+            elif opcode == NEG:
+                ram[ram[0] - 1] = to_signed(-ram[ram[0] - 1])
+            elif opcode == NOT:
+                ram[ram[0] - 1] = ~ram[ram[0] - 1]
+            elif opcode == LABEL:
+                pass
+            elif opcode == GOTO:
+                if x == pc - 2:
+                    self.halted = True  # label X; goto X
+                    break
+                pc = x
+            elif opcode == IF_GOTO:
+                ram[0] -= 1
+                if ram[ram[0]]:
+                    pc = x
+            elif opcode == FUNCTION:
+                sp = ram[0]
+                ram[sp : sp + x] = [0] * x
+                ram[0] = sp + x
+            elif opcode == CALL:
+                sp = ram[0]
+                ram[sp : sp + 5] = [pc, ram[1], ram[2], ram[3], ram[4]]
+                ram[2] = sp - y
+                ram[0] = ram[1] = sp + 5
+                pc = x
+            elif opcode == CALL_NATIVE:
+                sp = ram[0] - y
+                self.native_calls += 1
+                self.pc = pc
+                try:
+                    value = x(*ram[sp : sp + y])
+                except Halt:
+                    self.halted = True
+                    break
+                ram[sp] = to_signed(value)
+                ram[0] = sp + 1
+            else:  # RETURN
+                frame = ram[1]
+                address = ram[frame - 5]
+                arguments = ram[2]
+                ram[arguments] = ram[ram[0] - 1]
+                ram[0] = arguments + 1
+                ram[4], ram[3], ram[2], ram[1] = ram[frame - 1], ram[frame - 2], ram[frame - 3], ram[frame - 4]
+                if address == HALT_ADDRESS:
+                    self.halted = True
+                    break
+                pc = address
+
+        self.pc = pc
+        self.steps += steps
+        return steps
@@ -0,0 +1,553 @@
+"""
+Register-oriented intermediate form of VM functions and its lowering to Hack.
+
+Every function is split into basic blocks. Running a block's commands against
+a symbolic stack turns each pushed value into a tree: a constant, a variable
+load or an operator applied to earlier trees. A VM value is consumed exactly
+once, so the trees share no nodes; they live within their block and are
+never merged across blocks. The statements of a block (stores, branches,
+calls, returns) are three-address code over those trees.
+
+Values that are still symbolic never touch the RAM stack. The lowering
+computes them into D, using A for the right operand, when a statement
+consumes them. A value is only materialized (pushed onto the RAM stack) when
+it must outlive the block, is an argument of a call, or reads a variable a
+following store is about to change.
+
+In leaf functions the most used locals and arguments are kept in the R5-R12
+scratch registers instead of RAM. The temp segment is shared by the whole
+program, so only registers that no function of the program uses through it
+are taken, and none when the program is not known as a whole.
+
+A call whose result is returned right away becomes a tail call that reuses
+the caller's frame, so tail recursion runs in constant stack space.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Sequence, Union
+
+SEGMENTS = {"argument": "ARG", "local": "LCL", "this": "THIS", "that": "THAT"}
+
+BINARY_COMMANDS = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY_COMMANDS = {"neg", "not"}
+COMPARISONS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+NEGATED_JUMPS = {"JEQ": "JNE", "JGT": "JLE", "JLT": "JGE"}
+
+# D = D op R, with the left operand in D and the right one in R (A or M).
+RIGHT_OPERAND = {"add": "D+{}", "sub": "D-{}", "and": "D&{}", "or": "D|{}"}
+# D = R op D, with the left operand in R and the right one in D.
+LEFT_OPERAND = {"add": "D+{}", "sub": "{}-D", "and": "D&{}", "or": "D|{}"}
+UNARY_OPERATORS = {"neg": "-D", "not": "!D"}
+
+PUSH_D = ["@SP", "M=M+1", "A=M-1", "M=D"]
+POP_D = ["@SP", "AM=M-1", "D=M"]
+
+PROMOTED_SEGMENTS = {"local", "argument"}
+REGISTERS = range(5, 13)  # R5-R12, shared with the temp segment
+MIN_PROMOTED_USES = 2  # a promoted argument costs a copy on entry
+
+
+# --- Values ---
+
+
+@dataclass(frozen=True, eq=False)
+class Const:
+    value: int
+
+
+@dataclass(frozen=True, eq=False)
+class Load:
+    segment: str
+    index: int
+
+
+@dataclass(frozen=True, eq=False)
+class Unary:
+    operator: str
+    operand: "Value"
+
+
+@dataclass(frozen=True, eq=False)
+class Binary:
+    operator: str
+    left: "Value"
+    right: "Value"
+
+
+@dataclass(frozen=True, eq=False)
+class Stacked:
+    """A value that lives on the RAM stack, like a call result."""
+
+
+Value = Union[Const, Load, Unary, Binary, Stacked]
+
+
+# --- Statements ---
+
+
+@dataclass
+class Comment:
+    text: str
+
+
+@dataclass
+class Entry:
+    name: str
+    n_locals: int
+
+
+@dataclass
+class Push:
+    """Materialize `value` on the RAM stack."""
+
+    value: Value
+
+
+@dataclass
+class Store:
+    segment: str
+    index: int
+    value: Value
+
+
+@dataclass
+class StackOp:
+    """Apply `command` to the RAM stack, with `right` as the right operand if given."""
+
+    command: str
+    right: Optional[Value] = None
+
+
+@dataclass
+class Call:
+    name: str
+    n_args: int
+
+
+@dataclass
+class TailCall:
+    """A call immediately followed by a return of its result."""
+
+    name: str
+    n_args: int
+
+
+@dataclass
+class Label:
+    name: str
+
+
+@dataclass
+class Jump:
+    label: str
+    condition: Optional[Value] = None
+
+
+@dataclass
+class Return:
+    value: Value
+
+
+Statement = Union[Comment, Entry, Push, Store, StackOp, Call, TailCall, Label, Jump, Return]
+
+
+@dataclass
+class Block:
+    statements: list[Statement] = field(default_factory=list)
+
+
+@dataclass
+class Function:
+    name: Optional[str]  # None for commands before the first function
+    blocks: list[Block]
+    leaf: bool
+    registers: dict[tuple[str, int], int] = field(default_factory=dict)
+
+
+# --- Construction ---
+
+
+def loads(value: Value):
+    """Yields every Load in the tree of `value`."""
+    pending = [value]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Load):
+            yield value
+        elif isinstance(value, Unary):
+            pending.append(value.operand)
+        elif isinstance(value, Binary):
+            pending.extend((value.left, value.right))
+
+
+def clobbers(value: Value, segment: str, index: int, registers: dict) -> bool:
+    """True if `pop segment index` may change what `value` reads."""
+    register_store = (segment, index) in registers
+    for load in loads(value):
+        key = (load.segment, load.index)
+        if key == (segment, index):
+            return True
+        if register_store or key in registers:
+            continue  # registers are never reached through this or that
+        if load.segment in ("this", "that") or segment in ("this", "that"):
+            return True  # either side may point anywhere in RAM
+    return False
+
+
+class BlockBuilder:
+    """Runs the commands of one basic block against a symbolic stack."""
+
+    def __init__(self, registers: dict[tuple[str, int], int], tail_calls: bool):
+        self.registers = registers
+        self.tail_calls = tail_calls
+        self.stack: list[Value] = []
+        self.block = Block()
+
+    def emit(self, statement: Statement):
+        self.block.statements.append(statement)
+
+    def pop(self) -> Value:
+        return self.stack.pop() if self.stack else Stacked()
+
+    def materialize(self, end: Optional[int] = None):
+        """Pushes the symbolic values below stack position `end` (everything by default)."""
+        end = len(self.stack) if end is None else end
+        for position in range(end):
+            if not isinstance(self.stack[position], Stacked):
+                self.emit(Push(self.stack[position]))
+                self.stack[position] = Stacked()
+
+    def command(self, line: str):
+        self.emit(Comment(line))
+        parts = line.split()
+        name = parts[0]
+
+        if name == "push":
+            segment, index = parts[1], int(parts[2])
+            self.stack.append(Const(index) if segment == "constant" else Load(segment, index))
+        elif name == "pop":
+            segment, index = parts[1], int(parts[2])
+            value = self.pop()
+            conflicts = [
+                position
+                for position, entry in enumerate(self.stack)
+                if clobbers(entry, segment, index, self.registers)
+            ]
+            if conflicts:
+                self.materialize(conflicts[-1] + 1)
+            self.emit(Store(segment, index, value))
+        elif name in UNARY_COMMANDS:
+            operand = self.pop()
+            if isinstance(operand, Stacked):
+                self.emit(StackOp(name))
+                self.stack.append(operand)
+            else:
+                self.stack.append(Unary(name, operand))
+        elif name in BINARY_COMMANDS:
+            right, left = self.pop(), self.pop()
+            if isinstance(left, Stacked):
+                self.emit(StackOp(name, None if isinstance(right, Stacked) else right))
+                self.stack.append(left)
+            else:
+                self.stack.append(Binary(name, left, right))
+        elif name == "call":
+            self.materialize()
+            self.emit(Call(parts[1], int(parts[2])))
+            del self.stack[max(len(self.stack) - int(parts[2]), 0) :]
+            self.stack.append(Stacked())
+        elif name == "label":
+            self.emit(Label(parts[1]))
+        elif name == "goto":
+            self.materialize()
+            self.emit(Jump(parts[1]))
+        elif name == "if-goto":
+            condition = self.pop()
+            self.materialize()
+            self.emit(Jump(parts[1], condition))
+        elif name == "return":
+            value = self.pop()
+            position = self.last_call()
+            if self.tail_calls and isinstance(value, Stacked) and position is not None:
+                call = self.block.statements[position]
+                self.block.statements[position] = TailCall(call.name, call.n_args)
+            else:
+                self.emit(Return(value))
+            self.stack.clear()  # the rest of the frame is discarded
+        elif name == "function":
+            self.emit(Entry(parts[1], int(parts[2])))
+        else:
+            raise Exception(f"Unsupported command: {line}")
+
+    def last_call(self) -> Optional[int]:
+        """Position of the previous statement if it is a call, ignoring comments."""
+        for position in range(len(self.block.statements) - 2, -1, -1):
+            statement = self.block.statements[position]
+            if not isinstance(statement, Comment):
+                return position if isinstance(statement, Call) else None
+        return None
+
+    def finish(self) -> Block:
+        self.materialize()
+        return self.block
+
+
+def free_registers(files: Iterable[list[str]]) -> list[int]:
+    """The R5-R12 registers that no command of the program uses through the temp segment."""
+    taken = set()
+    for code in files:
+        for command in code:
+            parts = command.split()
+            if parts[0] in ("push", "pop") and parts[1] == "temp":
+                taken.add(5 + int(parts[2]))
+    return [register for register in REGISTERS if register not in taken]
+
+
+def promote(commands: list[str], free: Sequence[int]) -> dict[tuple[str, int], int]:
+    """Assigns the most used locals and arguments of a leaf function to the `free` registers."""
+    uses = Counter()
+    for command in commands:
+        parts = command.split()
+        if parts[0] in ("push", "pop") and parts[1] in PROMOTED_SEGMENTS:
+            uses[parts[1], int(parts[2])] += 1
+
+    hot = [variable for variable, count in uses.most_common() if count >= MIN_PROMOTED_USES]
+    return dict(zip(hot, free))
+
+
+def build_function(commands: list[str], free: Sequence[int]) -> Function:
+    parts = commands[0].split()
+    name = parts[1] if parts[0] == "function" else None
+    leaf = not any(command.startswith("call ") for command in commands)
+    registers = promote(commands, free) if name and leaf else {}
+
+    blocks = []
+    builder = BlockBuilder(registers, name is not None)
+    for command in commands:
+        if command.startswith("label ") and builder.block.statements:
+            blocks.append(builder.finish())
+            builder = BlockBuilder(registers, name is not None)
+        builder.command(command)
+        if command.split()[0] in ("goto", "if-goto", "return"):
+            blocks.append(builder.finish())
+            builder = BlockBuilder(registers, name is not None)
+    if builder.block.statements:
+        blocks.append(builder.finish())
+
+    return Function(name, blocks, leaf, registers)
+
+
+def build_functions(code: list[str], free: Sequence[int] = ()) -> list[Function]:
+    """Splits VM code at its function declarations and builds each function.
+
+    Leaf functions keep variables in the `free` registers, which no function
+    of the program may use through the temp segment (see free_registers).
+    """
+    functions = []
+    start = 0
+    for index, command in enumerate(code):
+        if command.startswith("function ") and index > start:
+            functions.append(build_function(code[start:index], free))
+            start = index
+    if start < len(code):
+        functions.append(build_function(code[start:], free))
+    return functions
+
+
+# --- Lowering ---
+
+
+class Lowering:
+    """Writes the Hack assembly for built functions through a VMTranslator."""
+
+    def __init__(self, translator):
+        self.translator = translator
+        self.function: Optional[str] = None
+        self.registers: dict[tuple[str, int], int] = {}
+
+    def lower(self, functions: list[Function]):
+        for function in functions:
+            self.function = function.name
+            self.registers = function.registers
+            for block in function.blocks:
+                for statement in block.statements:
+                    self.statement(statement)
+
+    def statement(self, statement: Statement):
+        translator = self.translator
+        if isinstance(statement, Comment):
+            translator.start_command(statement.text)
+        elif isinstance(statement, Entry):
+            translator.function(statement.name, statement.n_locals)
+            for (segment, index), register in self.registers.items():
+                if segment == "local":
+                    translator.write([f"@R{register}", "M=0"])
+                else:
+                    translator.write(self.address(segment, index) + ["D=M", f"@R{register}", "M=D"])
+        elif isinstance(statement, Push):
+            translator.write(self.load(statement.value) + PUSH_D)
+        elif isinstance(statement, Store):
+            translator.write(self.store(statement.segment, statement.index, statement.value))
+        elif isinstance(statement, StackOp):
+            self.stack_op(statement.command, statement.right)
+        elif isinstance(statement, Call):
+            translator.translate_call(statement.name, statement.n_args)
+        elif isinstance(statement, TailCall):
+            recursive = statement.name == self.function
+            translator.translate_tail_call(statement.name, statement.n_args, recursive)
+        elif isinstance(statement, Label):
+            translator.label(statement.name)
+        elif isinstance(statement, Jump):
+            if statement.condition is None:
+                translator.goto(statement.label)
+            else:
+                translator.write(self.branch(statement.condition, statement.label))
+        elif isinstance(statement, Return):
+            translator.translate_return(self.load(statement.value))
+
+    def address(self, segment: str, index: int) -> list[str]:
+        """Code setting A to the address of a variable; clobbers D for index > 2."""
+        if segment in SEGMENTS:
+            base = f"@{SEGMENTS[segment]}"
+            if index == 0:
+                return [base, "A=M"]
+            if index == 1:
+                return [base, "A=M+1"]
+            if index == 2:
+                return [base, "A=M+1", "A=A+1"]
+            return [f"@{index}", "D=A", base, "A=D+M"]
+        if segment == "temp":
+            return [f"@{5 + index}"]
+        if segment == "pointer":
+            return ["@THIS" if index == 0 else "@THAT"]
+        if segment == "static":
+            return [f"@{self.translator.current_file}.{index}"]
+        raise Exception(f"Invalid segment: {segment} {index}")
+
+    def operand(self, value: Value) -> Optional[tuple[list[str], str]]:
+        """Code putting `value` in A or M without touching D, and which of the two."""
+        if isinstance(value, Const):
+            return [f"@{value.value}"], "A"
+        if isinstance(value, Load):
+            register = self.registers.get((value.segment, value.index))
+            if register is not None:
+                return [f"@R{register}"], "M"
+            if value.segment not in SEGMENTS or value.index <= 2:
+                return self.address(value.segment, value.index), "M"
+        return None
+
+    def load(self, value: Value) -> list[str]:
+        """Code computing `value` into D."""
+        if isinstance(value, Stacked):
+            return list(POP_D)
+        if isinstance(value, Const):
+            if value.value in (0, 1):
+                return [f"D={value.value}"]
+            return [f"@{value.value}", "D=A"]
+        if isinstance(value, Load):
+            code, register = self.operand(value) or (self.address(value.segment, value.index), "M")
+            return code + [f"D={register}"]
+        if isinstance(value, Unary):
+            return self.load(value.operand) + [f"D={UNARY_OPERATORS[value.operator]}"]
+        if value.operator in COMPARISONS:
+            return self.combine("sub", value.left, value.right) + self.to_boolean(
+                COMPARISONS[value.operator]
+            )
+        return self.combine(value.operator, value.left, value.right)
+
+    def combine(self, operator: str, left: Value, right: Value) -> list[str]:
+        """Code computing `left operator right` into D."""
+        right_operand = self.operand(right)
+        if right_operand:
+            code, register = right_operand
+            return self.load(left) + code + [f"D={RIGHT_OPERAND[operator].format(register)}"]
+
+        left_operand = self.operand(left)
+        if left_operand:
+            code, register = left_operand
+            return self.load(right) + code + [f"D={LEFT_OPERAND[operator].format(register)}"]
+
+        # Both operands are expressions: park the left one on the stack.
+        return (
+            self.load(left)
+            + PUSH_D
+            + self.load(right)
+            + ["@SP", "AM=M-1", f"D={LEFT_OPERAND[operator].format('M')}"]
+        )
+
+    def to_boolean(self, jump: str) -> list[str]:
+        """Code turning the difference in D into true or false for `jump`."""
+        true_label = self.translator.generate_label(f"{jump[1:]}_TRUE")
+        end_label = self.translator.generate_label(f"{jump[1:]}_END")
+        return [
+            f"@{true_label}",
+            f"D;{jump}",
+            "D=0",
+            f"@{end_label}",
+            "0;JMP",
+            f"({true_label})",
+            "D=-1",
+            f"({end_label})",
+        ]
+
+    def store(self, segment: str, index: int, value: Value) -> list[str]:
+        register = self.registers.get((segment, index))
+        if register is not None:
+            return self.load(value) + [f"@R{register}", "M=D"]
+        if segment not in SEGMENTS or index <= 2:
+            return self.load(value) + self.address(segment, index) + ["M=D"]
+
+        # The address needs D as well, so compute it into R13 first.
+        base = SEGMENTS[segment]
+        return (
+            [f"@{index}", "D=A", f"@{base}", "D=D+M", "@R13", "M=D"]
+            + self.load(value)
+            + ["@R13", "A=M", "M=D"]
+        )
+
+    def branch(self, condition: Value, label: str) -> list[str]:
+        """Code jumping to `label` if `condition` is not false, without a boolean."""
+        negated = isinstance(condition, Unary) and condition.operator == "not"
+        test = condition.operand if negated else condition
+        if isinstance(test, Binary) and test.operator in COMPARISONS:
+            jump = COMPARISONS[test.operator]
+            return self.combine("sub", test.left, test.right) + [
+                f"@{label}",
+                f"D;{NEGATED_JUMPS[jump] if negated else jump}",
+            ]
+        if negated:
+            return self.load(test) + [f"@{label}", "D+1;JNE"]  # ~x != 0 unless x == -1
+        return self.load(condition) + [f"@{label}", "D;JNE"]
+
+    def stack_op(self, command: str, right: Optional[Value]):
+        translator = self.translator
+        if right is None:
+            translator.arithmetic(command)
+            return
+
+        code = self.load(right) + ["@SP", "A=M-1"]
+        if command not in COMPARISONS:
+            translator.write(code + [f"M={LEFT_OPERAND[command].format('M')}"])
+            return
+
+        jump = COMPARISONS[command]
+        true_label = translator.generate_label(f"{jump[1:]}_TRUE")
+        end_label = translator.generate_label(f"{jump[1:]}_END")
+        translator.write(
+            code
+            + [
+                "D=M-D",
+                f"@{true_label}",
+                f"D;{jump}",
+                "@SP",
+                "A=M-1",
+                "M=0",
+                f"@{end_label}",
+                "0;JMP",
+                f"({true_label})",
+                "@SP",
+                "A=M-1",
+                "M=-1",
+                f"({end_label})",
+            ]
+        )
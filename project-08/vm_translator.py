@@ -1,20 +1,49 @@
 import glob
 import os
+import sys
+from dataclasses import dataclass
+from typing import Optional
+from asm_optimizer import optimize_asm
+from inliner import ROM_SIZE, Inliner
+from vm_ir import Lowering, build_functions, free_registers
+
+
+@dataclass
+class Source:
+    """Where the code of a VM command starts in the translated assembly."""
+
+    asm_line: int  # index into the translated lines
+    file_name: str
+    vm_line: int  # number of the command in its file, its line in compiled .vm files
+    function: str
 
 
 class VMTranslator:
     SEGMENTS = {"argument": "ARG", "local": "LCL", "this": "THIS", "that": "THAT"}
 
-    def __init__(self):
+    def __init__(self, optimize: bool = False):
+        self.optimize = optimize
         self.lines: list[str] = []
         self.label_index = 0
         self.call_return_index = 0
         self.current_file = "NO_FILE_SELECTED"
+        self.current_function = ""
+        self.command_number = 0
+        self.sources: list[Source] = []
+        self.free_registers: list[int] = []  # temp registers no function of the program uses, see translate_files
 
     def write(self, code: list[str]):
         """Append assembly code lines."""
         self.lines.extend(code)
 
+    def start_command(self, command: str):
+        """Starts the code of the next command of the current file with a comment and records its source."""
+        if command.startswith("function "):
+            self.current_function = command.split()[1]
+        self.command_number += 1
+        self.sources.append(Source(len(self.lines), self.current_file, self.command_number, self.current_function))
+        self.lines.append(f"// {command}")
+
     def generate_label(self, base: str) -> str:
         """Generates a unique label based on a given base name."""
         self.label_index += 1
@@ -145,14 +174,16 @@ class VMTranslator:
         for _ in range(local_count):
             self.push("constant", "0")
 
-    def translate_return(self):
+    def translate_return(self, value: Optional[list[str]] = None):
+        """Return from a function; `value` is code computing the result into D, if
+        it is not on top of the stack."""
         # store lcl in R14
         self.write(["@LCL", "D=M", "@R14", "M=D"])
         # store frame in R13
         self.write(["@5", "A=D-A", "D=M", "@R13", "M=D"])
 
         # place return value to arg 0
-        self.write(["@SP", "AM=M-1", "D=M", "@ARG", "A=M", "M=D"])
+        self.write((value or ["@SP", "AM=M-1", "D=M"]) + ["@ARG", "A=M", "M=D"])
 
         # reposition sp to arg
         self.write(["@ARG", "D=M+1", "@SP", "M=D"])
@@ -181,6 +212,44 @@ class VMTranslator:
         self.write([f"@{function_name}", "0;JMP"])  # goto function
         self.lines.append(f"({ret_addr})")  # declare return label
 
+    def translate_tail_call(self, function_name: str, arg_count: int, recursive: bool = False):
+        """Call a function whose result is returned right away, reusing the current frame.
+
+        The new arguments replace the current ones and the caller's saved frame
+        ends up right above them, so the callee returns straight to our caller.
+        A recursive call has as many arguments as the current one, which leaves
+        the saved frame where it is; other calls check for that at run time.
+        """
+        if not recursive:
+            in_place_label = self.generate_label("TAIL_CALL")
+            # ARG + arg_count + 5 == LCL means the saved frame can stay
+            self.write([f"@{arg_count + 5}", "D=A", "@ARG", "D=D+M", "@LCL", "D=D-M"])
+            self.write([f"@{in_place_label}", "D;JEQ"])
+
+            # push the saved frame above the arguments
+            for offset in range(5, 0, -1):
+                self.write(["@LCL", "D=M", f"@{offset}", "A=D-A", "D=M"])
+                self.write(["@SP", "M=M+1", "A=M-1", "M=D"])
+
+            # move the arguments and the frame down to ARG
+            self.write([f"@{arg_count + 5}", "D=A", "@SP", "D=M-D", "@R13", "M=D"])
+            self.write(["@ARG", "D=M", "@R14", "M=D"])
+            for _ in range(arg_count + 5):
+                self.write(["@R13", "M=M+1", "A=M-1", "D=M", "@R14", "M=M+1", "A=M-1", "M=D"])
+
+            # LCL = SP = end of the moved frame
+            self.write(["@R14", "D=M", "@LCL", "M=D", "@SP", "M=D"])
+            self.write([f"@{function_name}", "0;JMP"])
+            self.label(in_place_label)
+
+        if arg_count:
+            # pop the arguments into ARG[arg_count - 1] .. ARG[0]
+            self.write(["@ARG", "D=M", f"@{arg_count}", "D=D+A", "@R13", "M=D"])
+            for _ in range(arg_count):
+                self.write(["@SP", "AM=M-1", "D=M", "@R13", "AM=M-1", "M=D"])
+        self.write(["@LCL", "D=M", "@SP", "M=D"])  # drop locals and the stack
+        self.write([f"@{function_name}", "0;JMP"])
+
     def bootstrap(self):
         """Write bootstrap code to initialize SP and call Sys.init."""
         self.write(["@256", "D=A", "@SP", "M=D"])
@@ -190,7 +259,7 @@ class VMTranslator:
 
     def translate_vm_code(self, code: list[str]):
         for line in code:
-            self.lines.append(f"// {line}")
+            self.start_command(line)
             parts = line.split()
             cmd = parts[0]
             if cmd in {"add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not"}:
@@ -217,7 +286,17 @@ class VMTranslator:
     def translate_file(self, file_name: str, code: list[str]):
         """Translate a single VM file given only the file name."""
         self.current_file = file_name
-        self.translate_vm_code(code)
+        self.command_number = 0
+        if self.optimize:
+            Lowering(self).lower(build_functions(code, self.free_registers))
+        else:
+            self.translate_vm_code(code)
+
+    def translate_files(self, files: dict[str, list[str]]):
+        """Translate all VM files of a program, which lets leaf functions use the temp registers none of them use."""
+        self.free_registers = free_registers(files.values())
+        for file_name, code in files.items():
+            self.translate_file(file_name, code)
 
     def get_translated_code(self) -> list[str]:
         """Return the translated assembly code."""
@@ -233,7 +312,88 @@ def clean(lines: list[str]) -> list[str]:
     ]
 
 
-def main():
+def count_instructions(asm: list[str]) -> int:
+    """Number of ROM words taken by assembly lines, leaving out labels and comments."""
+    return sum(not line.startswith(("//", "(")) for line in asm)
+
+
+def instruction_count(file_name: str, code: list[str]) -> int:
+    """Number of Hack instructions in the default translation of `code`."""
+    translator = VMTranslator()
+    translator.translate_file(file_name, code)
+    return count_instructions(translator.get_translated_code())
+
+
+def inline_small_functions(files: dict[str, list[str]], rom_size: int) -> dict[str, list[str]]:
+    """Inlines small functions across `files` and prints what each one costs and saves."""
+    inliner = Inliner(files, instruction_count, rom_size)
+    for report in inliner.inline():
+        removed = ", function removed" if report.removed else ""
+        print(
+            f"Inlined {report.name}: {report.sites} call sites, ROM {report.rom_delta:+d}, "
+            f"about {report.cycles_saved} cycles saved per call{removed}"
+        )
+    return inliner.get_files()
+
+
+def read_vm_files(vm_files: list[str]) -> dict[str, list[str]]:
+    """Cleaned code of each file, by file name without extension."""
+    files = {}
+    for vm_file in vm_files:
+        with open(vm_file, "r", encoding="utf-8") as f:
+            code = f.readlines()
+            files[os.path.splitext(os.path.basename(vm_file))[0]] = clean(code)
+    return files
+
+
+def line_sources(asm: list[str], translator: VMTranslator) -> list[Optional[Source]]:
+    """
+    The VM command each line of `asm` belongs to, None for code before the
+    first command (the bootstrap).
+
+    `asm` may be the translated lines after `optimize_asm`, which moves and
+    drops comment lines but never copies or rewrites them, so the comments
+    starting each command are found by identity.
+    """
+    translated = {id(translator.lines[source.asm_line]): source for source in translator.sources}
+    sources: list[Optional[Source]] = []
+    current = None
+    for line in asm:
+        current = translated.get(id(line), current)
+        sources.append(current)
+    return sources
+
+
+def source_map(asm: list[str], translator: VMTranslator) -> list[str]:
+    """One `asm_line vm_file vm_line function` row per VM command in `asm`, with 1-based asm lines."""
+    rows = []
+    for asm_line, (line, source) in enumerate(zip(asm, line_sources(asm, translator)), start=1):
+        if source and line is translator.lines[source.asm_line]:
+            rows.append(f"{asm_line} {source.file_name} {source.vm_line} {source.function}")
+    return rows
+
+
+def write_program(output_path: str, translator: VMTranslator, cfg: bool, write_source_map: bool):
+    """
+    Writes the translated program, after the control-flow optimizations if `cfg`
+    is set, and its source map to `{output_path}.map` if `write_source_map` is.
+    """
+    asm = translator.get_translated_code()
+    if cfg:
+        optimized = optimize_asm(asm)
+        counts = f" ({count_instructions(asm)} -> {count_instructions(optimized)} instructions)"
+        asm = optimized
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(asm))
+    print(f"Created {output_path}{counts if cfg else ''}")
+
+    if write_source_map:
+        with open(f"{output_path}.map", "w", encoding="utf-8") as f:
+            f.write("".join(f"{row}\n" for row in source_map(asm, translator)))
+        print(f"Created {output_path}.map")
+
+
+def main(optimize: bool = False, inline: bool = False, cfg: bool = False, write_source_map: bool = False):
     base_dir = "files"  # Top-level directory
     if not os.path.isdir(base_dir):
         print(f"Error: '{base_dir}' is not a valid directory.")
@@ -245,39 +405,35 @@ def main():
         if os.path.isdir(subdir_path):  # Ensure it's a directory
             vm_files = sorted(glob.glob(os.path.join(subdir_path, "*.vm")))
             if vm_files:
-                translator = VMTranslator()
+                translator = VMTranslator(optimize)
                 translator.bootstrap()
 
-                for vm_file in vm_files:
-                    with open(vm_file, "r", encoding="utf-8") as f:
-                        code = f.readlines()
-                        cleaned_code = clean(code)
-
-                    file_name = os.path.splitext(os.path.basename(vm_file))[0]
-                    translator.translate_file(file_name, cleaned_code)
+                files = read_vm_files(vm_files)
+                if inline:
+                    files = inline_small_functions(files, ROM_SIZE - count_instructions(translator.lines))
+                translator.translate_files(files)
 
                 output_path = os.path.join(subdir_path, f"{subdir}.asm")
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write("\n".join(translator.get_translated_code()))
-                print(f"Created {output_path}")
+                write_program(output_path, translator, cfg, write_source_map)
 
     # Process each .vm file inside base_dir independently
     for vm_file in sorted(glob.glob(os.path.join(base_dir, "*.vm"))):
-        translator = VMTranslator()
+        translator = VMTranslator(optimize)
         # translator.bootstrap()
 
-        with open(vm_file, "r", encoding="utf-8") as f:
-            code = f.readlines()
-            cleaned_code = clean(code)
-
-        file_name = os.path.splitext(os.path.basename(vm_file))[0]
-        translator.translate_file(file_name, cleaned_code)
+        files = read_vm_files([vm_file])
+        if inline:
+            files = inline_small_functions(files, ROM_SIZE)
+        translator.translate_files(files)
 
         output_filename = os.path.splitext(vm_file)[0] + ".asm"
-        with open(output_filename, "w", encoding="utf-8") as f:
-            f.write("\n".join(translator.get_translated_code()))
-        print(f"Created {output_filename}")
+        write_program(output_filename, translator, cfg, write_source_map)
 
 
 if __name__ == "__main__":
-    main()
+    main(
+        optimize="--optimize" in sys.argv,
+        inline="--inline" in sys.argv,
+        cfg="--optimize-asm" in sys.argv,
+        write_source_map="--source-map" in sys.argv,
+    )
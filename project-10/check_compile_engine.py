@@ -0,0 +1,100 @@
+"""Checks the parser against the committed XML files and on deep nesting.
+
+Every Jack file under files/ is parsed again, and its token and parse tree
+XML must match the committed T.xml and .xml files byte for byte, both as
+streamed to XML writers and as written from the token list and AST (main.py
+--ast). A class
+whose expression nests DEPTH parentheses and DEPTH unary operators deep
+must parse with the recursion limit at RECURSION_LIMIT on both paths, with
+an expression for every pair of parentheses.
+"""
+
+import glob
+import os
+import sys
+import tempfile
+from io import StringIO
+from compile_engine import CompileEngine
+from main import write_ast_as_xml, write_tokens_xml
+from tokenizer import get_tokens, remove_comments, stream_tokens, tokenize
+from xml_writer import XMLWriter
+
+DEPTH = 3000
+RECURSION_LIMIT = 200
+
+DEEP = f"""
+class Main {{
+    function int main() {{
+        var int x;
+        let x = {"(" * DEPTH}1{")" * DEPTH};
+        let x = {"-" * DEPTH}x;
+        return x;
+    }}
+}}
+"""
+
+
+def read(file_name: str) -> str:
+    with open(file_name, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def stream_xml(jack_file: str) -> tuple[str, str]:
+    """The token and parse tree XML of `jack_file`, as main.py writes them."""
+    tokens_xml, tree_xml = StringIO(), StringIO()
+    CompileEngine(
+        stream_tokens(jack_file),
+        sink=XMLWriter(tree_xml),
+        token_sink=XMLWriter(tokens_xml, indent="\t", final_newline=False),
+    ).compile()
+    return tokens_xml.getvalue(), tree_xml.getvalue()
+
+
+def ast_xml(jack_file: str) -> tuple[str, str]:
+    """The token and parse tree XML of `jack_file`, as main.py --ast writes them."""
+    tokens = tokenize(jack_file)
+    with tempfile.TemporaryDirectory() as directory:
+        tokens_file = os.path.join(directory, "tokens.xml")
+        write_tokens_xml(tokens_file, tokens)
+        tokens_xml = read(tokens_file)
+    tree_xml = StringIO()
+    write_ast_as_xml(CompileEngine(tokens).generate_ast(), tree_xml)
+    return tokens_xml, tree_xml.getvalue()
+
+
+def check_files() -> bool:
+    same = True
+    for jack_file in sorted(glob.glob(os.path.join("files", "*", "*.jack"))):
+        base = os.path.splitext(jack_file)[0]
+        committed = (read(f"{base}T.xml"), read(f"{base}.xml"))
+        streamed, built = stream_xml(jack_file) == committed, ast_xml(jack_file) == committed
+        print(f"  {jack_file}: streamed {'same' if streamed else 'DIFFERENT'}, AST {'same' if built else 'DIFFERENT'}")
+        same = same and streamed and built
+    return same
+
+
+def check_deep() -> bool:
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    try:
+        tree_xml, ast_tree_xml = StringIO(), StringIO()
+        CompileEngine(get_tokens(remove_comments(DEEP)), sink=XMLWriter(tree_xml)).compile()
+        write_ast_as_xml(CompileEngine(get_tokens(remove_comments(DEEP))).generate_ast(), ast_tree_xml)
+    except RecursionError:
+        print(f"  RecursionError at a recursion limit of {RECURSION_LIMIT}")
+        return False
+    finally:
+        sys.setrecursionlimit(limit)
+
+    expressions = tree_xml.getvalue().count("<expression>")
+    print(f"  {DEPTH} parentheses and unary operators: {expressions} expressions")
+    same = ast_tree_xml.getvalue() == tree_xml.getvalue()
+    return expressions == DEPTH + 3 and same  # the parenthesized ones and one per statement
+
+
+if __name__ == "__main__":
+    print("XML of the test programs against the committed files:")
+    error_found = not check_files()
+    print("Deeply nested expressions:")
+    error_found = not check_deep() or error_found
+    print("Error found" if error_found else "No errors found!")
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Iterable, Optional, Protocol
 from tokenizer import Token, TokenType
 
 
@@ -15,9 +15,57 @@ class AST:
         self.children.extend(child)
 
 
+class ParseSink(Protocol):
+    """Receives the parse tree as a stream of events, in document order."""
+
+    def open(self, tag: str): ...
+
+    def close(self, tag: str): ...
+
+    def leaf(self, token: Token): ...
+
+
+class ASTBuilder:
+    """Parse sink that assembles the events into an AST."""
+
+    def __init__(self):
+        self.root: Optional[AST] = None
+        self.stack: list[AST] = []
+
+    def open(self, tag: str):
+        node = AST(tag)
+        if self.stack:
+            self.stack[-1].add(node)
+        else:
+            self.root = node
+        self.stack.append(node)
+
+    def close(self, tag: str):
+        self.stack.pop()
+
+    def leaf(self, token: Token):
+        self.stack[-1].add(AST(token))
+
+
+BINARY_OPERATORS = {"+", "-", "*", "/", "&", "|", "<", ">", "="}
+UNARY_OPERATORS = {"-", "~"}
+
+
 class CompileEngine:
-    def __init__(self, tokens: list[Token]):
+    def __init__(
+        self,
+        tokens: Iterable[Token],
+        sink: Optional[ParseSink] = None,
+        token_sink: Optional[ParseSink] = None,
+    ):
+        """Parses `tokens`, reporting the parse tree to `sink` (an ASTBuilder by default).
+
+        If a `token_sink` is given, every token is also reported to it as a leaf,
+        so the token listing can be written in the same pass.
+        """
         self.tokens = iter(tokens)
+        self.sink: ParseSink = sink or ASTBuilder()
+        self.token_sink = token_sink
         self.current_token: Token
         self.advance()
 
@@ -26,7 +74,24 @@ class CompileEngine:
     # -----------------------------------
 
     def generate_ast(self) -> AST:
-        return self.compile_class()
+        if not isinstance(self.sink, ASTBuilder):
+            raise ValueError("generate_ast requires an ASTBuilder sink")
+
+        self.compile()
+        return self.sink.root  # type: ignore
+
+    def compile(self):
+        """Parses the class, streaming events to the sinks without keeping the tree."""
+        if self.token_sink:
+            self.token_sink.open("tokens")
+
+        self.compile_class()
+
+        if self.token_sink:
+            while self.current_token is not None:  # trailing tokens after the class
+                self.token_sink.leaf(self.current_token)
+                self.advance()
+            self.token_sink.close("tokens")
 
     # -----------------------------------
     # Initialization & Helper Functions
@@ -44,6 +109,7 @@ class CompileEngine:
 
         If no expected_type is provided, any token type is accepted.
         If no expected_value is provided, any token value is accepted.
+        The token is reported to the sinks as a leaf.
         """
 
         if isinstance(expected_type, list):
@@ -62,6 +128,9 @@ class CompileEngine:
             raise ValueError(f"Expected value {expected_value}, got '{self.current_token.value}'")
 
         token = self.current_token
+        self.sink.leaf(token)
+        if self.token_sink:
+            self.token_sink.leaf(token)
         self.advance()
         return token
 
@@ -69,291 +138,337 @@ class CompileEngine:
     # Class
     # -----------------------------------
 
-    def compile_class(self) -> AST:
+    def compile_class(self):
         """Compiles an entire class."""
-        root = AST("class")
+        self.sink.open("class")
 
-        root.add(AST(self.expect(TokenType.KEYWORD, "class")))
-        root.add(AST(self.expect(TokenType.IDENTIFIER)))  # class name e.g. Main
-        root.add(AST(self.expect(TokenType.SYMBOL, "{")))
+        self.expect(TokenType.KEYWORD, "class")
+        self.expect(TokenType.IDENTIFIER)  # class name e.g. Main
+        self.expect(TokenType.SYMBOL, "{")
 
         while self.current_token.value in {"static", "field"}:
-            root.add(self.compile_class_var_dec())
+            self.compile_class_var_dec()
 
         while self.current_token.value in {"constructor", "function", "method"}:
-            root.add(self.compile_class_subroutine_dec())
+            self.compile_class_subroutine_dec()
 
-        root.add(AST(self.expect(TokenType.SYMBOL, "}")))
+        self.expect(TokenType.SYMBOL, "}")
 
-        return root
+        self.sink.close("class")
 
     # -----------------------------------
     # Variable & Parameter Declarations
     # -----------------------------------
 
-    def compile_class_var_dec(self) -> AST:
+    def compile_class_var_dec(self):
         """Compiles a static or field variable declaration."""
 
-        var_dec = AST("classVarDec")
-        var_dec.add(AST(self.expect(TokenType.KEYWORD)))  # static/field
-        var_dec.add(AST(self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])))  # type
-        var_dec.add(AST(self.expect(TokenType.IDENTIFIER)))  # variable name
+        self.sink.open("classVarDec")
+        self.expect(TokenType.KEYWORD)  # static/field
+        self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])  # type
+        self.expect(TokenType.IDENTIFIER)  # variable name
 
         while self.current_token.value == ",":
-            var_dec.add(AST(self.expect(TokenType.SYMBOL, ",")))
-            var_dec.add(AST(self.expect(TokenType.IDENTIFIER)))
-
-        var_dec.add(AST(self.expect(TokenType.SYMBOL, ";")))
+            self.expect(TokenType.SYMBOL, ",")
+            self.expect(TokenType.IDENTIFIER)
 
-        return var_dec
+        self.expect(TokenType.SYMBOL, ";")
+        self.sink.close("classVarDec")
 
-    def compile_var_dec(self) -> AST:
+    def compile_var_dec(self):
         """Compiles a local variable declaration."""
 
-        var_dec = AST("varDec")
-        var_dec.add(AST(self.expect(TokenType.KEYWORD, "var")))
-        var_dec.add(AST(self.expect(expected_type=[TokenType.KEYWORD, TokenType.IDENTIFIER])))  # type
-        var_dec.add(AST(self.expect(TokenType.IDENTIFIER)))  # varName
+        self.sink.open("varDec")
+        self.expect(TokenType.KEYWORD, "var")
+        self.expect(expected_type=[TokenType.KEYWORD, TokenType.IDENTIFIER])  # type
+        self.expect(TokenType.IDENTIFIER)  # varName
 
         while self.current_token.value == ",":
-            var_dec.add(AST(self.expect(TokenType.SYMBOL, ",")))
-            var_dec.add(AST(self.expect(TokenType.IDENTIFIER)))  # varName
+            self.expect(TokenType.SYMBOL, ",")
+            self.expect(TokenType.IDENTIFIER)  # varName
 
-        var_dec.add(AST(self.expect(TokenType.SYMBOL, ";")))
-        
-        return var_dec
+        self.expect(TokenType.SYMBOL, ";")
+        self.sink.close("varDec")
 
-    def compile_parameter_list(self) -> AST:
+    def compile_parameter_list(self):
         """Compiles a parameter list for a function."""
 
-        parameters = AST("parameterList")
-        if self.current_token.value == ")":
-            return parameters  # No parameters
-        
-        parameters.add(AST(self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])))  # type
-        parameters.add(AST(self.expect(TokenType.IDENTIFIER)))  # varName
+        self.sink.open("parameterList")
 
-        while self.current_token.value == ",":
-            parameters.add(AST(self.expect(TokenType.SYMBOL, ",")))
-            parameters.add(AST(self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])))  # type
-            parameters.add(AST(self.expect(TokenType.IDENTIFIER)))  # varName
+        if self.current_token.value != ")":
+            self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])  # type
+            self.expect(TokenType.IDENTIFIER)  # varName
+
+            while self.current_token.value == ",":
+                self.expect(TokenType.SYMBOL, ",")
+                self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])  # type
+                self.expect(TokenType.IDENTIFIER)  # varName
 
-        return parameters
+        self.sink.close("parameterList")
 
     # -----------------------------------
     # Subroutine Declarations
     # -----------------------------------
 
-    def compile_class_subroutine_dec(self) -> AST:
+    def compile_class_subroutine_dec(self):
         """Compiles a constructor, function, or method declaration."""
 
-        subroutine = AST("subroutineDec")
-        subroutine.add(AST(self.expect(TokenType.KEYWORD)))  # constructor, function, method
-        subroutine.add(AST(self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])))  # return type or class
-        subroutine.add(AST(self.expect(TokenType.IDENTIFIER)))  # subroutine name or new
-        subroutine.add(AST(self.expect(TokenType.SYMBOL, "(")))
-        subroutine.add(self.compile_parameter_list())
-        subroutine.add(AST(self.expect(TokenType.SYMBOL, ")")))
-        subroutine.add(self.compile_subroutine_body())
-
-        return subroutine
-
-    def compile_subroutine_call(self, identifier=None) -> list[AST]:
+        self.sink.open("subroutineDec")
+        self.expect(TokenType.KEYWORD)  # constructor, function, method
+        self.expect([TokenType.IDENTIFIER, TokenType.KEYWORD])  # return type or class
+        self.expect(TokenType.IDENTIFIER)  # subroutine name or new
+        self.expect(TokenType.SYMBOL, "(")
+        self.compile_parameter_list()
+        self.expect(TokenType.SYMBOL, ")")
+        self.compile_subroutine_body()
+        self.sink.close("subroutineDec")
+
+    def compile_subroutine_call(self):
         """Compiles a subroutine call without wrapping it in an XML tag."""
 
-        nodes = []
-
-        if not identifier:
-            nodes.append(AST(self.expect(TokenType.IDENTIFIER)))
-        else:
-            nodes.append(identifier)
+        self.expect(TokenType.IDENTIFIER)
 
         if self.current_token.value == ".":
-            nodes.append(AST(self.expect(TokenType.SYMBOL, ".")))
-            nodes.append(AST(self.expect(TokenType.IDENTIFIER)))
-
-        nodes.append(AST(self.expect(TokenType.SYMBOL, "(")))
-        nodes.append(self.compile_expression_list())
-        nodes.append(AST(self.expect(TokenType.SYMBOL, ")")))
+            self.expect(TokenType.SYMBOL, ".")
+            self.expect(TokenType.IDENTIFIER)
 
-        return nodes
+        self.expect(TokenType.SYMBOL, "(")
+        self.compile_expression_list()
+        self.expect(TokenType.SYMBOL, ")")
 
-    def compile_subroutine_body(self) -> AST:
+    def compile_subroutine_body(self):
         """Compiles the body of a subroutine."""
 
-        body = AST("subroutineBody")
-        body.add(AST(self.expect(TokenType.SYMBOL, "{")))
+        self.sink.open("subroutineBody")
+        self.expect(TokenType.SYMBOL, "{")
 
         while self.current_token.value == "var":
-            body.add(self.compile_var_dec())
-
-        body.add(self.compile_statements())
-        body.add(AST(self.expect(TokenType.SYMBOL, "}")))
+            self.compile_var_dec()
 
-        return body
+        self.compile_statements()
+        self.expect(TokenType.SYMBOL, "}")
+        self.sink.close("subroutineBody")
 
     # -----------------------------------
     # Expression Parsing
     # -----------------------------------
 
-    def compile_term(self) -> AST:
-        """Compiles a term (single unit in an expression)."""
+    def open_expression(self, stack: list[str]):
+        stack.append("expression")
+        self.sink.open("expression")
+
+    def start_term(self, stack: list[str]) -> bool:
+        """Starts a term (single unit in an expression).
+
+        Returns True when the term is complete, or False when it opens a nested
+        expression or a unary operand; the pending term is then pushed on
+        `stack` and completed by `compile_expression`.
+        """
         token = self.current_token
-        term = AST("term")
+        self.sink.open("term")
 
         if token.type in {TokenType.INTEGER_CONSTANT, TokenType.STRING_CONSTANT, TokenType.KEYWORD}:
-            term.add(AST(self.expect()))
-            return term
+            self.expect()
+            self.sink.close("term")
+            return True
 
         if token.type == TokenType.IDENTIFIER:
-            identifier = AST(self.expect(TokenType.IDENTIFIER))
+            self.expect(TokenType.IDENTIFIER)
 
             if self.current_token.value == "[":
-                term.add(identifier)
-                term.add(AST(self.expect(TokenType.SYMBOL, "[")))
-                term.add(self.compile_expression())
-                term.add(AST(self.expect(TokenType.SYMBOL, "]")))
-                return term
+                self.expect(TokenType.SYMBOL, "[")
+                stack.append("index")
+                self.open_expression(stack)
+                return False
 
             if self.current_token.value in {"(", "."}:
-                term.extend(self.compile_subroutine_call(identifier))
-                return term
+                if self.current_token.value == ".":
+                    self.expect(TokenType.SYMBOL, ".")
+                    self.expect(TokenType.IDENTIFIER)
+
+                self.expect(TokenType.SYMBOL, "(")
+                self.sink.open("expressionList")
+
+                if self.current_token.value == ")":
+                    self.sink.close("expressionList")
+                    self.expect(TokenType.SYMBOL, ")")
+                    self.sink.close("term")
+                    return True
 
-            term.add(identifier)
-            return term
+                stack.append("call")
+                self.open_expression(stack)
+                return False
+
+            self.sink.close("term")
+            return True
 
         if token.value == "(":
-            term.add(AST(self.expect(TokenType.SYMBOL, "(")))
-            term.add(self.compile_expression())
-            term.add(AST(self.expect(TokenType.SYMBOL, ")")))
-            return term
+            self.expect(TokenType.SYMBOL, "(")
+            stack.append("group")
+            self.open_expression(stack)
+            return False
 
-        if token.value in {"-", "~"}:
-            term.add(AST(self.expect(TokenType.SYMBOL)))
-            term.add(self.compile_term())
-            return term
+        if token.value in UNARY_OPERATORS:
+            self.expect(TokenType.SYMBOL)
+            stack.append("unary")
+            return False
 
         raise Exception(f"Unexpected term: {token}")
 
-    def compile_expression(self) -> AST:
-        """Compiles an expression."""
-        expression = AST("expression")
-        expression.add(self.compile_term())
-        while self.current_token.value in {"+", "-", "*", "/", "&", "|", "<", ">", "="}:
-            expression.add(AST(self.expect(TokenType.SYMBOL)))
-            expression.add(self.compile_term())
-        return expression
+    def compile_expression(self):
+        """Compiles an expression.
 
-    def compile_expression_list(self) -> AST:
+        Jack gives every binary operator the same precedence and associates left
+        to right, so an expression is a flat `term (op term)*` sequence. Nested
+        expressions and unary chains are kept on an explicit stack of pending
+        constructs (expression, unary, group, index or call) rather than the
+        Python call stack, so nesting depth is not limited by recursion.
+        """
+        stack: list[str] = []
+        self.open_expression(stack)
+        term_done = False
+
+        while True:
+            if not term_done:
+                term_done = self.start_term(stack)
+                continue
+
+            if stack[-1] == "unary":
+                stack.pop()
+                self.sink.close("term")
+                continue
+
+            # stack[-1] == "expression"
+            if self.current_token.value in BINARY_OPERATORS:
+                self.expect(TokenType.SYMBOL)
+                term_done = False
+                continue
+
+            stack.pop()
+            self.sink.close("expression")
+            if not stack:
+                return
+
+            parent = stack.pop()
+
+            if parent == "call":
+                if self.current_token.value == ",":
+                    self.expect(TokenType.SYMBOL, ",")
+                    stack.append(parent)
+                    self.open_expression(stack)
+                    term_done = False
+                    continue
+                self.sink.close("expressionList")
+                self.expect(TokenType.SYMBOL, ")")
+            else:
+                self.expect(TokenType.SYMBOL, "]" if parent == "index" else ")")
+
+            self.sink.close("term")
+
+    def compile_expression_list(self):
         """Compiles a list of expressions (possibly empty)."""
 
-        expr_list = AST("expressionList")
+        self.sink.open("expressionList")
 
-        if self.current_token.value == ")":
-            return expr_list
-        
-        expr_list.add(self.compile_expression())
+        if self.current_token.value != ")":
+            self.compile_expression()
 
-        while self.current_token.value == ",":
-            expr_list.add(AST(self.expect(TokenType.SYMBOL, ",")))
-            expr_list.add(self.compile_expression())
+            while self.current_token.value == ",":
+                self.expect(TokenType.SYMBOL, ",")
+                self.compile_expression()
 
-        return expr_list
+        self.sink.close("expressionList")
 
     # -----------------------------------
     # Statement Parsing
     # -----------------------------------
 
-    def compile_let_statement(self) -> AST:
+    def compile_let_statement(self):
         """Compiles a let statement."""
 
-        let_stmt = AST("letStatement")
-        let_stmt.add(AST(self.expect(TokenType.KEYWORD, "let")))
-        let_stmt.add(AST(self.expect(TokenType.IDENTIFIER)))  # varName
+        self.sink.open("letStatement")
+        self.expect(TokenType.KEYWORD, "let")
+        self.expect(TokenType.IDENTIFIER)  # varName
 
         if self.current_token.value == "[":
-            let_stmt.add(AST(self.expect(TokenType.SYMBOL, "[")))
-            let_stmt.add(self.compile_expression())
-            let_stmt.add(AST(self.expect(TokenType.SYMBOL, "]")))
-
-        let_stmt.add(AST(self.expect(TokenType.SYMBOL, "=")))
-        let_stmt.add(self.compile_expression())
-        let_stmt.add(AST(self.expect(TokenType.SYMBOL, ";")))
+            self.expect(TokenType.SYMBOL, "[")
+            self.compile_expression()
+            self.expect(TokenType.SYMBOL, "]")
 
-        return let_stmt
+        self.expect(TokenType.SYMBOL, "=")
+        self.compile_expression()
+        self.expect(TokenType.SYMBOL, ";")
+        self.sink.close("letStatement")
 
-    def compile_if_statement(self) -> AST:
+    def compile_if_statement(self):
         """Compiles an if statement."""
 
-        if_stmt = AST("ifStatement")
-        if_stmt.add(AST(self.expect(TokenType.KEYWORD, "if")))
-        if_stmt.add(AST(self.expect(TokenType.SYMBOL, "(")))
-        if_stmt.add(self.compile_expression())
-        if_stmt.add(AST(self.expect(TokenType.SYMBOL, ")")))
-        if_stmt.add(AST(self.expect(TokenType.SYMBOL, "{")))
-        if_stmt.add(self.compile_statements())
-        if_stmt.add(AST(self.expect(TokenType.SYMBOL, "}")))
+        self.sink.open("ifStatement")
+        self.expect(TokenType.KEYWORD, "if")
+        self.expect(TokenType.SYMBOL, "(")
+        self.compile_expression()
+        self.expect(TokenType.SYMBOL, ")")
+        self.expect(TokenType.SYMBOL, "{")
+        self.compile_statements()
+        self.expect(TokenType.SYMBOL, "}")
 
         if self.current_token.value == "else":
-            if_stmt.add(AST(self.expect(TokenType.KEYWORD, "else")))
-            if_stmt.add(AST(self.expect(TokenType.SYMBOL, "{")))
-            if_stmt.add(self.compile_statements())
-            if_stmt.add(AST(self.expect(TokenType.SYMBOL, "}")))
+            self.expect(TokenType.KEYWORD, "else")
+            self.expect(TokenType.SYMBOL, "{")
+            self.compile_statements()
+            self.expect(TokenType.SYMBOL, "}")
 
-        return if_stmt
+        self.sink.close("ifStatement")
 
-    def compile_while_statement(self) -> AST:
+    def compile_while_statement(self):
         """Compiles a while statement."""
 
-        while_stmt = AST("whileStatement")
-        while_stmt.add(AST(self.expect(TokenType.KEYWORD, "while")))
-        while_stmt.add(AST(self.expect(TokenType.SYMBOL, "(")))
-        while_stmt.add(self.compile_expression())
-        while_stmt.add(AST(self.expect(TokenType.SYMBOL, ")")))
-        while_stmt.add(AST(self.expect(TokenType.SYMBOL, "{")))
-        while_stmt.add(self.compile_statements())
-        while_stmt.add(AST(self.expect(TokenType.SYMBOL, "}")))
-
-        return while_stmt
-
-    def compile_do_statement(self) -> AST:
+        self.sink.open("whileStatement")
+        self.expect(TokenType.KEYWORD, "while")
+        self.expect(TokenType.SYMBOL, "(")
+        self.compile_expression()
+        self.expect(TokenType.SYMBOL, ")")
+        self.expect(TokenType.SYMBOL, "{")
+        self.compile_statements()
+        self.expect(TokenType.SYMBOL, "}")
+        self.sink.close("whileStatement")
+
+    def compile_do_statement(self):
         """Compiles a do statement."""
 
-        do_stmt = AST("doStatement")
-        do_stmt.add(AST(self.expect(TokenType.KEYWORD, "do")))
-        do_stmt.extend(self.compile_subroutine_call())
-        do_stmt.add(AST(self.expect(TokenType.SYMBOL, ";")))
-        
-        return do_stmt
+        self.sink.open("doStatement")
+        self.expect(TokenType.KEYWORD, "do")
+        self.compile_subroutine_call()
+        self.expect(TokenType.SYMBOL, ";")
+        self.sink.close("doStatement")
 
-    def compile_return_statement(self) -> AST:
+    def compile_return_statement(self):
         """Compiles a return statement."""
-        return_stmt = AST("returnStatement")
-        return_stmt.add(AST(self.expect(TokenType.KEYWORD, "return")))
+        self.sink.open("returnStatement")
+        self.expect(TokenType.KEYWORD, "return")
 
         if self.current_token.value != ";":
-            return_stmt.add(self.compile_expression())
-
-        return_stmt.add(AST(self.expect(TokenType.SYMBOL, ";")))
+            self.compile_expression()
 
-        return return_stmt
+        self.expect(TokenType.SYMBOL, ";")
+        self.sink.close("returnStatement")
 
-    def compile_statements(self) -> AST:
+    def compile_statements(self):
         """Compiles a sequence of statements."""
 
-        statements = AST("statements")
+        self.sink.open("statements")
 
         while self.current_token.value in {"let", "if", "while", "do", "return"}:
             match self.current_token.value:
                 case "let":
-                    statements.add(self.compile_let_statement())
+                    self.compile_let_statement()
                 case "if":
-                    statements.add(self.compile_if_statement())
+                    self.compile_if_statement()
                 case "while":
-                    statements.add(self.compile_while_statement())
+                    self.compile_while_statement()
                 case "do":
-                    statements.add(self.compile_do_statement())
+                    self.compile_do_statement()
                 case "return":
-                    statements.add(self.compile_return_statement())
+                    self.compile_return_statement()
 
-        return statements
+        self.sink.close("statements")
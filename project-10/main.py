@@ -1,10 +1,17 @@
 import glob
 import os
+import sys
 from compile_engine import CompileEngine, AST
-from tokenizer import Token, tokenize
+from tokenizer import Token, stream_tokens, tokenize
+from xml_writer import XML_ESCAPES, XMLWriter
 
 
-def main():
+def main(stream: bool = True):
+    """Writes T.xml and .xml for every Jack file.
+
+    In stream mode the parser sends its events straight to buffered XML writers
+    and both files are produced in a single pass without building the AST.
+    """
     base_dir = "files"
     if not os.path.isdir(base_dir):
         raise Exception(f"Error: '{base_dir}' is not a valid directory.")
@@ -13,13 +20,28 @@ def main():
         subdir_path = os.path.join(base_dir, subdir)
 
         for jack_file in sorted(glob.glob(os.path.join(subdir_path, "*.jack"))):
+            tokens_filename = os.path.splitext(jack_file)[0] + "T.xml"
+            output_filename = os.path.splitext(jack_file)[0] + ".xml"
+
+            if stream:
+                with (
+                    open(tokens_filename, "w", encoding="utf-8") as tokens_file,
+                    open(output_filename, "w", encoding="utf-8") as file,
+                ):
+                    CompileEngine(
+                        stream_tokens(jack_file),
+                        sink=XMLWriter(file),
+                        token_sink=XMLWriter(tokens_file, indent="\t", final_newline=False),
+                    ).compile()
+                print(f"Created {tokens_filename}")
+                print(f"Created {output_filename}")
+                continue
+
             tokens = tokenize(jack_file)
-            output_filename = os.path.splitext(jack_file)[0] + "T.xml"
-            write_tokens_xml(output_filename, tokens)
-            print(f"Created {output_filename}")
+            write_tokens_xml(tokens_filename, tokens)
+            print(f"Created {tokens_filename}")
 
             ast = CompileEngine(tokens).generate_ast()
-            output_filename = os.path.splitext(jack_file)[0] + ".xml"
             with open(output_filename, "w", encoding="utf-8") as file:
                 write_ast_as_xml(ast, file)
             print(f"Created {output_filename}")
@@ -29,17 +51,7 @@ def write_tokens_xml(output_filename: str, tokens: list[Token]):
     with open(output_filename, "w", encoding="utf-8") as f:
         f.write("<tokens>\n")
         for token in tokens:
-            value = token.value
-
-            if value == "<":
-                value = "&lt;"
-            elif value == ">":
-                value = "&gt;"
-            elif value == '"':
-                value = "&quot;"
-            elif value == "&":
-                value = "&amp;"
-
+            value = XML_ESCAPES.get(token.value, token.value)
             f.write(
                 f"\t<{token.type.value}> {value} </{token.type.value}>\n",
             )
@@ -47,31 +59,34 @@ def write_tokens_xml(output_filename: str, tokens: list[Token]):
 
 
 def write_ast_as_xml(node: AST, file, level: int = 0):
-    """Recursively writes the AST as an XML-like structure to a file."""
-    indent = "  " * level  # Indentation for readability
+    """Writes the AST as an XML-like structure to a file.
+
+    Walks the tree with an explicit stack so deeply nested expressions do not
+    hit the recursion limit.
+    """
+    stack: list[tuple[AST, int, bool]] = [(node, level, False)]
+
+    while stack:
+        node, level, closing = stack.pop()
+        indent = "  " * level  # Indentation for readability
 
-    # If it's a token, write it as an XML tag with content
-    if isinstance(node.value, Token):
-        token_type = node.value.type.value  # Convert Enum to string
-        token_value = node.value.value
+        # If it's a token, write it as an XML tag with content
+        if isinstance(node.value, Token):
+            token_type = node.value.type.value  # Convert Enum to string
+            token_value = XML_ESCAPES.get(node.value.value, node.value.value)
 
-        if token_value == "<":
-            token_value = "&lt;"
-        elif token_value == ">":
-            token_value = "&gt;"
-        elif token_value == '"':
-            token_value = "&quot;"
-        elif token_value == "&":
-            token_value = "&amp;"
+            file.write(f"{indent}<{token_type}> {token_value} </{token_type}>\n")
 
-        file.write(f"{indent}<{token_type}> {token_value} </{token_type}>\n")
+        elif isinstance(node.value, str):  # If it's a non-terminal node
+            if closing:
+                file.write(f"{indent}</{node.value}>\n")  # Closing tag
+                continue
 
-    elif isinstance(node.value, str):  # If it's a non-terminal node
-        file.write(f"{indent}<{node.value}>\n")
-        for child in node.children:
-            write_ast_as_xml(child, file, level + 1)  # Recursively write children
-        file.write(f"{indent}</{node.value}>\n")  # Closing tag
+            file.write(f"{indent}<{node.value}>\n")
+            stack.append((node, level, True))
+            for child in reversed(node.children):
+                stack.append((child, level + 1, False))
 
 
 if __name__ == "__main__":
-    main()
+    main(stream="--ast" not in sys.argv)
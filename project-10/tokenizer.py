@@ -1,6 +1,7 @@
 import re
 from enum import Enum
 from dataclasses import dataclass
+from typing import Iterator
 
 
 class TokenType(Enum):
@@ -31,16 +32,17 @@ TOKEN_REGEX_GROUPS = re.compile(
 )
 
 
-def get_tokens(jack_code: str) -> list[Token]:
-    tokens = []
+def iter_tokens(jack_code: str) -> Iterator[Token]:
     for match in TOKEN_REGEX_GROUPS.finditer(jack_code):
         if match.lastgroup:
             token_type = TokenType[match.lastgroup]
             token_value = match.group(match.lastgroup)
 
-            tokens.append(Token(token_type, token_value))
+            yield Token(token_type, token_value)
+
 
-    return tokens
+def get_tokens(jack_code: str) -> list[Token]:
+    return list(iter_tokens(jack_code))
 
 
 def remove_comments(jack_code: str) -> str:
@@ -50,9 +52,12 @@ def remove_comments(jack_code: str) -> str:
 
 
 def tokenize(file: str):
+    return list(stream_tokens(file))
+
+
+def stream_tokens(file: str) -> Iterator[Token]:
     with open(file, "r", encoding="utf-8") as f:
         jack_code = f.read()
 
     cleaned_code = remove_comments(jack_code)
-    tokens = get_tokens(cleaned_code)
-    return tokens
+    return iter_tokens(cleaned_code)
@@ -0,0 +1,51 @@
+from io import TextIOWrapper
+from tokenizer import Token
+
+XML_ESCAPES = {"<": "&lt;", ">": "&gt;", '"': "&quot;", "&": "&amp;"}
+
+BUFFER_SIZE = 4096  # pending lines before a write to the output stream
+
+
+class XMLWriter:
+    """Parse sink that writes events straight to an XML stream.
+
+    Lines are collected in a buffer and written in batches; the buffer is
+    flushed whenever the root element is closed.
+    """
+
+    def __init__(self, output_stream: TextIOWrapper, indent: str = "  ", final_newline: bool = True):
+        self.output_stream: TextIOWrapper = output_stream
+        self.indent = indent
+        self.final_newline = final_newline
+        self.indents: list[str] = [""]
+        self.level = 0
+        self.buffer: list[str] = []
+
+    def get_indent(self) -> str:
+        while len(self.indents) <= self.level:
+            self.indents.append(self.indents[-1] + self.indent)
+        return self.indents[self.level]
+
+    def open(self, tag: str):
+        self.buffer.append(f"{self.get_indent()}<{tag}>\n")
+        self.level += 1
+
+    def close(self, tag: str):
+        self.level -= 1
+        newline = "\n" if self.level or self.final_newline else ""
+        self.buffer.append(f"{self.get_indent()}</{tag}>{newline}")
+
+        if self.level == 0 or len(self.buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def leaf(self, token: Token):
+        token_type = token.type.value
+        value = XML_ESCAPES.get(token.value, token.value)
+        self.buffer.append(f"{self.get_indent()}<{token_type}> {value} </{token_type}>\n")
+
+        if len(self.buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.output_stream.write("".join(self.buffer))
+        self.buffer.clear()
@@ -0,0 +1,72 @@
+"""
+Client of build_server.py. It imports nothing from the toolchain, so it
+starts in a few milliseconds.
+
+Usage: python build_client.py build DIRECTORY [--optimize] [--socket PATH]
+       python build_client.py run DIRECTORY [--optimize] [--max-cycles N] [--keys TEXT] [--socket PATH]
+       python build_client.py stop [--socket PATH]
+
+TEXT is typed on the keyboard, with `\\n` for the newline key.
+"""
+
+import json
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.path.join("/tmp", f"nand2tetris-build-{os.getuid()}.sock")
+USAGE = "Usage: python build_client.py build|run|stop [DIRECTORY] [--optimize] [--max-cycles N] [--keys TEXT]"
+
+
+def request(message: dict, socket_path: str = SOCKET_PATH) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        response = b""
+        while chunk := connection.recv(65536):
+            response += chunk
+    return json.loads(response)
+
+
+def option(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+def main() -> int:
+    values = {option(name, "") for name in ("--max-cycles", "--keys", "--socket")}
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--") and argument not in values]
+    if not arguments or arguments[0] not in ("build", "run", "stop") or (arguments[0] != "stop" and len(arguments) < 2):
+        print(USAGE)
+        return 2
+
+    message: dict = {"command": arguments[0], "optimize": "--optimize" in sys.argv}
+    if arguments[0] != "stop":
+        message["directory"] = os.path.abspath(arguments[1])
+    if arguments[0] == "run":
+        message["max_cycles"] = int(option("--max-cycles", "100000000"))
+        message["keys"] = option("--keys", "").replace("\\n", "\n")
+    try:
+        response = request(message, option("--socket", SOCKET_PATH))
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("Error: the build server is not running; start it with python build_server.py")
+        return 1
+
+    if not response["ok"]:
+        print(f"Error: {response['error']}")
+        return 1
+    if arguments[0] == "stop":
+        return 0
+    compiled = ", ".join(response["compiled"]) or "nothing"
+    linked = "linked" if response["linked"] else "unchanged"
+    print(
+        f"Compiled {compiled}; program {linked}, "
+        f"{response['instructions']} instructions, {response['milliseconds']} ms"
+    )
+    if arguments[0] == "run":
+        print(response["output"])
+        print(f"{response['state']} after {response['cycles']} cycles, {response['run_milliseconds']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
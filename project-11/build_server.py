@@ -0,0 +1,204 @@
+"""
+Build server that keeps the Jack to Hack toolchain warm between builds.
+
+Running the compiler, the VM translator and the assembler as scripts pays
+for starting Python and importing them on every build. The server does that
+once, then answers requests on a Unix socket, sent by build_client.py:
+
+- build DIRECTORY: compiles the .jack files of DIRECTORY to .vm files next
+  to them, translates and assembles the program, and keeps it in memory.
+  Each class is recompiled only when its .jack file changed since the last
+  build, judged by its modification time and size, and the program is only
+  translated again when a class changed.
+- run DIRECTORY: builds, then runs the program on the emulator with the
+  native OS of project 8, until it halts, goes idle or runs its cycles.
+- stop: shuts the server down, once the requests in progress are answered.
+
+Builds and runs go to a worker thread one at a time, so the server keeps
+accepting connections and answers stop while one is in progress.
+
+OS functions that a program calls but does not define are linked to the
+native OS, as stubs the emulator traps.
+
+Usage: python build_server.py [--socket PATH]
+"""
+
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from io import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+sys.path.append(os.path.join(ROOT, "project-08"))
+
+from assembler import assemble_lines, cleanup_lines, first_pass
+from compile_engine import CompileEngine
+from emulator import Emulator
+from native_os import NEW_LINE, NativeOS, native_traps, natives_for, stub_files
+from tokenizer import tokenize
+from vm_translator import VMTranslator, clean
+
+SOCKET_PATH = os.path.join("/tmp", f"nand2tetris-build-{os.getuid()}.sock")
+MAX_CYCLES = 100_000_000
+
+
+@dataclass
+class CompiledClass:
+    stamp: tuple[int, int]  # modification time and size of the .jack file
+    vm_code: list[str]
+
+
+@dataclass
+class Program:
+    classes: dict[str, list[str]]  # the VM code the program was linked from
+    natives: set[str]  # OS functions linked to the native OS
+    machine_code: list[str]
+    symbols: dict[str, int]
+
+
+class Builder:
+    """Compiled classes and linked programs, by path and optimization."""
+
+    def __init__(self):
+        self.classes: dict[tuple[str, bool], CompiledClass] = {}
+        self.programs: dict[tuple[str, bool], Program] = {}
+
+    def compile_class(self, jack_file: str, optimize: bool) -> tuple[list[str], bool]:
+        """The VM code of `jack_file`, and whether it had to be compiled."""
+        info = os.stat(jack_file)
+        stamp = (info.st_mtime_ns, info.st_size)
+        cached = self.classes.get((jack_file, optimize))
+        if cached is not None and cached.stamp == stamp:
+            return cached.vm_code, False
+
+        output_stream = StringIO()
+        CompileEngine(tokenize(jack_file), output_stream, optimize)
+        vm_code = output_stream.getvalue().splitlines()
+        with open(os.path.splitext(jack_file)[0] + ".vm", "w", encoding="utf-8") as f:
+            f.write(output_stream.getvalue())
+        self.classes[jack_file, optimize] = CompiledClass(stamp, vm_code)
+        return vm_code, True
+
+    def build(self, directory: str, optimize: bool = False) -> tuple[Program, dict]:
+        start = time.perf_counter()
+        directory = os.path.abspath(directory)
+        jack_files = sorted(glob.glob(os.path.join(directory, "*.jack")))
+        if not jack_files:
+            raise ValueError(f"no .jack files in {directory}")
+
+        classes, compiled = {}, []
+        for jack_file in jack_files:
+            name = os.path.splitext(os.path.basename(jack_file))[0]
+            vm_code, changed = self.compile_class(jack_file, optimize)
+            classes[name] = clean(vm_code)
+            if changed:
+                compiled.append(name)
+
+        program = self.programs.get((directory, optimize))
+        linked = program is None or program.classes != classes
+        if linked:
+            program = self.programs[directory, optimize] = link(classes)
+        report = {
+            "compiled": compiled,
+            "linked": linked,
+            "instructions": len(program.machine_code),
+            "milliseconds": round(1000 * (time.perf_counter() - start), 1),
+        }
+        return program, report
+
+    def run(self, directory: str, optimize: bool = False, max_cycles: int = MAX_CYCLES, keys: str = "") -> dict:
+        program, report = self.build(directory, optimize)
+        start = time.perf_counter()
+        native = NativeOS([0] * 32768, [NEW_LINE if char == "\n" else ord(char) for char in keys])
+        natives = {name: function for name, function in native.functions().items() if name in program.natives}
+        emulator = Emulator(program.machine_code)
+        emulator.ram = native.ram
+        emulator.traps = native_traps(natives, program.symbols)
+        emulator.run_until_idle(max_cycles)
+        state = "halted" if emulator.halted else "idle" if emulator.idle else "still running"
+        return {
+            **report,
+            "output": native.get_output(),
+            "cycles": emulator.cycles,
+            "state": state,
+            "run_milliseconds": round(1000 * (time.perf_counter() - start), 1),
+        }
+
+    def handle(self, request: dict) -> dict:
+        command = request.get("command")
+        optimize = bool(request.get("optimize", False))
+        if command == "build":
+            return self.build(request["directory"], optimize)[1]
+        if command == "run":
+            return self.run(
+                request["directory"], optimize, int(request.get("max_cycles", MAX_CYCLES)), request.get("keys", "")
+            )
+        raise ValueError(f"unknown command {command!r}")
+
+
+def link(classes: dict[str, list[str]]) -> Program:
+    """Translates and assembles `classes`, with stubs for the OS functions they leave to the native OS."""
+    natives = set(natives_for(NativeOS([0] * 32768), classes))
+    files = {**classes, **stub_files(classes, natives)}
+    translator = VMTranslator()
+    translator.bootstrap()
+    for file_name, code in files.items():
+        translator.translate_file(file_name, code)
+    asm = translator.get_translated_code()
+    return Program(classes, natives, assemble_lines(asm), first_pass(cleanup_lines(asm)))
+
+
+async def serve(socket_path: str = SOCKET_PATH):
+    builder = Builder()
+    building = asyncio.Lock()  # the builder's caches are not shared between threads
+    stopped = asyncio.Event()
+    responding: set[asyncio.Task] = set()
+
+    async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        responding.add(task)
+        try:
+            await answer(reader, writer)
+        finally:
+            responding.discard(task)
+
+    async def answer(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        response: dict
+        try:
+            request = json.loads(await reader.readline())
+            if request.get("command") == "stop":
+                stopped.set()
+                response = {"ok": True}
+            else:
+                async with building:
+                    report = await asyncio.get_running_loop().run_in_executor(None, builder.handle, request)
+                response = {"ok": True, **report}
+        except Exception as error:
+            response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+        writer.close()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = await asyncio.start_unix_server(respond, socket_path)
+    print(f"Serving on {socket_path}", flush=True)
+    async with server:
+        await stopped.wait()
+        server.close()
+        if responding:
+            await asyncio.wait(set(responding))
+    os.remove(socket_path)
+
+
+def option(name: str, default: str) -> str:
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(option("--socket", SOCKET_PATH)))
@@ -0,0 +1,68 @@
+"""Checks the build server on copies of two project 9 programs.
+
+A second build of Square must compile nothing, a comment added to Main
+must only recompile Main, and a change to its code must also relink the
+program. Average must then run to the expected output.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from build_client import request
+from build_server import serve
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+KEYS = "3\n10\n20\n33\n"
+
+
+def append(file_name: str, text: str):
+    with open(file_name, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def check(socket_path: str, directory: str) -> bool:
+    square = os.path.join(directory, "square")
+    average = os.path.join(directory, "average")
+    first = request({"command": "build", "directory": square}, socket_path)
+    again = request({"command": "build", "directory": square}, socket_path)
+    main = os.path.join(square, "Main.jack")
+    append(main, "\n// a comment\n")
+    commented = request({"command": "build", "directory": square}, socket_path)
+    with open(main, "r", encoding="utf-8") as f:
+        code = f.read()
+    with open(main, "w", encoding="utf-8") as f:
+        f.write(code.replace("Square.new(10)", "Square.new(20)"))
+    changed = request({"command": "build", "directory": square}, socket_path)
+    ran = request({"command": "run", "directory": average, "keys": KEYS}, socket_path)
+    for name, response in (("first", first), ("again", again), ("commented", commented), ("changed", changed)):
+        print(
+            f"square, {name} build: compiled {response['compiled']}, "
+            f"linked {response['linked']}, {response['milliseconds']} ms"
+        )
+    print(f"average: {ran['output'].splitlines()[-1]!r}, {ran['state']} after {ran['cycles']} cycles")
+
+    return (
+        first["compiled"] == ["Main", "Square"]
+        and first["linked"]
+        and again["compiled"] == [] and not again["linked"]
+        and commented["compiled"] == ["Main"] and not commented["linked"]
+        and changed["compiled"] == ["Main"] and changed["linked"]
+        and ran["output"].endswith("The average is: 21") and ran["state"] == "halted"
+    )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        for program in ("square", "average"):
+            shutil.copytree(os.path.join(ROOT, "project-09", program), os.path.join(directory, program))
+        socket_path = os.path.join(directory, "build.sock")
+        threading.Thread(target=asyncio.run, args=(serve(socket_path),), daemon=True).start()
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+
+        error_found = not check(socket_path, directory)
+        request({"command": "stop"}, socket_path)
+    print("Error found" if error_found else "No errors found!")
@@ -0,0 +1,67 @@
+"""Checks the compiler against the committed VM files and on deep nesting.
+
+Every Jack file under files/ is compiled again, and its VM code must match
+the committed .vm file byte for byte. A class whose expressions nest DEPTH
+parentheses and DEPTH unary minuses deep must compile with the recursion
+limit at RECURSION_LIMIT, plain and optimized: plainly to one `neg` per
+minus, optimized with the pairs cancelled.
+"""
+
+import glob
+import os
+import sys
+from io import StringIO
+from compile_engine import CompileEngine
+from tokenizer import get_tokens, remove_comments, tokenize
+
+DEPTH = 3000
+RECURSION_LIMIT = 200
+
+DEEP = f"""
+class Main {{
+    function int main() {{
+        var int x;
+        let x = {"(" * DEPTH}1{")" * DEPTH};
+        let x = {"-" * DEPTH}x;
+        return x;
+    }}
+}}
+"""
+
+
+def check_files() -> bool:
+    same = True
+    for jack_file in sorted(glob.glob(os.path.join("files", "*", "*.jack"))):
+        output_stream = StringIO()
+        CompileEngine(tokenize(jack_file), output_stream)
+        with open(os.path.splitext(jack_file)[0] + ".vm", "r", encoding="utf-8") as f:
+            matches = output_stream.getvalue() == f.read()
+        print(f"  {jack_file}: {'same' if matches else 'DIFFERENT'}")
+        same = same and matches
+    return same
+
+
+def check_deep(optimize: bool) -> bool:
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    try:
+        output_stream = StringIO()
+        CompileEngine(get_tokens(remove_comments(DEEP)), output_stream, optimize)
+    except RecursionError:
+        print(f"  RecursionError at a recursion limit of {RECURSION_LIMIT}")
+        return False
+    finally:
+        sys.setrecursionlimit(limit)
+
+    negations = output_stream.getvalue().split("\n").count("neg")
+    print(f"  {'optimized' if optimize else 'plain'}: {negations} neg commands")
+    return negations == (0 if optimize else DEPTH)
+
+
+if __name__ == "__main__":
+    print("VM code of the test programs against the committed files:")
+    error_found = not check_files()
+    print("Deeply nested expressions:")
+    error_found = not check_deep(False) or error_found
+    error_found = not check_deep(True) or error_found
+    print("Error found" if error_found else "No errors found!")
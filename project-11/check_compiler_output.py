@@ -0,0 +1,464 @@
+"""Checks that the compiler's options do not change what programs print.
+
+Every program is compiled in each mode of MODES, then run on the VM
+interpreter and on the emulator with the native OS of project 8. The text
+a program prints must be the same in every mode and on both machines. The
+programs are those of project 9, the compiler test programs in files/, and
+the classes below, written to exercise the options:
+
+- FOLDING prints constant expressions at the edges of 16-bit arithmetic,
+  which the optimizer folds unless the VM would compute them differently,
+  and multiplications and identities of a variable, which it strength
+  reduces, for variables at those edges too.
+- STRINGS prints the same literals many times, from two classes that both
+  have statics of their own, so pooled literals are cached in slots after
+  the declared statics and must not clash with them or between classes.
+- LOOPS has while loops on comparisons, which the optimizer rotates, and on
+  `~`, `&`, `|` and plain integer conditions, whose `~` it folds into the
+  exit branch; and if statements whose then branch returns, with and
+  without else, where it leaves out the jump to the end.
+- ARRAYS reads and stores array elements where the optimizer may reuse the
+  address in pointer 1: nested accesses like `a[a[i]]`, stores through
+  another variable holding the same array, and calls between two accesses
+  that change the variables an address reads or the elements themselves.
+
+Programs that keep running, like square waiting for keys, are not compared.
+"""
+
+import glob
+import os
+import sys
+from io import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-06"))
+sys.path.append(os.path.join(ROOT, "project-08"))
+
+from assembler import assemble_lines, cleanup_lines, first_pass
+from compile_engine import CompileEngine
+from emulator import Emulator
+from native_os import NativeOS, native_traps, natives_for, stub_files
+from tokenizer import get_tokens, remove_comments
+from vm_interpreter import VMInterpreter
+from vm_translator import VMTranslator
+
+MODES = {
+    "plain": {},
+    "pooled strings": {"pool_strings": True},
+    "optimized": {"optimize": True},
+    "optimized with pooled strings": {"optimize": True, "pool_strings": True},
+}
+MAX_STEPS = 200_000  # VM commands
+CYCLES_PER_COMMAND = 20  # about, so the emulator gets as far as the interpreter
+KEYS = [ord(char) for char in "3\n10\n20\n33\n".replace("\n", "\x80")]  # for the average programs
+
+FOLDING = {
+    "Main": """
+class Main {
+    function void main() {
+        var Array values;
+        var int i, x;
+        do Main.print((-32767 - 1) / -1);
+        do Main.print((-32767 - 1) / 2);
+        do Main.print(-5 / 2);
+        do Main.print(5 / -2);
+        do Main.print(32767 + 1);
+        do Main.print(300 * 300);
+        do Main.print(-300 * 200);
+        do Main.print(32767 - (-1) < 0);
+        do Main.print(32767 > -1);
+        do Main.print((-32767 - 1) < 1);
+        do Main.print(~(7 = 7) | (3 & 5));
+        let values = Array.new(7);
+        let values[0] = -32767 - 1;
+        let values[1] = -1;
+        let values[2] = 0;
+        let values[3] = 1;
+        let values[4] = 7;
+        let values[5] = 12345;
+        let values[6] = 32767;
+        while (i < 7) {
+            let x = values[i];
+            do Output.printChar(124);
+            do Main.print(x * (-32767 - 1));
+            do Main.print(x * 7);
+            do Main.print(x * 8);
+            do Main.print(x * -9);
+            do Main.print(x * 0);
+            do Main.print(x * 1);
+            do Main.print(x * 255);
+            do Main.print((x * 3) + (x * 5));
+            do Main.print((x / 1) + (x - 0) + (x & -1) + (x | 0) + (0 + x));
+            do Main.print(x < -32767);
+            let i = i + 1;
+        }
+        return;
+    }
+
+    function void print(int value) {
+        do Output.printInt(value);
+        do Output.printChar(32);
+        return;
+    }
+}
+""",
+}
+
+STRINGS = {
+    "Main": """
+class Main {
+    static int count;
+    static String title;
+
+    function void main() {
+        var int i;
+        var String s;
+        let count = 5;
+        let title = "pool";
+        while (i < 3) {
+            do Output.printString("round ");
+            do Output.printInt(i);
+            do Output.printString(title);
+            let s = "round ";
+            do Output.printInt(s.length() + count);
+            do Main.show("x");
+            do Other.greet(i);
+            let i = i + 1;
+        }
+        do Output.printString("");
+        do Output.printInt(count);
+        do Output.printString(title);
+        return;
+    }
+
+    function void show(String text) {
+        do Output.printString(text);
+        do Output.printString("x");
+        do Output.printString("round ");
+        return;
+    }
+}
+""",
+    "Other": """
+class Other {
+    static int calls, total;
+
+    function void greet(int i) {
+        let calls = calls + 1;
+        let total = total + i;
+        do Output.printString("hi");
+        do Output.printString("pool");
+        do Output.printInt(calls + total);
+        do Output.printString("hi");
+        return;
+    }
+}
+""",
+}
+
+LOOPS = {
+    "Main": """
+class Main {
+    function void main() {
+        var int i, j, n;
+        while (i < 4) {
+            let j = 0;
+            while (~(j > i)) {
+                do Output.printInt(j);
+                let j = j + 1;
+            }
+            do Output.printChar(44);
+            let i = i + 1;
+        }
+        while (false) {
+            do Output.printString("never");
+        }
+        let i = 0;
+        while ((i < 10) & ~(i = 6)) {
+            let i = i + 1;
+        }
+        do Main.print(i);
+        while ((i = 6) | (i < 9)) {
+            let i = i + 1;
+        }
+        do Main.print(i);
+        let n = 3;
+        while (n) {
+            let n = n - 1;
+        }
+        do Main.print(n);
+        let n = -1;
+        while (n) {
+            let n = n + 1;
+        }
+        do Main.print(n);
+        let n = 0;
+        while (~n) {
+            let n = n + 1;
+        }
+        do Main.print(n);
+        do Main.print(Main.find(7));
+        do Main.print(Main.find(20));
+        let i = -2;
+        while (i < 3) {
+            do Main.print(Main.sign(i));
+            do Main.print(Main.clamp(i * 3));
+            do Main.print(Main.parity(i));
+            let i = i + 1;
+        }
+        return;
+    }
+
+    function void print(int value) {
+        do Output.printInt(value);
+        do Output.printChar(32);
+        return;
+    }
+
+    /** The first power of two above limit, or -1 past 16. */
+    function int find(int limit) {
+        var int power;
+        let power = 1;
+        while (true) {
+            if (power > limit) {
+                return power;
+            }
+            let power = power + power;
+            if (power > 16) {
+                return -1;
+            }
+        }
+        return 0;
+    }
+
+    function int sign(int x) {
+        if (x < 0) {
+            return -1;
+        } else {
+            if (x = 0) {
+                return 0;
+            }
+        }
+        return 1;
+    }
+
+    function int clamp(int x) {
+        if (x > 3) {
+            return 3;
+        }
+        if (~(x > -3)) {
+            let x = -3;
+        } else {
+            let x = x + 1;
+        }
+        return x;
+    }
+
+    function int parity(int x) {
+        var int result;
+        if (x & 1) {
+            let result = 1;
+        } else {
+            return 0;
+        }
+        let result = result + 10;
+        return result;
+    }
+}
+""",
+}
+
+ARRAYS = {
+    "Main": """
+class Main {
+    static Array s;
+    static int k;
+
+    function void main() {
+        var Array a, b;
+        var int i, x;
+        var Stack stack;
+        let a = Array.new(8);
+        while (i < 8) {
+            let a[i] = 7 - i;
+            let i = i + 1;
+        }
+        do Main.print(a[a[2]]);
+        let a[a[1]] = a[a[1]] + 10;
+        let i = 3;
+        do Main.print(a[a[i] - 1]);
+        let a[i] = a[i] + a[i];
+        let a[a[0] - 7] = a[a[0]] + a[a[7]];
+
+        let b = a;
+        let x = a[i];
+        let b[i] = 99;
+        do Main.print(a[i] + x);
+        let b[2] = a[2] * 2;
+        let a[i] = b[i] + 1;
+        let b = b + 1;
+        let b[i] = a[i] + b[i];
+
+        let s = a;
+        let k = 1;
+        let x = s[k];
+        do Main.bump();
+        do Main.print(s[k] + x);
+        let x = a[i];
+        do Main.poke(a, i);
+        do Main.print(a[i] - x);
+        let x = s[k] + Main.next() + s[k];
+        do Main.print(x);
+        let a[k] = Main.next();
+        do Main.print(a[k - 1] + a[k]);
+        let s[Main.next()] = s[k];
+        do Main.print(a[k - 2]);
+        let a[Main.next()] = a[k] + Main.next();
+
+        let stack = Stack.new(a);
+        do stack.push(5);
+        do stack.push(6);
+        do Main.print(stack.pop() + stack.pop());
+        do Main.print(stack.pushBetween(9));
+        do Main.print(stack.swap());
+
+        let i = 0;
+        while (i < 8) {
+            do Main.print(a[i]);
+            let i = i + 1;
+        }
+        return;
+    }
+
+    function void print(int value) {
+        do Output.printInt(value);
+        do Output.printChar(32);
+        return;
+    }
+
+    function void bump() {
+        let k = k + 1;
+        return;
+    }
+
+    function int next() {
+        let k = k + 1;
+        return k - 2;
+    }
+
+    function void poke(Array c, int j) {
+        let c[j] = c[j] + s[j];
+        let s[j - 1] = c[j];
+        return;
+    }
+}
+""",
+    "Stack": """
+class Stack {
+    field Array items;
+    field int top;
+
+    constructor Stack new(Array storage) {
+        let items = storage;
+        return this;
+    }
+
+    method void push(int value) {
+        let items[top] = value;
+        let top = top + 1;
+        return;
+    }
+
+    method int pop() {
+        let top = top - 1;
+        return items[top];
+    }
+
+    /** Pushes value, then adds the item it replaced and the one above it. */
+    method int pushBetween(int value) {
+        var int replaced;
+        let replaced = items[top];
+        do push(value);
+        return replaced + items[top];
+    }
+
+    /** Swaps the items at top and above it, then returns their difference. */
+    method int swap() {
+        var int first;
+        let first = items[top];
+        let items[top] = items[top + 1];
+        let items[top + 1] = first;
+        return items[top] - items[top + 1];
+    }
+}
+""",
+}
+
+
+def compile_class(code: str, options: dict) -> list[str]:
+    output_stream = StringIO()
+    CompileEngine(get_tokens(remove_comments(code)), output_stream, **options)
+    return output_stream.getvalue().splitlines()
+
+
+def read_programs() -> dict[str, dict[str, str]]:
+    """Jack source by class name, for every program."""
+    programs = {"FOLDING": FOLDING, "STRINGS": STRINGS, "LOOPS": LOOPS, "ARRAYS": ARRAYS}
+    for pattern in ("project-09/*", "project-11/files/*"):
+        for directory in sorted(glob.glob(os.path.join(ROOT, pattern))):
+            classes = {}
+            for jack_file in sorted(glob.glob(os.path.join(directory, "*.jack"))):
+                with open(jack_file, "r", encoding="utf-8") as f:
+                    classes[os.path.splitext(os.path.basename(jack_file))[0]] = f.read()
+            if classes:
+                programs[os.path.relpath(directory, ROOT).replace(os.sep, "/")] = classes
+    return programs
+
+
+def interpret(files: dict[str, list[str]]) -> tuple[str, bool]:
+    native = NativeOS([0] * 32768, KEYS)
+    natives = natives_for(native, files)
+    interpreter = VMInterpreter({**files, **stub_files(files, natives)}, natives, native.ram)
+    interpreter.bootstrap()
+    interpreter.run(MAX_STEPS)
+    return native.get_output(), interpreter.halted
+
+
+def emulate(files: dict[str, list[str]]) -> tuple[str, bool]:
+    native = NativeOS([0] * 32768, KEYS)
+    natives = natives_for(native, files)
+    translator = VMTranslator()
+    translator.bootstrap()
+    for file_name, code in {**files, **stub_files(files, natives)}.items():
+        translator.translate_file(file_name, code)
+    asm = translator.get_translated_code()
+
+    emulator = Emulator(assemble_lines(asm))
+    emulator.ram = native.ram
+    emulator.traps = native_traps(natives, first_pass(cleanup_lines(asm)))
+    emulator.run(MAX_STEPS * CYCLES_PER_COMMAND)
+    return native.get_output(), emulator.halted
+
+
+def check(name: str, classes: dict[str, str]) -> bool:
+    runs = {}
+    for mode, options in MODES.items():
+        files = {class_name: compile_class(code, options) for class_name, code in classes.items()}
+        for machine in (interpret, emulate):
+            runs[mode, machine.__name__] = machine(files)
+
+    if not any(halted for _, halted in runs.values()):
+        print(f"  {name}: still running, not compared")
+        return True
+    expected = runs["plain", "interpret"]
+    different = [f"{mode} on {machine}" for (mode, machine), run in runs.items() if run != expected]
+    print(f"  {name}: {expected[0]!r}" + (f", differs with {', '.join(different)}" if different else ""))
+    return not different
+
+
+if __name__ == "__main__":
+    print(f"Output in modes {', '.join(MODES)}:")
+    error_found = False
+    for name, classes in read_programs().items():
+        error_found = not check(name, classes) or error_found
+    print("Error found" if error_found else "No errors found!")
@@ -0,0 +1,101 @@
+"""Profiles a small Jack program through compiler, VM translator, assembler and emulator.
+
+The program spends nearly all its time in the loop of Main.multiply, so the
+source maps must charge most cycles to that function and its three lines.
+"""
+
+import os
+import sys
+from io import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "project-08"))
+sys.path.append(os.path.join(ROOT, "project-06"))
+
+from assembler import assemble_lines, source_map as rom_source_map
+from compile_engine import CompileEngine
+from emulator import Emulator
+from profiler import SourceMap, attribute, print_report, sample
+from tokenizer import get_tokens, remove_comments
+from vm_translator import VMTranslator, source_map as asm_source_map
+
+MAX_CYCLES = 100_000  # Main.main takes longer, so the idle loop of Sys.init never runs
+
+CLASSES = {
+    "Sys": """
+class Sys {
+    function void init() {
+        do Main.main();
+        while (true) {}
+        return;
+    }
+}
+""",
+    "Main": """
+class Main {
+    static int result;
+
+    function void main() {
+        var int i;
+        let i = 0;
+        while (i < 40) {
+            let result = result + Main.multiply(i, 200);
+            let i = i + 1;
+        }
+        return;
+    }
+
+    /** Repeated addition, so the loop below is where the time goes. */
+    function int multiply(int x, int y) {
+        var int sum;
+        while (y > 0) {
+            let sum = sum + x;
+            let y = y - 1;
+        }
+        return sum;
+    }
+}
+""",
+}
+HOT_LINES = {18, 19, 20}  # the loop of Main.multiply
+
+
+def profile(optimize: bool):
+    translator = VMTranslator(optimize)
+    translator.bootstrap()
+    files, vm_rows = {}, {}
+    for class_name, code in CLASSES.items():
+        output_stream = StringIO()
+        engine = CompileEngine(get_tokens(remove_comments(code)), output_stream, optimize)
+        files[class_name] = output_stream.getvalue().splitlines()
+        vm_rows[class_name] = [
+            f"{vm_line} {jack_line} {jack_column}"
+            for vm_line, (jack_line, jack_column) in enumerate(engine.vm_writer.source_map, start=1)
+        ]
+    translator.translate_files(files)
+
+    asm = translator.get_translated_code()
+    locations = SourceMap(rom_source_map(asm), asm_source_map(asm, translator), vm_rows)
+    emulator = Emulator(assemble_lines(asm))
+    return attribute(sample(emulator, MAX_CYCLES), locations)
+
+
+def main():
+    sources = {class_name: code.split("\n") for class_name, code in CLASSES.items()}
+    error_found = False
+
+    for optimize in (False, True):
+        print("Optimized:" if optimize else "Not optimized:")
+        by_line, by_function = profile(optimize)
+        print_report(by_line, by_function, sources, top=5)
+
+        total = sum(by_function.values())
+        hot = sum(by_line["Main", jack_line] for jack_line in HOT_LINES)
+        if by_function.most_common(1)[0][0] != "Main.multiply" or hot < 0.9 * total:
+            error_found = True
+
+    print("Error found" if error_found else "No errors found!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,65 @@
-from io import TextIOWrapper
+from dataclasses import dataclass
+from io import StringIO, TextIOWrapper
 from typing import Optional
+from expression_optimizer import ExpressionOptimizer
 from symbol_table import SymbolTable
 from tokenizer import Token, TokenType
-from vm_writer import VMWriter
+from vm_writer import Position, VMWriter
+
+BINARY_OPERATORS = {
+    "+": "add",
+    "-": "sub",
+    "&": "and",
+    "|": "or",
+    "<": "lt",
+    ">": "gt",
+    "=": "eq",
+    "*": "Math.multiply",
+    "/": "Math.divide",
+}
+UNARY_OPERATORS = {"-": "neg", "~": "not"}
+BOOLEAN_OPERATORS = {"<", ">", "="}
+
+
+@dataclass
+class Frame:
+    """A partially compiled construct waiting on the expression stack."""
+
+    kind: str  # expression, unary, group, index or call
+    operator: Optional[str] = None
+    callee: str = ""
+    n_args: int = 0
+    boolean: bool = False  # left operand of `operator` is known to be true or false
 
 
 class CompileEngine:
-    def __init__(self, tokens: list[Token], output_stream: TextIOWrapper):
+    def __init__(
+        self,
+        tokens: list[Token],
+        output_stream: TextIOWrapper,
+        optimize: bool = False,
+        pool_strings: bool = False,
+    ):
+        """Compiles `tokens` to VM code on `output_stream`.
+
+        With `optimize`, the code goes through an ExpressionOptimizer that folds
+        constant subexpressions and strength-reduces multiplications, and if and
+        while statements get tighter branch layouts.
+
+        With `pool_strings`, every distinct string literal of the class is built
+        once, on first use, and cached in a hidden static variable. Later uses
+        push the cached String, so programs must not modify or dispose literals.
+        """
         self.tokens = iter(tokens)
         self.current_token: Token
         self.class_name = "NO_CLASS_NAME"
         self.symbol_table = SymbolTable()
-        self.vm_writer = VMWriter(output_stream)
+        self.vm_writer = ExpressionOptimizer(output_stream) if optimize else VMWriter(output_stream)
         self.label_counter: int = 0
+        self.optimize = optimize
+        self.pool_strings = pool_strings
+        self.string_pool: dict[str, int] = {}  # literal -> pool index
+        self.string_uses: list[str] = []
         self.compile()
 
     # -----------------------------------
@@ -55,6 +102,10 @@ class CompileEngine:
         self.advance()
         return token.value
 
+    def mark_position(self):
+        """Attributes the commands written from here on to the current token."""
+        self.vm_writer.position = (self.current_token.line, self.current_token.column)
+
     def generate_label(self, label: str) -> str:
         label = f"{label}_{self.label_counter}"
         self.label_counter += 1
@@ -67,6 +118,7 @@ class CompileEngine:
     def compile(self):
         self.advance()
         self.compile_class()
+        self.vm_writer.flush()
 
     # -----------------------------------
     # Class
@@ -84,8 +136,12 @@ class CompileEngine:
         while self.current_token.value in ("constructor", "function", "method"):
             self.compile_class_subroutine()
 
+        self.mark_position()  # pooled string builders belong to the class
         self.expect(TokenType.SYMBOL, "}")
 
+        if self.string_pool:
+            self.compile_string_pool()
+
     # -----------------------------------
     # Variable & Parameter Declarations
     # -----------------------------------
@@ -139,6 +195,7 @@ class CompileEngine:
     def compile_class_subroutine(self):
         self.symbol_table.start_subroutine()
 
+        self.mark_position()
         subroutine_type = self.expect(TokenType.KEYWORD)  # constructor, function, method
 
         if subroutine_type == "method":
@@ -170,15 +227,15 @@ class CompileEngine:
         self.compile_statements()
         self.expect(TokenType.SYMBOL, "}")
 
-    def compile_subroutine_call(self, identifier: Optional[str] = None):
+    def compile_callee(self, identifier: str) -> tuple[str, int]:
         """
-        Handles subroutine calls in two forms:
-        1. subroutineName(expressionList)
-        2. (className | varName).subroutineName(expressionList)
+        Resolves the callee of a subroutine call whose first identifier has been read:
+        1. subroutineName
+        2. (className | varName).subroutineName
         For method calls on objects (when varName is found in the symbol table),
         pushes the object pointer and adjusts the subroutine name to use the object's type.
+        Returns the full callee name and the number of arguments pushed so far.
         """
-        identifier = identifier or self.expect(TokenType.IDENTIFIER)
         n_args = 0
 
         if self.current_token.value == ".":
@@ -196,6 +253,13 @@ class CompileEngine:
             n_args += 1
             callee = f"{self.class_name}.{identifier}"
 
+        return callee, n_args
+
+    def compile_subroutine_call(self, identifier: Optional[str] = None):
+        """Compiles a subroutine call: callee, (expressionList) and the call itself."""
+        identifier = identifier or self.expect(TokenType.IDENTIFIER)
+        callee, n_args = self.compile_callee(identifier)
+
         self.expect(TokenType.SYMBOL, "(")
         n_args += self.compile_expression_list()
         self.expect(TokenType.SYMBOL, ")")
@@ -216,58 +280,120 @@ class CompileEngine:
             expression_count += 1
         return expression_count
 
-    def compile_expression(self):
-        self.compile_term()
-        while self.current_token.value in ("+", "-", "*", "/", "&", "|", "<", ">", "="):
-            op = self.expect(TokenType.SYMBOL)
-            self.compile_term()
-            if op == "+":
+    def write_operator(self, command: str):
+        if "." in command:
+            self.vm_writer.write_call(command, 2)
+        else:
+            self.vm_writer.write_arithmetic(command)
+
+    def compile_expression(self, condition: bool = False) -> tuple[bool, bool]:
+        """
+        Compiles an expression.
+
+        Jack gives every binary operator the same precedence and associates left
+        to right, so each operator is written as soon as its right-hand term is
+        complete. Nested expressions and unary chains are kept on an explicit
+        frame stack rather than the Python call stack, so nesting depth is not
+        limited by recursion.
+
+        Returns (boolean, negated). `boolean` tells whether the value is known to
+        be true (-1) or false (0). With `condition`, a `~` applied to the whole
+        expression is not written; `negated` reports it so the caller can fold it
+        into the sense of its branch.
+        """
+        stack = [Frame("expression")]
+        boolean: Optional[bool] = None  # set once the current term is complete
+        negated = False
+
+        while True:
+            if boolean is None:
+                boolean = self.start_term(stack)
+                continue
+
+            frame = stack[-1]
+
+            if frame.kind == "unary":
+                stack.pop()
+                if frame.operator == "-":
+                    boolean = False
+                if condition and frame.operator == "~" and len(stack) == 1 and not stack[0].operator:
+                    negated = True
+                else:
+                    self.vm_writer.write_arithmetic(UNARY_OPERATORS[frame.operator])  # type: ignore
+                continue
+
+            # frame.kind == "expression"
+            if frame.operator:
+                self.write_operator(BINARY_OPERATORS[frame.operator])
+                boolean = frame.operator in BOOLEAN_OPERATORS or (
+                    frame.operator in ("&", "|") and frame.boolean and boolean
+                )
+
+            if self.current_token.value in BINARY_OPERATORS:
+                if negated:
+                    self.vm_writer.write_arithmetic("not")
+                    negated = False
+                frame.operator = self.expect(TokenType.SYMBOL)
+                frame.boolean = boolean
+                boolean = None
+                continue
+
+            stack.pop()
+            if not stack:
+                return boolean, negated
+
+            parent = stack.pop()
+
+            if parent.kind == "call":
+                parent.n_args += 1
+                if self.current_token.value == ",":
+                    self.expect(TokenType.SYMBOL, ",")
+                    stack.append(parent)
+                    stack.append(Frame("expression"))
+                    boolean = None
+                    continue
+                self.expect(TokenType.SYMBOL, ")")
+                self.vm_writer.write_call(parent.callee, parent.n_args)
+                boolean = False
+            elif parent.kind == "index":
+                self.expect(TokenType.SYMBOL, "]")
                 self.vm_writer.write_arithmetic("add")
-            elif op == "-":
-                self.vm_writer.write_arithmetic("sub")
-            elif op == "*":
-                self.vm_writer.write_call("Math.multiply", 2)
-            elif op == "/":
-                self.vm_writer.write_call("Math.divide", 2)
-            elif op == "&":
-                self.vm_writer.write_arithmetic("and")
-            elif op == "|":
-                self.vm_writer.write_arithmetic("or")
-            elif op == "<":
-                self.vm_writer.write_arithmetic("lt")
-            elif op == ">":
-                self.vm_writer.write_arithmetic("gt")
-            elif op == "=":
-                self.vm_writer.write_arithmetic("eq")
-
-    def compile_term(self):
+                self.vm_writer.write_pop("pointer", 1)
+                self.vm_writer.write_push("that", 0)
+                boolean = False
+            else:
+                self.expect(TokenType.SYMBOL, ")")
+
+    def start_term(self, stack: list[Frame]) -> Optional[bool]:
+        """
+        Starts a term. Returns None when the term opens a nested expression or a
+        unary operand; the pending term is then pushed on `stack` and completed
+        by `compile_expression`. Otherwise the term is complete and the result
+        tells whether its value is known to be true or false.
+        """
         if self.current_token.type == TokenType.INTEGER_CONSTANT:
             number = self.expect(TokenType.INTEGER_CONSTANT)
             self.vm_writer.write_push("constant", int(number))
-            return
+            return False
 
         if self.current_token.type == TokenType.STRING_CONSTANT:
             string = self.expect(TokenType.STRING_CONSTANT)
-            self.vm_writer.write_push("constant", len(string))
-            self.vm_writer.write_call("String.new", 1)
-            for char in string:
-                self.vm_writer.write_push("constant", ord(char))
-                self.vm_writer.write_call("String.appendChar", 2)
-            return
+            if self.pool_strings:
+                self.compile_pooled_string(string)
+            else:
+                self.compile_string(string)
+            return False
 
         if self.current_token.type == TokenType.KEYWORD:
             keyword = self.expect(TokenType.KEYWORD)
             if keyword == "true":
                 self.vm_writer.write_push("constant", 1)
                 self.vm_writer.write_arithmetic("neg")
-                return
-            if keyword in ("false", "null"):
+            elif keyword in ("false", "null"):
                 self.vm_writer.write_push("constant", 0)
-                return
-            if keyword == "this":
+            elif keyword == "this":
                 self.vm_writer.write_push("pointer", 0)
-                return
-            return
+            return keyword in ("true", "false", "null")
 
         if self.current_token.type == TokenType.IDENTIFIER:
             identifier = self.expect(TokenType.IDENTIFIER)
@@ -275,42 +401,95 @@ class CompileEngine:
                 symbol = self.symbol_table.get(identifier)
                 self.vm_writer.write_push(self.kind_to_segment(symbol.kind), symbol.index)
                 self.expect(TokenType.SYMBOL, "[")
-                self.compile_expression()
-                self.expect(TokenType.SYMBOL, "]")
-                self.vm_writer.write_arithmetic("add")
-                self.vm_writer.write_pop("pointer", 1)
-                self.vm_writer.write_push("that", 0)
-                return
+                stack.append(Frame("index"))
+                stack.append(Frame("expression"))
+                return None
             if self.current_token.value in ("(", "."):
-                self.compile_subroutine_call(identifier)
-                return
+                callee, n_args = self.compile_callee(identifier)
+                self.expect(TokenType.SYMBOL, "(")
+                if self.current_token.value == ")":
+                    self.expect(TokenType.SYMBOL, ")")
+                    self.vm_writer.write_call(callee, n_args)
+                    return False
+                stack.append(Frame("call", callee=callee, n_args=n_args))
+                stack.append(Frame("expression"))
+                return None
             symbol = self.symbol_table.get(identifier)
             self.vm_writer.write_push(self.kind_to_segment(symbol.kind), symbol.index)
-            return
+            return False
 
         if self.current_token.value == "(":
             self.expect(TokenType.SYMBOL, "(")
-            self.compile_expression()
-            self.expect(TokenType.SYMBOL, ")")
-            return
+            stack.append(Frame("group"))
+            stack.append(Frame("expression"))
+            return None
 
-        if self.current_token.value in ("-", "~"):
-            op = self.expect(TokenType.SYMBOL)
-            self.compile_term()
-            if op == "-":
-                self.vm_writer.write_arithmetic("neg")
-            else:
-                self.vm_writer.write_arithmetic("not")
-            return
+        if self.current_token.value in UNARY_OPERATORS:
+            stack.append(Frame("unary", operator=self.expect(TokenType.SYMBOL)))
+            return None
 
         raise Exception(f"Unexpected term: {self.current_token}")
 
+    def compile_string(self, string: str):
+        self.vm_writer.write_push("constant", len(string))
+        self.vm_writer.write_call("String.new", 1)
+        for char in string:
+            self.vm_writer.write_push("constant", ord(char))
+            self.vm_writer.write_call("String.appendChar", 2)
+
+    # -----------------------------------
+    # String Pooling
+    # -----------------------------------
+
+    def string_pool_slot(self, index: int) -> int:
+        """Static index of a pooled literal, placed after the declared statics."""
+        return self.symbol_table.var_count("static") + index
+
+    def string_builder_name(self, index: int) -> str:
+        return f"{self.class_name}.__string_{index}"
+
+    def compile_pooled_string(self, string: str):
+        """Pushes the cached String for `string`, building it on first use."""
+        index = self.string_pool.setdefault(string, len(self.string_pool))
+        self.string_uses.append(string)
+
+        ready_label = self.generate_label(f"{self.class_name.upper()}_STRING_READY")
+        slot = self.string_pool_slot(index)
+        self.vm_writer.write_push("static", slot)
+        self.vm_writer.write_if(ready_label)
+        self.vm_writer.write_call(self.string_builder_name(index), 0)
+        self.vm_writer.write_pop("static", slot)
+        self.vm_writer.write_label(ready_label)
+        self.vm_writer.write_push("static", slot)
+
+    def compile_string_pool(self):
+        """Writes one hidden function per pooled literal that builds and returns it."""
+        for string, index in self.string_pool.items():
+            self.vm_writer.write_function(self.string_builder_name(index), 0)
+            self.compile_string(string)
+            self.vm_writer.write_return()
+
+    def string_pool_report(self) -> str:
+        """Summarises the static size and per-pass call savings of string pooling."""
+        unpooled = sum(2 + 2 * len(string) for string in self.string_uses)
+        pooled = 6 * len(self.string_uses) + sum(4 + 2 * len(string) for string in self.string_pool)
+        calls_saved = sum(1 + len(string) for string in self.string_uses)
+        return (
+            f"{len(self.string_uses)} string literals ({len(self.string_pool)} distinct), "
+            f"{unpooled} -> {pooled} VM commands, "
+            f"{calls_saved} String calls saved per pass once built"
+        )
+
     # -----------------------------------
     # Statement Parsing
     # -----------------------------------
 
-    def compile_statements(self):
+    def compile_statements(self) -> bool:
+        """Compiles a sequence of statements. Returns True if the last one is a return."""
+        ends_with_return = False
         while self.current_token.value in ("let", "if", "while", "do", "return"):
+            ends_with_return = self.current_token.value == "return"
+            self.mark_position()
             match self.current_token.value:
                 case "let":
                     self.compile_let_statement()
@@ -324,6 +503,7 @@ class CompileEngine:
                     self.compile_return_statement()
                 case _:
                     raise ValueError(f"Unexpected statement: {self.current_token}")
+        return ends_with_return
 
     def compile_let_statement(self):
         self.expect(TokenType.KEYWORD, "let")
@@ -348,29 +528,68 @@ class CompileEngine:
             symbol = self.symbol_table.get(var_name)
             self.vm_writer.write_pop(self.kind_to_segment(symbol.kind), symbol.index)
 
+    def write_jump_unless_true(self, negated: bool, label: str):
+        """
+        Jumps to `label` unless the condition on the stack is true (-1). A
+        condition whose final `~` was left unwritten is tested directly, since
+        `not not x` is `x`.
+        """
+        if not negated:
+            self.vm_writer.write_arithmetic("not")
+        self.vm_writer.write_if(label)
+
+    def capture_condition(self) -> tuple[str, list[Position], bool, bool]:
+        """Compiles a condition into a string, so it can be written after the loop body."""
+        self.vm_writer.flush()
+        self.vm_writer.start_block()
+        output_stream, source_map = self.vm_writer.output_stream, self.vm_writer.source_map
+        self.vm_writer.output_stream = StringIO()  # type: ignore
+        self.vm_writer.source_map = []
+        boolean, negated = self.compile_expression(condition=True)
+        self.vm_writer.flush()
+        code = self.vm_writer.output_stream.getvalue()  # type: ignore
+        condition_map = self.vm_writer.source_map
+        self.vm_writer.output_stream, self.vm_writer.source_map = output_stream, source_map
+        return code, condition_map, boolean, negated
+
     def compile_if_statement(self):
+        """
+        Compiles an if statement. When optimizing, an if without else gets no
+        jump over the (missing) else branch, and no jump is written after a then
+        branch that ends with a return.
+        """
+        position = self.vm_writer.position
         self.expect(TokenType.KEYWORD, "if")
         if_label_start = self.generate_label(f"{self.class_name.upper()}_IF_START")
         if_label_end = self.generate_label(f"{self.class_name.upper()}_IF_END")
         self.expect(TokenType.SYMBOL, "(")
-        self.compile_expression()
+        _, negated = self.compile_expression(condition=self.optimize)
         self.expect(TokenType.SYMBOL, ")")
-        self.vm_writer.write_arithmetic("not")
-        self.vm_writer.write_if(if_label_start)
+        self.write_jump_unless_true(negated, if_label_start)
         self.expect(TokenType.SYMBOL, "{")
-        self.compile_statements()
+        ends_with_return = self.compile_statements()
+        self.vm_writer.position = position
         self.expect(TokenType.SYMBOL, "}")
-        self.vm_writer.write_goto(if_label_end)
+        has_else = self.current_token.value == "else"
+        jump_to_end = not self.optimize or (has_else and not ends_with_return)
+        if jump_to_end:
+            self.vm_writer.write_goto(if_label_end)
         self.vm_writer.write_label(if_label_start)
-        if self.current_token.value == "else":
+        if has_else:
             self.expect(TokenType.KEYWORD, "else")
             self.expect(TokenType.SYMBOL, "{")
             self.compile_statements()
+            self.vm_writer.position = position
             self.expect(TokenType.SYMBOL, "}")
-        self.vm_writer.write_label(if_label_end)
+        if jump_to_end:
+            self.vm_writer.write_label(if_label_end)
 
     def compile_while_statement(self):
+        position = self.vm_writer.position
         self.expect(TokenType.KEYWORD, "while")
+        if self.optimize:
+            self.compile_optimized_while_statement()
+            return
         while_label_start = self.generate_label(f"{self.class_name.upper()}_WHILE_START")
         while_label_end = self.generate_label(f"{self.class_name.upper()}_WHILE_END")
         self.vm_writer.write_label(while_label_start)
@@ -381,10 +600,52 @@ class CompileEngine:
         self.vm_writer.write_if(while_label_end)
         self.expect(TokenType.SYMBOL, "{")
         self.compile_statements()
+        self.vm_writer.position = position
         self.expect(TokenType.SYMBOL, "}")
         self.vm_writer.write_goto(while_label_start)
         self.vm_writer.write_label(while_label_end)
 
+    def compile_optimized_while_statement(self):
+        """
+        Compiles a while statement with the test at the bottom of the loop:
+
+            goto TEST; label BODY; body; label TEST; condition; if-goto BODY
+
+        so each iteration takes a single jump. `if-goto` treats any non-zero
+        value as true while the plain layout only continues on -1, so rotation
+        is used only for conditions known to be true or false. Other loops keep
+        the test at the top, with a final `~` folded into the exit branch.
+        """
+        label_base = f"{self.class_name.upper()}_WHILE"
+        position = self.vm_writer.position
+        self.expect(TokenType.SYMBOL, "(")
+        condition, condition_map, boolean, negated = self.capture_condition()
+        self.expect(TokenType.SYMBOL, ")")
+        self.expect(TokenType.SYMBOL, "{")
+
+        if boolean and not negated:
+            test_label = self.generate_label(f"{label_base}_TEST")
+            body_label = self.generate_label(f"{label_base}_BODY")
+            self.vm_writer.write_goto(test_label)
+            self.vm_writer.write_label(body_label)
+            self.compile_statements()
+            self.vm_writer.position = position
+            self.vm_writer.write_label(test_label)
+            self.vm_writer.write_code(condition, condition_map)
+            self.vm_writer.write_if(body_label)
+        else:
+            start_label = self.generate_label(f"{label_base}_START")
+            end_label = self.generate_label(f"{label_base}_END")
+            self.vm_writer.write_label(start_label)
+            self.vm_writer.write_code(condition, condition_map)
+            self.write_jump_unless_true(negated, end_label)
+            self.compile_statements()
+            self.vm_writer.position = position
+            self.vm_writer.write_goto(start_label)
+            self.vm_writer.write_label(end_label)
+
+        self.expect(TokenType.SYMBOL, "}")
+
     def compile_do_statement(self):
         self.expect(TokenType.KEYWORD, "do")
         self.compile_subroutine_call()
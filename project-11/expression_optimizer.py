@@ -0,0 +1,363 @@
+from io import TextIOWrapper
+from typing import Optional
+from vm_writer import Position, VMWriter
+
+MULTIPLY = "call Math.multiply 2"
+DIVIDE = "call Math.divide 2"
+
+BINARY_COMMANDS = {"add", "sub", "and", "or", "lt", "gt", "eq", MULTIPLY, DIVIDE}
+UNARY_COMMANDS = {"neg", "not"}
+
+# Commands that end a basic block; expressions never span them.
+BOUNDARY_COMMANDS = {"label", "goto", "if-goto", "function", "return"}
+
+# Segments of variables a pure array address may read.
+VARIABLE_SEGMENTS = {"local", "argument", "static", "this"}
+PURE_COMMANDS = (BINARY_COMMANDS - {MULTIPLY, DIVIDE}) | UNARY_COMMANDS
+
+ARRAY_STORE = ["pop temp 0", "pop pointer 1", "push temp 0", "pop that 0"]
+
+# Multiplications by constants that are not powers of two are only turned into
+# add chains when the chain needs at most this many additions.
+MAX_CHAIN_ADDS = 8
+
+
+def to_signed(value: int) -> int:
+    """Wraps `value` to a 16-bit two's complement integer."""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def stack_effect(command: str) -> Optional[int]:
+    """Net change of the stack size caused by `command`, None for block boundaries."""
+    parts = command.split()
+    if parts[0] == "push":
+        return 1
+    if parts[0] == "pop":
+        return -1
+    if parts[0] == "call":
+        return 1 - int(parts[2])
+    if command in BINARY_COMMANDS:
+        return -1
+    if command in UNARY_COMMANDS:
+        return 0
+    return None
+
+
+def push_constant(value: int) -> list[str]:
+    """Commands that push the 16-bit `value`; `push constant` only takes 0..32767."""
+    value = to_signed(value)
+    if value >= 0:
+        return [f"push constant {value}"]
+    if value == -32768:
+        return ["push constant 32767", "not"]
+    return [f"push constant {-value}", "neg"]
+
+
+def constant_value(commands: list[str]) -> Optional[int]:
+    """The value pushed by `commands` if they are one of the `push_constant` forms."""
+    parts = commands[0].split()
+    if parts[:2] != ["push", "constant"]:
+        return None
+
+    value = int(parts[2])
+    if len(commands) == 1:
+        return value
+    if commands[1:] == ["neg"]:
+        return to_signed(-value)
+    if commands[1:] == ["not"]:
+        return to_signed(~value)
+    return None
+
+
+def fold(command: str, x: int, y: int) -> Optional[int]:
+    """Evaluates `x command y` the way the VM and OS would, or None if it must run."""
+    if command == "add":
+        return to_signed(x + y)
+    if command == "sub":
+        return to_signed(x - y)
+    if command == "and":
+        return to_signed(x & y)
+    if command == "or":
+        return to_signed(x | y)
+    if command == "eq":
+        return -1 if x == y else 0
+    if command in ("lt", "gt"):
+        # The VM compares through x - y, so only fold when that cannot overflow.
+        if not -32768 <= x - y <= 32767:
+            return None
+        return -1 if (x < y if command == "lt" else x > y) else 0
+    if command == MULTIPLY:
+        return to_signed(x * y)
+    if command == DIVIDE:
+        if y == 0 or -32768 in (x, y):
+            return None  # leave division by zero and abs() overflow to Math.divide
+        quotient = abs(x) // abs(y)
+        return to_signed(-quotient if (x < 0) != (y < 0) else quotient)
+    return None
+
+
+def multiply_chain(constant: int) -> Optional[list[str]]:
+    """Commands that multiply the top of the stack by `constant` without Math.multiply.
+
+    Returns None when an add chain would not be worth it. temp 1 holds the
+    multiplicand while the chain runs.
+    """
+    constant = to_signed(constant)
+    negate = constant < 0 and constant != -32768
+    factor = -constant if negate else constant & 0xFFFF
+
+    if factor == 0:
+        return ["pop temp 1", "push constant 0"]
+
+    highest_bit = factor.bit_length() - 1
+    power_of_two = factor == 1 << highest_bit
+
+    if power_of_two:
+        commands = ["pop temp 1", "push temp 1", "push temp 1", "add"] * highest_bit
+    elif highest_bit + factor.bit_count() - 1 <= MAX_CHAIN_ADDS:
+        # Sum the shifted multiplicand for every set bit, doubling it in temp 1.
+        commands = ["pop temp 1"]
+        first = True
+        for bit in range(highest_bit + 1):
+            if factor >> bit & 1:
+                commands.append("push temp 1")
+                if not first:
+                    commands.append("add")
+                first = False
+            if bit < highest_bit:
+                commands.extend(["push temp 1", "push temp 1", "add", "pop temp 1"])
+    else:
+        return None
+
+    if negate:
+        commands.append("neg")
+    return commands
+
+
+def address_reads(commands: list[str]) -> Optional[set[tuple[str, str]]]:
+    """Variables read by a side-effect free address computation, None if it is not one."""
+    reads = set()
+    for command in commands:
+        parts = command.split()
+        if parts[0] == "push" and parts[1] in VARIABLE_SEGMENTS:
+            reads.add((parts[1], parts[2]))
+        elif parts[:2] != ["push", "constant"] and command not in PURE_COMMANDS:
+            return None
+    return reads
+
+
+def preserves(commands: list[str], reads: set[tuple[str, str]]) -> bool:
+    """True if running `commands` cannot change any of the variables in `reads`."""
+    segments = {segment for segment, _ in reads}
+    for command in commands:
+        parts = command.split()
+        if parts[0] == "pop" and (parts[1], parts[2]) in reads:
+            return False
+        if command == "pop pointer 0" and "this" in segments:
+            return False
+        if parts[0] == "call" and segments & {"static", "this"}:
+            return False  # the callee may assign statics or fields
+    return True
+
+
+class ExpressionOptimizer(VMWriter):
+    """
+    VMWriter that folds constant subexpressions and replaces multiplications by
+    constants with add chains.
+
+    Commands of the current basic block are buffered. Whenever an operator is
+    written, its operands are recovered from the buffer by their stack effect:
+    the right operand is the shortest suffix that pushes exactly one value and
+    the left operand is the shortest one before it. Constant operands are then
+    evaluated with 16-bit wraparound. The buffer is flushed at labels, jumps,
+    function declarations and returns.
+
+    Array accesses are also tracked: `that_address` holds the side-effect free
+    commands whose value is currently in pointer 1, until one of the variables
+    they read is assigned, a label is reached or a call may have changed it.
+    Accessing the same address again reuses pointer 1, and an array store
+    whose value leaves its address unchanged computes the value first, which
+    avoids the temp 0 shuffle and, if the value already set pointer 1 to that
+    address (`let a[i] = a[i] + 1`), the address computation as well.
+    """
+
+    def __init__(self, output_stream: TextIOWrapper):
+        super().__init__(output_stream)
+        self.commands: list[str] = []
+        self.positions: list[Position] = []  # Jack source of each buffered command
+        self.calls_removed = 0
+        self.that_address: Optional[tuple[str, ...]] = None
+        self.addresses_reused = 0
+
+    def write(self, command: str):
+        name = command.split()[0]
+        if name in BOUNDARY_COMMANDS:
+            self.flush()
+            if name in ("label", "function"):
+                self.start_block()
+            super().write(command)
+            return
+
+        self.commands.append(command)
+        self.positions.append(self.position)
+        if command in BINARY_COMMANDS:
+            self.reduce_binary()
+        elif command in UNARY_COMMANDS:
+            self.reduce_unary()
+        elif name == "pop":
+            self.reduce_pop()
+        elif name == "call" and self.that_address:
+            self.forget_address_unless([command])
+
+        # Reductions only rewrite the tail, which belongs to the current statement.
+        del self.positions[len(self.commands) :]
+        self.positions += [self.position] * (len(self.commands) - len(self.positions))
+
+    def start_block(self):
+        self.that_address = None
+
+    def flush(self):
+        for command, position in zip(self.commands, self.positions):
+            self.write_line(command, position)
+        self.commands.clear()
+        self.positions.clear()
+
+    def operand_start(self, end: int) -> Optional[int]:
+        """Start index of the operand whose commands end just before `end`."""
+        depth = 0
+        for index in range(end - 1, -1, -1):
+            effect = stack_effect(self.commands[index])
+            if effect is None:
+                return None
+            depth += effect
+            if depth == 1:
+                return index
+        return None
+
+    def replace_tail(self, start: int, commands: list[str]):
+        self.commands[start:] = commands
+
+    def reduce_unary(self):
+        command = self.commands[-1]
+        if len(self.commands) > 1 and self.commands[-2] == command:
+            del self.commands[-2:]  # not not x == x, neg neg x == x
+            return
+
+        start = self.operand_start(len(self.commands) - 1)
+        if start is None:
+            return
+
+        value = constant_value(self.commands[start:-1])
+        if value is None:
+            return
+
+        self.replace_tail(start, push_constant(-value if command == "neg" else ~value))
+
+    def reduce_binary(self):
+        command = self.commands[-1]
+        right_start = self.operand_start(len(self.commands) - 1)
+        if right_start is None:
+            return
+        left_start = self.operand_start(right_start)
+        if left_start is None:
+            return
+
+        left = self.commands[left_start:right_start]
+        right = self.commands[right_start:-1]
+        x = constant_value(left)
+        y = constant_value(right)
+        is_call = command in (MULTIPLY, DIVIDE)
+
+        if x is not None and y is not None:
+            value = fold(command, x, y)
+            if value is not None:
+                self.replace_tail(left_start, push_constant(value))
+                self.calls_removed += is_call
+            return
+
+        if y is not None:
+            # Right operand is constant: rewrite in place after the left operand.
+            reduced = self.reduce_with_constant(command, y)
+            if reduced is not None:
+                self.replace_tail(right_start, reduced)
+                self.calls_removed += is_call
+            return
+
+        if x is not None and command in ("add", "or", "and", MULTIPLY):
+            # Commutative operator with a constant left operand: drop the constant
+            # and apply it after the right operand instead.
+            reduced = self.reduce_with_constant(command, x)
+            if reduced is not None:
+                self.replace_tail(left_start, right + reduced)
+                self.calls_removed += is_call
+
+    def forget_address_unless(self, commands: list[str]):
+        """Forgets pointer 1 unless running `commands` leaves its address unchanged."""
+        reads = address_reads(list(self.that_address or ()))
+        if reads is None or not preserves(commands, reads):
+            self.that_address = None
+
+    def reduce_pop(self):
+        command = self.commands[-1]
+        if command == "pop pointer 1":
+            if self.commands[-2:-1] != ARRAY_STORE[:1]:  # stores finish at pop that 0
+                self.reduce_array_read()
+        elif command == "pop that 0":
+            self.reduce_array_store()
+        elif self.that_address:
+            self.forget_address_unless([command])
+
+    def reduce_array_read(self):
+        start = self.operand_start(len(self.commands) - 1)
+        address = self.commands[start:-1] if start is not None else []
+        if start is None or address_reads(address) is None:
+            self.that_address = None
+            return
+
+        if tuple(address) == self.that_address:
+            del self.commands[start:]
+            self.addresses_reused += 1
+        else:
+            self.that_address = tuple(address)
+
+    def reduce_array_store(self):
+        value_end = len(self.commands) - len(ARRAY_STORE)
+        if self.commands[value_end:] != ARRAY_STORE:
+            self.that_address = None
+            return
+
+        value_start = self.operand_start(value_end)
+        address_start = self.operand_start(value_start) if value_start is not None else None
+        if value_start is None or address_start is None:
+            self.that_address = None
+            return
+
+        address = self.commands[address_start:value_start]
+        value = self.commands[value_start:value_end]
+        reads = address_reads(address)
+        if reads is None or not preserves(value, reads):
+            self.that_address = None
+            return
+
+        # The value does not change the address, so it can be computed first.
+        commands = list(value)
+        if tuple(address) == self.that_address:
+            self.addresses_reused += 1
+        else:
+            commands += address + ["pop pointer 1"]
+        self.replace_tail(address_start, commands + ["pop that 0"])
+        self.that_address = tuple(address)
+
+    @staticmethod
+    def reduce_with_constant(command: str, constant: int) -> Optional[list[str]]:
+        """Commands applying `command` with `constant` to the top of the stack, or None."""
+        if command in ("add", "sub", "or") and constant == 0:
+            return []
+        if command == "and" and constant == -1:
+            return []
+        if command == DIVIDE and constant == 1:
+            return []
+        if command == MULTIPLY:
+            return multiply_chain(constant)
+        return None
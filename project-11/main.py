@@ -1,10 +1,13 @@
 import glob
 import os
+import sys
 from compile_engine import CompileEngine
+from expression_optimizer import ExpressionOptimizer
 from tokenizer import Token, tokenize
+from vm_writer import Position
 
 
-def main():
+def main(optimize: bool = False, pool_strings: bool = False, source_map: bool = False):
     base_dir = "files"
     if not os.path.isdir(base_dir):
         raise Exception(f"Error: '{base_dir}' is not a valid directory.")
@@ -21,9 +24,29 @@ def main():
 
             output_filename = os.path.splitext(jack_file)[0] + ".vm"
             with open(output_filename, "w", encoding="utf-8") as output_stream:
-                CompileEngine(tokens, output_stream)
+                engine = CompileEngine(tokens, output_stream, optimize, pool_strings)
             print(f"Created {output_filename}")
 
+            if source_map:
+                write_source_map(output_filename + ".map", engine.vm_writer.source_map)
+                print(f"Created {output_filename}.map")
+
+            if isinstance(engine.vm_writer, ExpressionOptimizer):
+                optimizer = engine.vm_writer
+                print(
+                    f"  {engine.class_name}: {optimizer.calls_removed} Math calls removed, "
+                    f"{optimizer.addresses_reused} array addresses reused"
+                )
+            if pool_strings and engine.string_uses:
+                print(f"  {engine.class_name}: {engine.string_pool_report()}")
+
+
+def write_source_map(output_filename: str, source_map: list[Position]):
+    """Writes one `vm_line jack_line jack_column` row per VM command."""
+    with open(output_filename, "w", encoding="utf-8") as f:
+        for vm_line, (jack_line, jack_column) in enumerate(source_map, start=1):
+            f.write(f"{vm_line} {jack_line} {jack_column}\n")
+
 
 def write_tokens_xml(output_filename: str, tokens: list[Token]):
     with open(output_filename, "w", encoding="utf-8") as f:
@@ -47,4 +70,8 @@ def write_tokens_xml(output_filename: str, tokens: list[Token]):
 
 
 if __name__ == "__main__":
-    main()
+    main(
+        optimize="--optimize" in sys.argv,
+        pool_strings="--pool-strings" in sys.argv,
+        source_map="--source-map" in sys.argv,
+    )
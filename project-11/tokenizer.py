@@ -15,6 +15,8 @@ class TokenType(Enum):
 class Token:
     value: str
     type: TokenType
+    line: int = 0  # 1-based position in the source, for source maps
+    column: int = 0
 
 
 TOKEN_REGEX_GROUPS = re.compile(
@@ -33,19 +35,29 @@ TOKEN_REGEX_GROUPS = re.compile(
 
 def get_tokens(jack_code: str) -> list[Token]:
     tokens: list[Token] = []
+    line, line_start, scanned = 1, 0, 0
     for match in TOKEN_REGEX_GROUPS.finditer(jack_code):
         if match.lastgroup:
             token_value = match.group(match.lastgroup)
             token_type = TokenType[match.lastgroup]
 
-            tokens.append(Token(token_value, token_type))
+            start = match.start()
+            newlines = jack_code.count("\n", scanned, start)
+            if newlines:
+                line += newlines
+                line_start = jack_code.rfind("\n", scanned, start) + 1
+            scanned = start
+            tokens.append(Token(token_value, token_type, line, start - line_start + 1))
 
     return tokens
 
 
 def remove_comments(jack_code: str) -> str:
+    """Removes comments, keeping the line breaks of block comments so token lines stay put."""
     jack_code = re.sub(r"//.*", "", jack_code)
-    jack_code = re.sub(r"/\*.*?\*/", "", jack_code, flags=re.DOTALL)
+    jack_code = re.sub(
+        r"/\*.*?\*/", lambda match: "\n" * match.group().count("\n"), jack_code, flags=re.DOTALL
+    )
     return jack_code
 
 
@@ -1,33 +1,56 @@
 from io import TextIOWrapper
 
+Position = tuple[int, int]  # Jack line and column
+
 
 class VMWriter:
     def __init__(self, output_stream: TextIOWrapper):
         self.output_stream: TextIOWrapper = output_stream
+        self.position: Position = (0, 0)  # Jack source of the commands being written
+        self.source_map: list[Position] = []  # Jack source of each command on the stream
+
+    def write(self, command: str):
+        self.write_line(command, self.position)
+
+    def write_line(self, command: str, position: Position):
+        self.output_stream.write(f"{command}\n")
+        self.source_map.append(position)
+
+    def flush(self):
+        """Write out any buffered commands. VMWriter itself does not buffer."""
+
+    def start_block(self):
+        """Called where code may be reached from elsewhere, like at a label."""
+
+    def write_code(self, code: str, source_map: list[Position]):
+        """Write previously generated VM code, with its source map, after any buffered commands."""
+        self.flush()
+        self.output_stream.write(code)
+        self.source_map += source_map
 
     def write_push(self, segment: str, index: int):
-        self.output_stream.write(f"push {segment} {index}\n")
+        self.write(f"push {segment} {index}")
 
     def write_pop(self, segment: str, index: int):
-        self.output_stream.write(f"pop {segment} {index}\n")
+        self.write(f"pop {segment} {index}")
 
     def write_arithmetic(self, command: str):
-        self.output_stream.write(f"{command}\n")
+        self.write(command)
 
     def write_label(self, label: str):
-        self.output_stream.write(f"label {label}\n")
+        self.write(f"label {label}")
 
     def write_goto(self, label: str):
-        self.output_stream.write(f"goto {label}\n")
+        self.write(f"goto {label}")
 
     def write_if(self, label: str):
-        self.output_stream.write(f"if-goto {label}\n")
+        self.write(f"if-goto {label}")
 
     def write_call(self, name: str, n_args: int):
-        self.output_stream.write(f"call {name} {n_args}\n")
+        self.write(f"call {name} {n_args}")
 
     def write_function(self, name: str, n_locals: int):
-        self.output_stream.write(f"function {name} {n_locals}\n")
+        self.write(f"function {name} {n_locals}")
 
     def write_return(self):
-        self.output_stream.write("return\n")
+        self.write("return")